@@ -0,0 +1,591 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from catan_objects import *
+from gamedata.board import BoardData, NO_OWNER
+from gamedata.building_data import BuildingData
+from gamedata.batched import BatchedGameData
+from gamedata.layout import BoardLayout
+from gamedata.snapshot import Snapshot
+from gamedata.bitboard import TileMasks, SETTLEMENT_PLANE, CITY_PLANE, ROAD_PLANE, pack, unpack, test, tile_bit
+from game_state import DispatchTable
+from game_loading.board_generator import BoardGenerator, RandomBoards
+from tools import weighted_sample
+from longest_road import BatchedLongestRoad
+from production import ProductionIndex, NO_RESOURCE, building_yields, terrain_resources
+from ports import PortIndex, trade_ship_ratios, dock_intersections
+from game_loading.default_board import TRADE_SHIP_PLACEMENTS
+from game_loading.default_rules import (
+    DEFAULT_BUILDINGS, TERRAIN_RESOURCES, DEV_CARD_COUNTS, DEV_CARD_COST, BANK_TRADE_RATIO, TRADE_SHIP_RATIOS,
+    VICTORY_POINTS_TO_WIN, LONGEST_ROAD_POINTS, LARGEST_ARMY_MIN, LARGEST_ARMY_POINTS, DISCARD_LIMIT,
+    ROAD_BUILDING_ROADS, YEAR_OF_PLENTY_PICKS
+)
+from typing import Optional
+import numpy as np
+import numpy.typing as npt
+
+
+SETUP_SETTLEMENT_EVENTS = (Event.PlaceInitialBuilding1A.value, Event.PlaceInitialBuilding2A.value)
+SETUP_ROAD_EVENTS = (Event.PlaceInitialBuilding1B.value, Event.PlaceInitialBuilding2B.value)
+
+PICK_EVENTS = (Event.PickDiscard.value, Event.PickResReceived.value, Event.PickMonopolyResource.value)
+
+# Flat action space (see BatchedEngine.action_mask): one action per tile (BuyBuilding, or SelectTile while
+# placing the robber), then Pass, BuyDevCard, one PlayDevCard per playable card, one SelectResource per
+# resource (discards, Year of Plenty and Monopoly) and one bank trade per (give, receive) pair
+PLAYABLE_CARDS = (DevelopmentCard.Knight, DevelopmentCard.RoadBuilding, DevelopmentCard.YearOfPlenty,
+                  DevelopmentCard.Monopoly)
+N_TRADES = len(Resource) ** 2
+PASS_ACTION, DEV_CARD_ACTION, PLAY_ACTION = range(3)
+RESOURCE_ACTION = PLAY_ACTION + len(PLAYABLE_CARDS)
+TRADE_ACTION = RESOURCE_ACTION + len(Resource)
+
+
+def action_count(n_tiles: int) -> int:
+    """ Size of the flat action space on a board of n_tiles tiles """
+    return n_tiles + TRADE_ACTION + N_TRADES
+
+
+# Random outcomes of one step: (roll,), (dev card,) or (robbed player, resource)
+N_OUTCOMES, NO_OUTCOME = 2, 255
+
+
+# On a 7 every player holding more than DISCARD_LIMIT cards discards half, one SelectResource at a time in turn
+# order (cur_player acts, turn_player owns the turn). A development card waits a turn; one is played per turn.
+# Not modeled: trades between players, playing cards before the roll, choosing the robbed player (one is drawn
+# at random) and the bank's limited resource supply
+@dataclass
+class BatchedEngine:
+    """
+    Steps n_games games at once, one (Request, argument) action per game per step (see decode_actions)
+    Games reaching win_points (or max_turns) report done and are reset in place unless auto_reset is off
+    Random outcomes of a step go to outcomes; setting forced replays recorded outcomes instead of drawing them
+    """
+    board: BoardData
+    n_games: int
+    n_players: int = 4
+    buildings: BuildingData = None
+    win_points: int = VICTORY_POINTS_TO_WIN
+    max_turns: int = 1000
+    seed: Optional[int] = None
+    generator: Optional[BoardGenerator] = None  # draws a fresh board for every (re)started game if given
+    dock_hexes: Optional[npt.NDArray[np.integer]] = None  # trade ship hexes; the generator's placements if None
+    auto_reset: bool = True
+    data: BatchedGameData = field(init=False, repr=False)
+    layout: BoardLayout = field(init=False, repr=False)
+    masks: TileMasks = field(init=False, repr=False)
+    roads: BatchedLongestRoad = field(init=False, repr=False)
+    production: ProductionIndex = field(init=False, repr=False)
+    ports: PortIndex = field(init=False, repr=False)
+    rng: np.random.Generator = field(init=False, repr=False)
+    dispatch: DispatchTable = field(init=False, repr=False)
+    outcomes: npt.NDArray[np.uint8] = field(init=False, repr=False)          # (games, N_OUTCOMES) of the last step
+    forced: Optional[npt.NDArray[np.uint8]] = field(init=False, default=None, repr=False)
+
+    def __post_init__(self):
+        if self.buildings is None:
+            self.buildings = BuildingData(DEFAULT_BUILDINGS)
+        self.rng = np.random.default_rng(self.seed)
+        self.outcomes = np.full((self.n_games, N_OUTCOMES), NO_OUTCOME, dtype=np.uint8)
+        self.data = BatchedGameData(
+            board=self.board,
+            buildings=self.buildings,
+            n_games=self.n_games,
+            n_players=self.n_players,
+            dev_deck_counts=np.array([DEV_CARD_COUNTS.get(card, 0) for card in DevelopmentCard], dtype=np.uint8)
+        )
+
+        # Rule lookup tables, indexed by enum value
+        self._building_row = np.full(len(Building), NO_OWNER, dtype=np.uint8)
+        self._building_row[self.buildings.buildings] = np.arange(self.buildings.n_buildings)
+        self._points = np.zeros(len(Building), dtype=np.uint8)
+        self._points[self.buildings.buildings] = self.buildings.victory_points
+        self._terrain_resource = terrain_resources(TERRAIN_RESOURCES)
+        self._dev_cost = np.array([DEV_CARD_COST.get(res, 0) for res in Resource], dtype=np.uint8)
+        self._playable = np.array([card.value for card in PLAYABLE_CARDS])
+        self._road_row = self._building_row[Building.Road.value]
+
+        if self.generator is not None:
+            self.data.reset(boards=self.generator.generate(self.n_games))
+
+        self.layout = self.board.layout
+        self.masks = TileMasks.build(self.layout)
+        self.roads = BatchedLongestRoad(self.data)
+        d = self.data
+        self.production = ProductionIndex(
+            self.layout, building_yields(self.buildings), self._terrain_resource, d.objects, d.owner, d.chit, d.robber
+        )
+        if self.dock_hexes is None:
+            placements = TRADE_SHIP_PLACEMENTS if self.generator is None else self.generator.trade_ship_placements
+            self.dock_hexes = np.array([h for group in placements for h in group], dtype=np.intp)
+        self.ports = PortIndex(
+            trade_ship_ratios(TRADE_SHIP_RATIOS, BANK_TRADE_RATIO), BANK_TRADE_RATIO, self.dock_hexes,
+            dock_intersections(self.board, self.dock_hexes), d.objects, d.owner, self.n_players
+        )
+        handlers = {(Event(e), Request.BuyBuilding): self._setup_settlement for e in SETUP_SETTLEMENT_EVENTS}
+        handlers.update({(Event(e), Request.BuyBuilding): self._setup_road for e in SETUP_ROAD_EVENTS})
+        handlers.update({
+            (Event.PlayerTurn, Request.BuyBuilding): self._build,
+            (Event.PlayerTurn, Request.BuyDevCard): self._buy_dev_card,
+            (Event.PlayerTurn, Request.PlayDevCard): self._play_dev_card,
+            (Event.PlayerTurn, Request.Trade): self._bank_trade,
+            (Event.PlayerTurn, Request.Pass): self._end_turn,
+            (Event.PlaceRobber, Request.SelectTile): self._place_robber,
+            (Event.PickDiscard, Request.SelectResource): self._discard,
+            (Event.PlaceBuilding, Request.BuyBuilding): self._free_road,
+            (Event.PlaceBuilding, Request.Pass): self._stop_free_roads,
+            (Event.PickResReceived, Request.SelectResource): self._year_of_plenty,
+            (Event.PickMonopolyResource, Request.SelectResource): self._monopoly,
+        })
+        self.dispatch = DispatchTable.from_handlers(handlers)
+
+    #
+    # Legality checks for one target tile per game (g, p and t are equal-length 1-d arrays)
+    #
+    def _settlement_ok(self, g, p, t, setup: bool) -> npt.NDArray[bool]:
+        d, board = self.data, self.board
+        ok = (board.space[t] == Space.Intersection.value) & self._env_ok(Building.Settlement, t)
+        ok &= ~self.masks.isec_block.hits(d.occupied[g], t)
+        if not setup:
+            ok &= self.masks.isec_paths.hits(d.pieces[g, p, ROAD_PLANE], t)
+        return ok
+
+    def _env_ok(self, building: Building, t) -> npt.NDArray[bool]:
+        return self.buildings.environment_reqs[self._building_row[building.value], self.board.environment[t]]
+
+    def _city_ok(self, g, p, t) -> npt.NDArray[bool]:
+        d = self.data
+        return (d.objects[g, t] == Building.Settlement.value) & (d.owner[g, t] == p) & \
+            (self.board.space[t] == Space.Intersection.value)
+
+    def _road_ok(self, g, p, t, setup: bool) -> npt.NDArray[bool]:
+        d, board = self.data, self.board
+        ok = (board.space[t] == Space.Path.value) & self._env_ok(Building.Road, t)
+        ok &= ~test(d.occupied[g], t)
+        isecs = self.layout.path_isecs[t]
+        if setup:
+            return ok & np.any(isecs == d.last_placement[g][..., None], axis=-1)
+        # an end of the path is reachable if it holds our building, or is empty and touches one of our roads
+        own_isec = test(d.pieces[g, p, SETTLEMENT_PLANE, None] | d.pieces[g, p, CITY_PLANE, None], isecs)
+        road_end = ~test(d.occupied[g, None], isecs) & self.masks.isec_paths.hits(d.pieces[g, p, ROAD_PLANE], isecs)
+        return ok & np.any(own_isec | road_end, axis=-1)
+
+    def _robber_ok(self, g, t) -> npt.NDArray[bool]:
+        board = self.board
+        return (board.space[t] == Space.Hex.value) & (board.environment[t] == Environment.Land.value) & \
+            (self.data.robber[g] != t)
+
+    def _roads_left(self, g, p) -> npt.NDArray[bool]:
+        return self.data.qty_built[g, p, self._road_row] < self.buildings.build_limits[self._road_row]
+
+    def _target_building(self, g, t) -> npt.NDArray[np.uint8]:
+        """ Building that a BuyBuilding request on tile t would place """
+        upgrade = np.where(self.data.objects[g, t] == Building.Settlement.value, Building.City.value,
+                           Building.Settlement.value)
+        return np.where(self.board.space[t] == Space.Path.value, Building.Road.value, upgrade).astype(np.uint8)
+
+    def tile_mask(self) -> npt.NDArray[bool]:
+        """ (games, tiles) mask of tiles the current player may target with BuyBuilding/SelectTile right now """
+        d, board = self.data, self.board
+        games = np.arange(self.n_games)
+        isecs, paths, hexes = self.layout.isecs, self.layout.paths, self.layout.hexes
+        occupied = unpack(d.occupied, board.n_tiles)
+        mine = d.pieces[games, d.cur_player]
+        settlements = unpack(mine[:, SETTLEMENT_PLANE], board.n_tiles)
+        own_isec = settlements | unpack(mine[:, CITY_PLANE], board.n_tiles)
+
+        free_isec = self._env_ok(Building.Settlement, isecs) & ~self.masks.isec_block.hits_each(d.occupied, isecs)
+        road_at_isec = self.masks.isec_paths.hits_each(mine[:, ROAD_PLANE], isecs)
+        reach = np.zeros_like(occupied)
+        reach[:, isecs] = own_isec[:, isecs] | (~occupied[:, isecs] & road_at_isec)
+        free_path = self._env_ok(Building.Road, paths) & ~occupied[:, paths]
+
+        def afford(building: Building) -> npt.NDArray[bool]:
+            return self._affordable(games, d.cur_player, np.full(self.n_games, building.value))[:, None]
+
+        in_turn = (d.event == Event.PlayerTurn.value)[:, None]
+        free_road = (d.event == Event.PlaceBuilding.value)[:, None] & self._roads_left(games, d.cur_player)[:, None]
+        setup_settlement = np.isin(d.event, SETUP_SETTLEMENT_EVENTS)[:, None]
+        setup_road = np.isin(d.event, SETUP_ROAD_EVENTS)[:, None]
+        robber = (d.event == Event.PlaceRobber.value)[:, None]
+
+        mask = np.zeros((self.n_games, board.n_tiles), dtype=bool)
+        mask[:, isecs] = free_isec & (setup_settlement | (in_turn & road_at_isec & afford(Building.Settlement)))
+        mask[:, isecs] |= in_turn & settlements[:, isecs] & afford(Building.City)
+        # a road may end at the settlement just placed (setup) or at any intersection the player reaches
+        word, bit = tile_bit(d.last_placement)
+        ends = np.zeros_like(d.occupied)
+        ends[games, word] = bit
+        ends = np.where(setup_road, ends, np.where((in_turn & afford(Building.Road)) | free_road, pack(reach), 0))
+        mask[:, paths] = free_path & self.masks.path_isecs.hits_each(ends, paths)
+        mask[:, hexes] = robber & (board.environment[hexes] == Environment.Land.value) & \
+            (hexes != d.robber[:, None])
+        return mask
+
+    @property
+    def n_actions(self) -> int:
+        return action_count(self.board.n_tiles)
+
+    def action_mask(self) -> npt.NDArray[bool]:
+        """ (games, n_actions) mask over the flat action space; every marked action is a valid request """
+        d = self.data
+        games, n_tiles = np.arange(self.n_games), self.board.n_tiles
+        hands = d.hands[games, d.cur_player]
+        in_turn = d.event == Event.PlayerTurn.value
+        mask = np.zeros((self.n_games, self.n_actions), dtype=bool)
+        mask[:, :n_tiles] = self.tile_mask()
+        mask[:, n_tiles + PASS_ACTION] = in_turn | (d.event == Event.PlaceBuilding.value)
+        mask[:, n_tiles + DEV_CARD_ACTION] = in_turn & np.all(hands >= self._dev_cost, axis=1) & \
+            (d.dev_deck.sum(axis=1) > 0)
+        playable = d.dev_cards[games, d.cur_player][:, self._playable] > d.new_cards[:, self._playable]
+        mask[:, n_tiles + PLAY_ACTION:n_tiles + RESOURCE_ACTION] = (in_turn & (d.dev_played == 0))[:, None] & playable
+        discarding = d.event == Event.PickDiscard.value
+        mask[:, n_tiles + RESOURCE_ACTION:n_tiles + TRADE_ACTION] = (discarding[:, None] & (hands > 0)) | \
+            np.isin(d.event, PICK_EVENTS[1:])[:, None]
+        give, receive = np.divmod(np.arange(N_TRADES), len(Resource))
+        mask[:, n_tiles + TRADE_ACTION:] = in_turn[:, None] & (give != receive) & \
+            (hands[:, give] >= self.ports.ratios[games, d.cur_player][:, give])
+        return mask
+
+    def decode_actions(self, actions: npt.NDArray[np.integer]
+                       ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+        """ (Request value, argument) per game for flat actions; negative actions become no-op invalid requests """
+        actions = np.asarray(actions, dtype=np.int64)
+        n_tiles = self.board.n_tiles
+        extra = actions - n_tiles
+        tile_request = np.where(self.data.event == Event.PlaceRobber.value, Request.SelectTile.value,
+                                Request.BuyBuilding.value)
+        requests = np.select(
+            [actions < 0, extra < 0, extra == PASS_ACTION, extra == DEV_CARD_ACTION, extra < RESOURCE_ACTION,
+             extra < TRADE_ACTION],
+            [-1, tile_request, Request.Pass.value, Request.BuyDevCard.value, Request.PlayDevCard.value,
+             Request.SelectResource.value],
+            Request.Trade.value
+        )
+        args = np.select(
+            [actions < 0, extra < 0, extra < PLAY_ACTION, extra < RESOURCE_ACTION, extra < TRADE_ACTION],
+            [0, actions, 0, self._playable[np.clip(extra - PLAY_ACTION, 0, len(PLAYABLE_CARDS) - 1)],
+             extra - RESOURCE_ACTION],
+            extra - TRADE_ACTION
+        )
+        return requests, args
+
+    def _affordable(self, g, p, building) -> npt.NDArray[bool]:
+        d = self.data
+        row = self._building_row[building]
+        cost = self.buildings.costs[row]
+        return np.all(d.hands[g, p] >= cost, axis=-1) & (d.qty_built[g, p, row] < self.buildings.build_limits[row])
+
+    #
+    # State changes
+    #
+    def _place(self, g, p, t, building) -> None:
+        d = self.data
+        d.victory_points[g, p] += self._points[building] - self._points[d.objects[g, t]]
+        d.place(g, t, building, p)
+        d.qty_built[g, p, self._building_row[building]] += 1
+        replaced = self._building_row[Building.Settlement.value]
+        is_city = building == Building.City.value
+        d.qty_built[g[is_city], p[is_city], replaced] -= 1
+        d.last_placement[g] = t
+
+        is_building = building != Building.Road.value
+        self.production.on_building(g[is_building], t[is_building])
+        self.ports.on_building(g[is_building], p[is_building], t[is_building])
+
+        games, old, new = self.roads.on_placements(g, p, t)
+        changed = old != new
+        games, old, new = games[changed], old[changed], new[changed]
+        d.victory_points[games[old != NO_OWNER], old[old != NO_OWNER]] -= LONGEST_ROAD_POINTS
+        d.victory_points[games[new != NO_OWNER], new[new != NO_OWNER]] += LONGEST_ROAD_POINTS
+
+    def _setup_settlement(self, g, t) -> npt.NDArray[bool]:
+        d = self.data
+        p = d.cur_player[g]
+        ok = self._settlement_ok(g, p, t, setup=True)
+        g, p, t = g[ok], p[ok], t[ok]
+        self._place(g, p, t, np.full(len(g), Building.Settlement.value, dtype=np.uint8))
+
+        second = d.event[g] == Event.PlaceInitialBuilding2A.value
+        gs, ps, ts = g[second], p[second], t[second]
+        hexes = self.layout.isec_hexes[ts]
+        res = self._terrain_resource[d.objects[gs[:, None], hexes]]
+        keep = self.layout.isec_hexes_mask[ts] & (res != NO_RESOURCE) & \
+            (self.board.environment[hexes] == Environment.Land.value)
+        np.add.at(d.hands, (np.broadcast_to(gs[:, None], res.shape)[keep],
+                            np.broadcast_to(ps[:, None], res.shape)[keep], res[keep]), 1)
+        d.event[g] += 1
+        return ok
+
+    def _setup_road(self, g, t) -> npt.NDArray[bool]:
+        d = self.data
+        p = d.cur_player[g]
+        ok = self._road_ok(g, p, t, setup=True)
+        g, p, t = g[ok], p[ok], t[ok]
+        self._place(g, p, t, np.full(len(g), Building.Road.value, dtype=np.uint8))
+
+        first_round = d.event[g] == Event.PlaceInitialBuilding1B.value
+        last = p == self.n_players - 1
+        d.cur_player[g[first_round & ~last]] += 1
+        d.event[g[first_round & ~last]] = Event.PlaceInitialBuilding1A.value
+        d.event[g[first_round & last]] = Event.PlaceInitialBuilding2A.value
+
+        second_round = ~first_round
+        d.cur_player[g[second_round & (p > 0)]] -= 1
+        d.event[g[second_round & (p > 0)]] = Event.PlaceInitialBuilding2A.value
+        start = g[second_round & (p == 0)]
+        d.event[start] = Event.PlayerTurn.value
+        self._roll(start)
+        return ok
+
+    def _build(self, g, t) -> npt.NDArray[bool]:
+        d = self.data
+        p = d.cur_player[g]
+        building = self._target_building(g, t)
+        ok = np.select(
+            [building == Building.Road.value, building == Building.City.value],
+            [self._road_ok(g, p, t, setup=False), self._city_ok(g, p, t)],
+            self._settlement_ok(g, p, t, setup=False)
+        ) & self._affordable(g, p, building)
+        g, p, t, building = g[ok], p[ok], t[ok], building[ok]
+        d.hands[g, p] -= self.buildings.costs[self._building_row[building]]
+        self._place(g, p, t, building)
+        return ok
+
+    def _buy_dev_card(self, g, _) -> npt.NDArray[bool]:
+        d = self.data
+        p = d.cur_player[g]
+        ok = np.all(d.hands[g, p] >= self._dev_cost, axis=-1) & (d.dev_deck[g].sum(axis=1) > 0)
+        g, p = g[ok], p[ok]
+        card = self._chance(g, 0, weighted_sample(d.dev_deck[g], self.rng))
+        d.hands[g, p] -= self._dev_cost
+        d.dev_deck[g, card] -= 1
+        d.dev_cards[g, p, card] += 1
+        d.new_cards[g, card] += 1
+        d.victory_points[g, p] += card == DevelopmentCard.VictoryPoint.value
+        return ok
+
+    def _play_dev_card(self, g, card) -> npt.NDArray[bool]:
+        """ Plays a card held since before this turn, if no card was played yet this turn """
+        d = self.data
+        p = d.cur_player[g]
+        ok = np.isin(card, self._playable) & (d.dev_played[g] == 0)
+        ok[ok] &= d.dev_cards[g[ok], p[ok], card[ok]] > d.new_cards[g[ok], card[ok]]
+        g, p, card = g[ok], p[ok], card[ok]
+        d.dev_cards[g, p, card] -= 1
+        d.dev_played[g] = 1
+
+        knight = card == DevelopmentCard.Knight.value
+        self._hire_knights(g[knight], p[knight])
+        d.event[g[knight]] = Event.PlaceRobber.value
+        roads = (card == DevelopmentCard.RoadBuilding.value) & self._roads_left(g, p)
+        d.picks[g[roads]] = ROAD_BUILDING_ROADS
+        d.event[g[roads]] = Event.PlaceBuilding.value
+        plenty = card == DevelopmentCard.YearOfPlenty.value
+        d.picks[g[plenty]] = YEAR_OF_PLENTY_PICKS
+        d.event[g[plenty]] = Event.PickResReceived.value
+        d.event[g[card == DevelopmentCard.Monopoly.value]] = Event.PickMonopolyResource.value
+        return ok
+
+    def _hire_knights(self, g, p) -> None:
+        """ Counts a Knight for player p[i] of game g[i] and moves Largest Army to whoever now has the most """
+        d = self.data
+        d.knights_played[g, p] += 1
+        holder = d.army_holder[g]
+        to_beat = np.where(holder == NO_OWNER, LARGEST_ARMY_MIN - 1,
+                           d.knights_played[g, np.minimum(holder, self.n_players - 1)])
+        takes = d.knights_played[g, p] > to_beat
+        g, p, old = g[takes], p[takes], holder[takes]
+        d.victory_points[g[old != NO_OWNER], old[old != NO_OWNER]] -= LARGEST_ARMY_POINTS
+        d.victory_points[g, p] += LARGEST_ARMY_POINTS
+        d.army_holder[g] = p
+
+    def _free_road(self, g, t) -> npt.NDArray[bool]:
+        """ Places one of the roads granted by Road Building """
+        d = self.data
+        p = d.cur_player[g]
+        ok = self._road_ok(g, p, t, setup=False) & self._roads_left(g, p)
+        g, p, t = g[ok], p[ok], t[ok]
+        self._place(g, p, t, np.full(len(g), Building.Road.value, dtype=np.uint8))
+        d.picks[g] -= 1
+        d.event[g[d.picks[g] == 0]] = Event.PlayerTurn.value
+        return ok
+
+    def _stop_free_roads(self, g, _) -> npt.NDArray[bool]:
+        """ Gives up the remaining Road Building roads (e.g. when none can be placed) """
+        self.data.picks[g] = 0
+        self.data.event[g] = Event.PlayerTurn.value
+        return np.ones(len(g), dtype=bool)
+
+    def _year_of_plenty(self, g, resource) -> npt.NDArray[bool]:
+        d = self.data
+        d.hands[g, d.cur_player[g], resource] += 1
+        d.picks[g] -= 1
+        d.event[g[d.picks[g] == 0]] = Event.PlayerTurn.value
+        return np.ones(len(g), dtype=bool)
+
+    def _monopoly(self, g, resource) -> npt.NDArray[bool]:
+        """ Current player takes every card of resource from the other players """
+        d = self.data
+        total = d.hands[g, :, resource].sum(axis=1)
+        d.hands[g, :, resource] = 0
+        d.hands[g, d.cur_player[g], resource] = total
+        d.event[g] = Event.PlayerTurn.value
+        return np.ones(len(g), dtype=bool)
+
+    def _discard(self, g, resource) -> npt.NDArray[bool]:
+        """ The player to act discards one card of resource; the robber moves once every discard is made """
+        d = self.data
+        p = d.cur_player[g]
+        ok = (d.hands[g, p, resource] > 0) & (d.discards[g, p] > 0)
+        g, p, resource = g[ok], p[ok], resource[ok]
+        d.hands[g, p, resource] -= 1
+        d.discards[g, p] -= 1
+        self._next_discard(g[d.discards[g, p] == 0])
+        return ok
+
+    def _next_discard(self, g) -> None:
+        """ Hands games g to the next player (in turn order) with cards to discard, or else to the robber """
+        d = self.data
+        order = (d.turn_player[g][:, None] + np.arange(self.n_players)) % self.n_players
+        pending = d.discards[g[:, None], order] > 0
+        waiting = pending.any(axis=1)
+        d.cur_player[g[waiting]] = order[waiting, np.argmax(pending[waiting], axis=1)]
+        d.event[g[waiting]] = Event.PickDiscard.value
+        done = g[~waiting]
+        d.cur_player[done] = d.turn_player[done]
+        d.event[done] = Event.PlaceRobber.value
+
+    def _bank_trade(self, g, arg) -> npt.NDArray[bool]:
+        d = self.data
+        p = d.cur_player[g]
+        give, receive = np.divmod(arg, len(Resource))
+        ok = (give < len(Resource)) & (give != receive)
+        ok[ok] &= d.hands[g[ok], p[ok], give[ok]] >= self.ports.ratios[g[ok], p[ok], give[ok]]
+        g, p, give, receive = g[ok], p[ok], give[ok], receive[ok]
+        d.hands[g, p, give] -= self.ports.ratios[g, p, give]
+        d.hands[g, p, receive] += 1
+        return ok
+
+    def _place_robber(self, g, t) -> npt.NDArray[bool]:
+        d = self.data
+        ok = self._robber_ok(g, t)
+        g, t = g[ok], t[ok]
+        old = d.robber[g]
+        d.move_robber(g, t)
+        self.production.on_robber(g, old)
+        d.event[g] = Event.PlayerTurn.value
+        self._steal(g)
+        return ok
+
+    def _steal(self, g) -> None:
+        """ Current player takes one random resource from a random opponent with a building on the robber hex """
+        d = self.data
+        p = d.cur_player[g]
+        buildings = d.pieces[g, :, SETTLEMENT_PLANE] | d.pieces[g, :, CITY_PLANE]
+        victims = self.masks.hex_isecs.hits(buildings, d.robber[g][:, None]) & \
+            (np.arange(self.n_players) != p[:, None]) & (d.hands[g].sum(axis=-1) > 0)
+        keys = np.where(victims, self.rng.random(victims.shape), -1.)
+        has_victim = victims.any(axis=1)
+        g, p = g[has_victim], p[has_victim]
+        victim = self._chance(g, 0, np.argmax(keys, axis=1)[has_victim])
+        resource = self._chance(g, 1, weighted_sample(d.hands[g, victim], self.rng))
+        d.hands[g, victim, resource] -= 1
+        d.hands[g, p, resource] += 1
+
+    def _end_turn(self, g, _) -> npt.NDArray[bool]:
+        d = self.data
+        d.cur_player[g] = (d.cur_player[g] + 1) % self.n_players
+        d.turn[g] += 1
+        d.new_cards[g] = 0
+        d.dev_played[g] = 0
+        self._roll(g)
+        return np.ones(len(g), dtype=bool)
+
+    def _roll(self, g) -> None:
+        d = self.data
+        roll = self._chance(g, 0, self.rng.integers(1, 7, size=(len(g), 2)).sum(axis=1).astype(np.uint8))
+        d.last_roll[g] = roll
+        d.turn_player[g] = d.cur_player[g]
+        seven = roll == 7
+        sevens = g[seven]
+        cards = d.hands[sevens].sum(axis=-1)
+        d.discards[sevens] = np.where(cards > DISCARD_LIMIT, cards // 2, 0)
+        self._next_discard(sevens)
+        self.production.produce(g[~seven], roll[~seven], d.hands)
+
+    def _chance(self, g, slot: int, drawn: npt.NDArray[np.integer]) -> npt.NDArray[np.integer]:
+        """ Records the outcomes drawn for games g, or swaps in the forced ones when replaying """
+        if self.forced is not None:
+            drawn = self.forced[g, slot].astype(drawn.dtype)
+        self.outcomes[g, slot] = drawn
+        return drawn
+
+    def step(self, requests: npt.NDArray[np.integer], args: npt.NDArray[np.integer]
+             ) -> tuple[npt.NDArray[np.float32], npt.NDArray[bool], npt.NDArray[bool]]:
+        """
+        Applies requests[i] (Request value) to game i with argument args[i] (a tile, card, resource or, for a Trade,
+        give * n_resources + receive); invalid requests leave their game unchanged
+        Returns per-game rewards (1 for a win), done flags and validity; done games are reset unless auto_reset is off
+        """
+        d = self.data
+        requests = np.asarray(requests)
+        args = np.asarray(args, dtype=np.int64)
+        games = np.arange(self.n_games)
+        actor = d.cur_player.copy()
+        self.outcomes.fill(NO_OUTCOME)
+
+        # Tile requests need a tile on the board, picks a resource and trades a non-negative code; others go to the
+        # dispatch table
+        needs_tile = (requests == Request.BuyBuilding.value) | (requests == Request.SelectTile.value)
+        needs_resource = requests == Request.SelectResource.value
+        bad_arg = np.where(needs_tile, (args < 0) | (args >= self.board.n_tiles),
+                           np.where(needs_resource, (args < 0) | (args >= len(Resource)),
+                                    (requests == Request.Trade.value) & (args < 0)))
+        valid = self.dispatch.handle_requests(d.event, np.where(bad_arg, -1, requests), args)
+
+        won = d.victory_points[games, actor] >= self.win_points
+        done = won | (d.turn >= self.max_turns)
+        rewards = won.astype(np.float32)
+        if self.auto_reset and done.any():
+            self._reset(done)
+        return rewards, done, valid
+
+    def reset(self, boards: Optional[RandomBoards] = None) -> None:
+        """ Restarts every game, on the given boards (one per game) or else the generator's """
+        self._reset(None, boards)
+
+    def _reset(self, games: npt.NDArray[bool] | None, boards: Optional[RandomBoards] = None) -> None:
+        if boards is None and self.generator is not None:
+            boards = self.generator.generate(self.n_games if games is None else int(np.count_nonzero(games)))
+        self.data.reset(games, boards)
+        self.production.rebuild(games)
+        self.ports.rebuild(games)
+
+    def snapshot(self, games: npt.NDArray[bool] | npt.NDArray[np.intp] | int | None = None) -> Snapshot:
+        return self.data.snapshot(games)
+
+    def restore(self, snapshot: Snapshot, games: npt.NDArray[bool] | npt.NDArray[np.intp] | int | None = None
+                ) -> None:
+        """ Restores game state and the indices derived from it (the rng is not part of a snapshot) """
+        self.data.restore(snapshot, games)
+        self.production.refresh(games)
+        self.ports.rebuild(games)
+
+
+if __name__ == '__main__':
+    import time
+    from game_loading.default_board import make_default_board
+
+    tiles = make_default_board()
+    engine = BatchedEngine(board=BoardData(tiles), n_games=1024, seed=0)
+    n_steps, start = 200, time.perf_counter()
+    for _ in range(n_steps):
+        mask = engine.tile_mask()
+        has_tile = mask.any(axis=1)
+        target = np.argmax(mask + engine.rng.random(mask.shape), axis=1)
+        req = np.where(
+            engine.data.event == Event.PlaceRobber.value, Request.SelectTile.value,
+            np.where(has_tile, Request.BuyBuilding.value, Request.Pass.value))
+        engine.step(req, target)
+    elapsed = time.perf_counter() - start
+    print(f'{n_steps * engine.n_games / elapsed:,.0f} env-steps/s ({engine.n_games} games)')
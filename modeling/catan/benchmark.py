@@ -0,0 +1,405 @@
+"""
+Hot-path benchmarks reporting rates as JSON: python benchmark.py [--baseline FILE] [patterns] (see --help)
+A run fails when a rate drops more than --threshold below the baseline, a benchmark cannot run or there is no baseline
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Optional
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import numpy as np
+
+CATAN = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [path for path in (os.path.dirname(CATAN), CATAN) if path not in sys.path]
+
+# () -> (timed call, operations per call); with None operations, the call returns how many it performed
+Setup = Callable[[], tuple[Callable[[], object], Optional[int]]]
+DEFAULT_THRESHOLD = 0.15
+DEFAULT_BASELINE = os.path.join(CATAN, 'benchmark_baseline.json')
+
+
+@dataclass(frozen=True)
+class Benchmark:
+    name: str
+    unit: str
+    setup: Setup
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    unit: str
+    status: str = 'ok'                     # 'ok' or 'skipped'
+    best: Optional[float] = None           # highest rate over the repeats
+    median: Optional[float] = None
+    rates: list[float] = field(default_factory=list)
+    reason: Optional[str] = None
+
+
+BENCHMARKS: dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, unit: str = 'calls/s') -> Callable[[Setup], Setup]:
+    def decorator(setup: Setup) -> Setup:
+        BENCHMARKS[name] = Benchmark(name, unit, setup)
+        return setup
+    return decorator
+
+
+def measure(func: Callable[[], object], ops_per_call: Optional[int] = 1, min_time: float = 0.2,
+            repeats: int = 5) -> list[float]:
+    """ Rates (ops/s) of repeats timing rounds, each calling func for at least min_time seconds """
+    func()
+    rates = []
+    for _ in range(repeats):
+        ops, start = 0, time.perf_counter()
+        while True:
+            result = func()
+            ops += result if ops_per_call is None else ops_per_call
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        rates.append(ops / elapsed)
+    return rates
+
+
+def run(patterns: Optional[list[str]] = None, min_time: float = 0.2, repeats: int = 5
+        ) -> dict[str, BenchmarkResult]:
+    results = {}
+    for name, bench in BENCHMARKS.items():
+        if patterns and not any(fnmatch.fnmatch(name, p) for p in patterns):
+            continue
+        try:
+            func, ops = bench.setup()
+        except ImportError as e:
+            results[name] = BenchmarkResult(name, bench.unit, status='skipped', reason=str(e))
+            continue
+        rates = measure(func, ops, min_time, repeats)
+        results[name] = BenchmarkResult(name, bench.unit, best=max(rates), median=statistics.median(rates),
+                                        rates=rates)
+    return results
+
+
+def environment() -> dict[str, str]:
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def to_json(results: dict[str, BenchmarkResult]) -> dict:
+    return {'environment': environment(), 'results': {name: asdict(r) for name, r in results.items()}}
+
+
+def compare(results: dict[str, BenchmarkResult], baseline: dict, threshold: float = DEFAULT_THRESHOLD,
+            patterns: Optional[list[str]] = None) -> list[tuple[str, float, Optional[float], Optional[float]]]:
+    """
+    (name, baseline rate, current rate, relative change) of every benchmark slower than threshold allows;
+    baseline benchmarks (matching patterns) that were skipped or did not run have no current rate or change
+    """
+    regressions = []
+    for name, base in baseline.get('results', {}).items():
+        if base.get('status') != 'ok' or (patterns and not any(fnmatch.fnmatch(name, p) for p in patterns)):
+            continue
+        result = results.get(name)
+        if result is None or result.status != 'ok':
+            regressions.append((name, base['best'], None, None))
+            continue
+        change = result.best / base['best'] - 1
+        if change < -threshold:
+            regressions.append((name, base['best'], result.best, change))
+    return regressions
+
+
+def report(results: dict[str, BenchmarkResult], baseline: Optional[dict] = None) -> str:
+    lines = []
+    for name, r in results.items():
+        if r.status != 'ok':
+            lines.append(f'{name:<36} skipped ({r.reason})')
+            continue
+        line = f'{name:<36} {r.best:>14,.1f} {r.unit:<14} (median {r.median:,.1f})'
+        base = (baseline or {}).get('results', {}).get(name, {})
+        if base.get('status') == 'ok':
+            line += f'  {r.best / base["best"] - 1:+.1%} vs baseline'
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+#
+# Board construction
+#
+def _hex_board(n_hexes: int, resolution: tuple[int, int]) -> Setup:
+    def setup():
+        from hex_board import HexBoard
+        return lambda: HexBoard(resolution, n_hexes, n_hexes, 5), 1
+    return setup
+
+
+for _n, _resolution in ((7, (1920, 1080)), (15, (1920, 1080)), (31, (3840, 2160))):
+    benchmark(f'hex_board_{_n}x{_n}', 'boards/s')(_hex_board(_n, _resolution))
+
+
+@benchmark('make_default_board', 'boards/s')
+def _make_default_board():
+    from game_loading.default_board import make_default_board
+    return make_default_board, 1
+
+
+@benchmark('board_data_init', 'boards/s')
+def _board_data_init():
+    from game_loading.default_board import make_default_board
+    from gamedata.board import BoardData
+    tiles = make_default_board()
+    return lambda: BoardData(tiles), 1
+
+
+@benchmark('building_data_init', 'inits/s')
+def _building_data_init():
+    from game_loading.default_rules import DEFAULT_BUILDINGS
+    from gamedata.building_data import BuildingData
+    return lambda: BuildingData(DEFAULT_BUILDINGS), 1
+
+
+#
+# Observations
+#
+def _engine(n_games: int):
+    from game_loading.compiled_layout import load_default_layout
+    from batched_engine import BatchedEngine
+    engine = BatchedEngine(board=load_default_layout().board_data(), n_games=n_games, seed=0)
+    for _ in range(50):
+        mask = engine.action_mask()
+        engine.step(*engine.decode_actions(np.argmax(mask + engine.rng.random(mask.shape), axis=1)))
+    return engine
+
+
+@benchmark('board_package_observation', 'observations/s')
+def _board_package_observation():
+    board = _engine(1).board
+    return lambda: board.package_observation(0), 1
+
+
+@benchmark('batched_package_observation', 'observations/s')
+def _batched_package_observation():
+    data = _engine(256).data
+    return data.package_observation, data.n_games
+
+
+@benchmark('batched_write_observation', 'observations/s')
+def _batched_write_observation():
+    from gamedata.observation import ObservationLayout
+    data = _engine(256).data
+    out = ObservationLayout(data.package_observation(), batched=True).allocate(data.n_games)
+    return lambda: data.write_observation(out.views), data.n_games
+
+
+#
+# Snapshots: one state block copy per game against a deep copy of the board
+#
+@benchmark('batched_snapshot', 'clones/s')
+def _batched_snapshot():
+    data = _engine(64).data
+    return lambda: data.snapshot(0), 1
+
+
+@benchmark('batched_restore', 'restores/s')
+def _batched_restore():
+    data = _engine(64).data
+    snap = data.snapshot(0)
+    return lambda: data.restore(snap, 0), 1
+
+
+@benchmark('engine_restore', 'restores/s')
+def _engine_restore():
+    engine = _engine(64)
+    snap = engine.data.snapshot(0)
+    return lambda: engine.restore(snap, 0), 1
+
+
+@benchmark('board_snapshot', 'clones/s')
+def _board_snapshot():
+    return _engine(1).board.snapshot, 1
+
+
+@benchmark('board_deepcopy', 'clones/s')
+def _board_deepcopy():
+    import copy
+    board = _engine(1).board
+    return lambda: copy.deepcopy(board), 1
+
+
+#
+# Conditions: a small tree over board arrays, evaluated through ConditionKeeper
+#
+def _condition_keeper():
+    from condition import ConditionKeeper, Condition
+    from catan_objects import Building, Environment
+    from gamedata.board import BoardData
+    from game_loading.default_board import make_default_board
+
+    @dataclass
+    class BoardKeeper(ConditionKeeper):
+        board: BoardData = None
+
+    @dataclass
+    class OwnedBy(Condition):
+        reads = ('board.owner',)
+
+        def check(self, keeper):
+            return keeper.board.owner == self.value
+
+    @dataclass
+    class HasObject(Condition):
+        reads = ('board.objects',)
+
+        def check(self, keeper):
+            return keeper.board.objects == self.value
+
+    @dataclass
+    class InEnvironment(Condition):
+        reads = ('board.environment',)
+
+        def check(self, keeper):
+            return keeper.board.environment == self.value
+
+    keeper = BoardKeeper(board=BoardData(make_default_board()))
+    keeper.board.keeper = keeper
+    tree = (OwnedBy(value=0) & HasObject(value=Building.Settlement.value)) | \
+        (~HasObject(value=Building.NoBuilding.value) & InEnvironment(value=Environment.Land.value))
+    return keeper, tree
+
+
+@benchmark('condition_memo_hit', 'evaluations/s')
+def _condition_memo_hit():
+    keeper, tree = _condition_keeper()
+    return lambda: keeper.get_status(tree), 1
+
+
+@benchmark('condition_memo_miss', 'evaluations/s')
+def _condition_memo_miss():
+    keeper, tree = _condition_keeper()
+
+    def evaluate():
+        keeper.touch('board.owner')
+        return keeper.get_status(tree)
+    return evaluate, 1
+
+
+@benchmark('condition_plan', 'evaluations/s')
+def _condition_plan():
+    from condition import compile_conditions
+    keeper, tree = _condition_keeper()
+    plan = compile_conditions(tree)
+
+    def evaluate():
+        keeper.touch('board.owner')
+        return plan.evaluate(keeper)
+    return evaluate, 1
+
+
+#
+# Sampling and game steps
+#
+@benchmark('rand_wtd_index', 'draws/s')
+def _rand_wtd_index():
+    from tools import rand_wtd_index
+    rng = np.random.default_rng(0)
+    deck = np.array([14, 5, 2, 2, 2], dtype=np.uint8)
+    return lambda: rand_wtd_index(deck, rng=rng), 1
+
+
+@benchmark('weighted_sample_batched', 'draws/s')
+def _weighted_sample_batched():
+    from tools import weighted_sample
+    rng = np.random.default_rng(0)
+    hands = rng.integers(0, 8, size=(1024, 5)).astype(np.uint8)
+    return lambda: weighted_sample(hands, rng), len(hands)
+
+
+def _engine_steps(n_games: int) -> Setup:
+    def setup():
+        engine = _engine(n_games)
+
+        def step():
+            mask = engine.action_mask()
+            return engine.step(*engine.decode_actions(np.argmax(mask + engine.rng.random(mask.shape), axis=1)))
+        return step, n_games
+    return setup
+
+
+for _n in (1, 256):
+    benchmark(f'engine_steps_{_n}', 'env-steps/s')(_engine_steps(_n))
+
+
+@benchmark('full_games', 'games/s')
+def _full_games():
+    """ Complete random-play games of a 64-game engine, counted as they finish """
+    engine = _engine(64)
+    engine.max_turns = 200
+
+    def play():
+        finished = 0
+        while not finished:
+            mask = engine.action_mask()
+            _, done, _ = engine.step(*engine.decode_actions(np.argmax(mask + engine.rng.random(mask.shape), axis=1)))
+            finished = int(done.sum())
+        return finished
+    return play, None
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('patterns', nargs='*', help='only run benchmarks matching these glob patterns')
+    parser.add_argument('--output', '-o', help='write results to this JSON file')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline JSON to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed relative slowdown before a benchmark counts as a regression')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per timing round')
+    parser.add_argument('--repeats', type=int, default=5, help='timing rounds per benchmark')
+    parser.add_argument('--allow-skip', action='store_true',
+                        help='report benchmarks whose modules cannot be imported as skipped instead of failing')
+    parser.add_argument('--list', action='store_true', help='list the benchmarks and exit')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print('\n'.join(f'{b.name} ({b.unit})' for b in BENCHMARKS.values()))
+        return 0
+    baseline = None
+    if not args.save_baseline:
+        if not os.path.exists(args.baseline):
+            print(f'ERROR no baseline at {args.baseline}: pass --baseline FILE or record one with --save-baseline')
+            return 1
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    results = run(args.patterns, args.min_time, args.repeats)
+    print(report(results, baseline))
+
+    data = to_json(results)
+    for path in filter(None, (args.output, args.baseline if args.save_baseline else None)):
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+    skipped = [name for name, r in results.items() if r.status != 'ok']
+    for name in [] if args.allow_skip else skipped:
+        print(f'ERROR {name}: {results[name].reason}')
+    regressions = [] if baseline is None else compare(results, baseline, args.threshold, args.patterns)
+    for name, base, current, change in regressions:
+        if current is None:
+            print(f'MISSING {name}: in the baseline ({base:,.1f}) but not measured in this run')
+        else:
+            print(f'REGRESSION {name}: {base:,.1f} -> {current:,.1f} ({change:+.1%}, '
+                  f'threshold {args.threshold:.0%})')
+    return int(bool(regressions) or (bool(skipped) and not args.allow_skip))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,252 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from catan_objects import *
+from gamedata.board import BoardData, NO_OWNER
+from gamedata.batched import BatchedGameData
+from hex_board import HexBoard, TileType, TileInfo
+from hex_board.calculations import get_path_type
+from hex_board.rendering import SpriteAtlas, SpriteLayer, FrameRecorder, COLOR_GRAY, COLOR_WHITE
+from typing import Optional, TYPE_CHECKING
+import numpy as np
+import numpy.typing as npt
+
+if TYPE_CHECKING:
+    from game_loading.compiled_layout import CompiledLayout
+
+
+TERRAIN_COLORS = {
+    Terrain.NoTerrain: (90, 90, 90),
+    Terrain.Hill: (184, 92, 56),
+    Terrain.Forest: (34, 110, 50),
+    Terrain.Pasture: (140, 200, 90),
+    Terrain.Field: (230, 200, 80),
+    Terrain.Mountain: (130, 130, 140),
+    Terrain.Desert: (220, 200, 150),
+}
+SEA_COLOR = (40, 100, 180)
+TRADE_SHIP_COLORS = {
+    TradeShip.BrickShip: TERRAIN_COLORS[Terrain.Hill],
+    TradeShip.LumberShip: TERRAIN_COLORS[Terrain.Forest],
+    TradeShip.WoolShip: TERRAIN_COLORS[Terrain.Pasture],
+    TradeShip.GrainShip: TERRAIN_COLORS[Terrain.Field],
+    TradeShip.OreShip: TERRAIN_COLORS[Terrain.Mountain],
+    TradeShip.AllShip: (250, 250, 250),
+}
+PLAYER_COLORS = np.array([(200, 30, 30), (30, 60, 200), (240, 140, 20), (20, 20, 20)], dtype=np.uint8)
+CHIT_COLOR, RED_PIP, BLACK_PIP, ROBBER_COLOR = (240, 225, 180), (200, 20, 20), (20, 20, 20), (50, 50, 50)
+BACKGROUND = (25, 60, 120)
+PATH_TYPES = (TileType.PathVertical, TileType.PathSlopedR, TileType.PathSlopedL)
+
+
+def _grid(size: int) -> tuple[npt.NDArray, npt.NDArray]:
+    """ Pixel offsets from the center of a size x size sprite """
+    offsets = np.arange(size) - size // 2
+    return offsets[:, None].astype(np.float32), offsets[None, :].astype(np.float32)
+
+
+def _paint(size: int, shape: npt.NDArray[bool], color, base=None) -> npt.NDArray[np.uint8]:
+    sprite = np.empty((size, size, 3), dtype=np.uint8) if base is None else base.copy()
+    if base is None:
+        sprite[:] = COLOR_WHITE
+    sprite[shape] = color
+    return sprite
+
+
+def lattice_unit(locs: npt.NDArray[np.integer]) -> int:
+    """ Pixels per lattice step (1/8 hex size) of tile locs laid out like hex_topology """
+    return max(1, int(np.gcd.reduce((locs - locs.min(axis=0)).ravel())))
+
+
+def hex_sprite(unit: int, color) -> npt.NDArray[np.uint8]:
+    """ Pointy-top hexagon matching the lattice of hex_topology (corners 4 units from the center) """
+    y, x = _grid(8 * unit + 1)
+    inside = (np.abs(x) <= 4 * unit) & (np.abs(y) <= 4 * unit - np.abs(x) / 2)
+    return _paint(8 * unit + 1, inside, color)
+
+
+def segment_sprite(unit: int, end: tuple[float, float], width: float) -> npt.NDArray[np.uint8]:
+    """ Recolorable thick segment through the center, from -end to end (y, x) """
+    y, x = _grid(4 * unit + 1)
+    ey, ex = end
+    t = np.clip((y * ey + x * ex) / (ey * ey + ex * ex), -1, 1)
+    dist = np.hypot(y - t * ey, x - t * ex)
+    return _paint(4 * unit + 1, dist <= width, COLOR_GRAY)
+
+
+def disc_sprite(size: int, radius: float, color) -> npt.NDArray[np.uint8]:
+    y, x = _grid(size)
+    return _paint(size, np.hypot(y, x) <= radius, color)
+
+
+def chit_sprite(unit: int, chit: int) -> npt.NDArray[np.uint8]:
+    """ Chit disc with one pip per way of rolling it (red for 6 and 8) """
+    size = 4 * unit + 1
+    sprite = disc_sprite(size, 1.6 * unit, CHIT_COLOR)
+    y, x = _grid(size)
+    pips = 6 - abs(7 - chit)
+    pip_x = (np.arange(pips) - (pips - 1) / 2) * 0.55 * unit
+    pip = np.any(np.hypot(y[..., None], x[..., None] - pip_x) <= 0.2 * unit + 0.5, axis=-1)
+    return _paint(size, pip, RED_PIP if chit in (6, 8) else BLACK_PIP, base=sprite)
+
+
+def house_sprite(unit: int, scale: float) -> npt.NDArray[np.uint8]:
+    """ Recolorable square with a pointed roof """
+    size = 3 * unit + 1
+    y, x = _grid(size)
+    half = scale * unit
+    body = (np.abs(x) <= half) & (y >= -half / 2) & (y <= half)
+    roof = (y < -half / 2) & (y >= -half / 2 - (half - np.abs(x)))
+    return _paint(size, body | roof, COLOR_GRAY)
+
+
+@dataclass
+class BoardRenderer:
+    """
+    Renders BoardData-style arrays (objects, owner, chit per tile and the robber hex) into one reusable frame
+    Sprites are built once per hex size; the hex and chit layers are cached until terrain, ships or chits change
+    """
+    tiles: list[TileInfo]                 # locs are frame pixels (y, x) on a lattice of 1/8 hex size
+    resolution: tuple[int, int]           # (width, height)
+    environment: npt.NDArray[np.uint8]
+    player_colors: npt.NDArray[np.uint8] = field(default_factory=lambda: PLAYER_COLORS.copy())
+    frame: npt.NDArray[np.uint8] = field(init=False, repr=False)
+    base: npt.NDArray[np.uint8] = field(init=False, repr=False)
+    _base_key: Optional[bytes] = field(init=False, default=None, repr=False)
+
+    def __post_init__(self):
+        tiles = self.tiles
+        width, height = self.resolution
+        self.frame = np.zeros((height, width, 3), dtype=np.uint8)
+        self.base = np.zeros_like(self.frame)
+        locs = np.array([tile.loc for tile in tiles])
+        unit = lattice_unit(locs)
+        types = np.array([tile.tile_type.value for tile in tiles])
+        self.hexes = np.flatnonzero(types == TileType.Hex.value)
+        self.isecs = np.flatnonzero(types == TileType.Intersection.value)
+        self.paths = np.flatnonzero(np.isin(types, [t.value for t in PATH_TYPES]))
+        frame_shape = (height, width)
+
+        hex_sprites = {f'terrain:{t.value}': hex_sprite(unit, color) for t, color in TERRAIN_COLORS.items()}
+        hex_sprites['sea'] = hex_sprite(unit, SEA_COLOR)
+        for ship, color in TRADE_SHIP_COLORS.items():
+            hex_sprites[f'ship:{ship.value}'] = _paint(
+                8 * unit + 1, np.hypot(*_grid(8 * unit + 1)) <= 1.5 * unit, color, base=hex_sprite(unit, SEA_COLOR))
+        self.hex_layer = SpriteLayer(SpriteAtlas.from_arrays(hex_sprites), locs[self.hexes], frame_shape)
+
+        marker_sprites = {f'chit:{c}': chit_sprite(unit, c) for c in range(2, 13) if c != 7}
+        marker_sprites['robber'] = disc_sprite(4 * unit + 1, 1.3 * unit, ROBBER_COLOR)
+        self.marker_layer = SpriteLayer(SpriteAtlas.from_arrays(marker_sprites), locs[self.hexes], frame_shape)
+
+        road_sprites = {}
+        for path_type in PATH_TYPES:
+            example = next(tile for tile in tiles if tile.tile_type == path_type)
+            end = np.subtract(tiles[example.connections[0]].loc, example.loc) * 0.8
+            road_sprites[path_type.name] = segment_sprite(unit, tuple(end), 0.35 * unit)
+        self.road_layer = SpriteLayer(SpriteAtlas.from_arrays(road_sprites), locs[self.paths], frame_shape)
+        self.path_sprite = np.array([self.road_layer.atlas.index[tiles[p].tile_type.name] for p in self.paths])
+
+        building_sprites = {'settlement': house_sprite(unit, 0.7), 'city': house_sprite(unit, 1.1)}
+        self.building_layer = SpriteLayer(SpriteAtlas.from_arrays(building_sprites), locs[self.isecs], frame_shape)
+
+        hex_index = self.hex_layer.atlas.index
+        self._terrain_sprite = np.array([hex_index[f'terrain:{t.value}'] for t in Terrain])
+        self._ship_sprite = np.array([hex_index['sea']] + [hex_index[f'ship:{s.value}'] for s in list(TradeShip)[1:]])
+        self._chit_sprite = np.full(13, -1)
+        for c in range(2, 13):
+            self._chit_sprite[c] = self.marker_layer.atlas.index.get(f'chit:{c}', -1)
+        self._building_sprite = np.full(len(Building), -1)
+        self._building_sprite[Building.Settlement.value] = self.building_layer.atlas.index['settlement']
+        self._building_sprite[Building.City.value] = self.building_layer.atlas.index['city']
+        self._is_land = self.environment[self.hexes] == Environment.Land.value
+
+    @classmethod
+    def for_board(cls, board: BoardData, resolution: tuple[int, int] = (640, 360), margin: int = 5) -> BoardRenderer:
+        """ Renderer for a board of the default HEX_ENVS grid at the given resolution; see for_layout for others """
+        from game_loading.default_board import HEX_ENVS
+        hex_board = HexBoard(resolution, n_hexes_yaxis=len(HEX_ENVS), n_hexes_xaxis=len(HEX_ENVS[0]), margin=margin)
+        if len(hex_board.tiles) != board.n_tiles:
+            raise ValueError('Board and hex board have different tiles')
+        return cls(hex_board.tiles, hex_board.resolution, board.environment)
+
+    @classmethod
+    def for_layout(cls, compiled: CompiledLayout, unit: int = 3, margin: int = 4) -> BoardRenderer:
+        """ Renderer for a compiled layout of any shape, unit pixels per 1/8 hex and margin pixels around it """
+        locs = np.asarray(compiled.loc, dtype=np.int64)
+        locs = (locs - locs.min(axis=0)) // lattice_unit(locs) * unit + margin
+        connections = np.asarray(compiled.connections)
+        types = np.select([compiled.space == Space.Hex.value, compiled.space == Space.Intersection.value],
+                          [TileType.Hex.value, TileType.Intersection.value], -1)
+        tiles = [
+            TileInfo(i, TileType(types[i]) if types[i] >= 0 else
+                     get_path_type(*(tuple(locs[end]) for end in connections[i, :2])),
+                     tuple(map(int, locs[i])), tuple(map(int, connections[i])))
+            for i in range(len(locs))
+        ]
+        height, width = locs.max(axis=0) + margin + 1
+        return cls(tiles, (int(width), int(height)), np.asarray(compiled.environment))
+
+    def _draw_base(self, objects: npt.NDArray[np.uint8], chit: npt.NDArray[np.uint8]) -> None:
+        hex_objects = objects[self.hexes]
+        key = hex_objects.tobytes() + chit[self.hexes].tobytes()
+        if key == self._base_key:
+            return
+        self.base[:] = BACKGROUND
+        sprites = np.where(self._is_land, self._terrain_sprite[np.minimum(hex_objects, len(Terrain) - 1)],
+                           self._ship_sprite[np.minimum(hex_objects, len(TradeShip) - 1)])
+        self.hex_layer.draw(self.base, sprites)
+        self.marker_layer.draw(self.base, self._chit_sprite[np.minimum(chit[self.hexes], 12)])
+        self._base_key = key
+
+    def render(self, objects: npt.NDArray[np.uint8], owner: npt.NDArray[np.uint8], chit: npt.NDArray[np.uint8],
+               robber: int) -> npt.NDArray[np.uint8]:
+        """ Draws one game state; returns the frame buffer itself (copy it to keep the image) """
+        self._draw_base(objects, chit)
+        np.copyto(self.frame, self.base)
+        colors = self.player_colors[np.where(owner == NO_OWNER, 0, owner) % len(self.player_colors)]
+
+        path_objects = objects[self.paths]
+        roads = np.where(path_objects == Building.Road.value, self.path_sprite, -1)
+        self.road_layer.draw(self.frame, roads, colors[self.paths])
+        buildings = self._building_sprite[np.minimum(objects[self.isecs], len(Building) - 1)]
+        self.building_layer.draw(self.frame, buildings, colors[self.isecs])
+
+        robber_sprite = np.full(len(self.hexes), -1)
+        robber_sprite[np.flatnonzero(self.hexes == robber)] = self.marker_layer.atlas.index['robber']
+        self.marker_layer.draw(self.frame, robber_sprite)
+        return self.frame
+
+    def render_board(self, board: BoardData) -> npt.NDArray[np.uint8]:
+        return self.render(board.objects, board.owner, board.chit, board.robber)
+
+    def render_game(self, data: BatchedGameData, g: int) -> npt.NDArray[np.uint8]:
+        return self.render(data.objects[g], data.owner[g], data.chit[g], int(data.robber[g]))
+
+    def recorder(self, chunk_size: int = 256) -> FrameRecorder:
+        return FrameRecorder(self.frame.shape, chunk_size)
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+    from game_loading.default_board import make_default_board
+    from game_loading.board_generator import BoardGenerator
+    from batched_engine import BatchedEngine
+
+    board = BoardData(make_default_board())
+    engine = BatchedEngine(board=board, n_games=1, seed=0, generator=BoardGenerator(board, seed=0))
+    renderer = BoardRenderer.for_board(board)
+    recorder = renderer.recorder()
+    d = engine.data
+    n_frames, start = 300, time.perf_counter()
+    for _ in range(n_frames):
+        mask = engine.action_mask()
+        engine.step(*engine.decode_actions(np.argmax(mask + engine.rng.random(mask.shape), axis=1)))
+        recorder.add(renderer.render_game(d, 0))
+    elapsed = time.perf_counter() - start
+    print(f'{n_frames / elapsed:,.0f} frames/s including engine steps at {renderer.resolution}')
+    start = time.perf_counter()
+    for _ in range(n_frames):
+        renderer.render_game(d, 0)
+    print(f'{n_frames / (time.perf_counter() - start):,.0f} frames/s rendering only')
+    if len(sys.argv) > 1:
+        recorder.save_video(sys.argv[1], fps=30)
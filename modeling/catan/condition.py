@@ -1,36 +1,113 @@
 from __future__ import annotations
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields, InitVar
+from enum import Enum
 import numpy as np
 import numpy.typing as npt
-from typing import Any, Optional, Callable, Protocol
+from typing import Any, Optional, Callable, Protocol, Hashable, ClassVar, TYPE_CHECKING
+import functools
+
+if TYPE_CHECKING:
+    from instrumentation import Profiler
 
 
 @dataclass
 class ConditionKeeper:
-    status_memo: dict[str, bool | npt.NDArray[bool]] = field(init=False)
+    """
+    Memoizes condition statuses against version counters of the game data fields each condition reads
+    Mutators call touch() with the dotted field paths they changed (e.g. BoardData.place touches 'board.owner')
+    An attached instrumentation.Profiler counts every get_status per condition
+    """
+    status_memo: dict[str, tuple[Hashable, bool | npt.NDArray[bool]]] = field(init=False)
+    field_versions: dict[str, int] = field(init=False)
+    profiler: Optional[Profiler] = field(init=False, repr=False)
 
     def __post_init__(self):
         self.status_memo = {}
+        self.field_versions = {}
+        self.profiler = None
+        self._direct_touches: dict[str, int] = {}
+        self._n_touches = 0
+
+    def touch(self, *paths: str) -> None:
+        """ Marks the given dotted field paths (and everything stored under them) as changed """
+        self._n_touches += 1
+        for path in paths:
+            self._direct_touches[path] = self._direct_touches.get(path, 0) + 1
+            parts = path.split('.')
+            for depth in range(1, len(parts) + 1):
+                prefix = '.'.join(parts[:depth])
+                self.field_versions[prefix] = self.field_versions.get(prefix, 0) + 1
+
+    def stamp(self, dependencies: Optional[frozenset[str]]) -> Hashable:
+        """ Changes whenever any of the dependencies (or a field containing one) is touched; None depends on all """
+        if dependencies is None:
+            return self._n_touches
+        versions, direct = self.field_versions, self._direct_touches
+        return tuple(
+            (versions.get(path, 0), *(direct.get(prefix, 0) for prefix in _prefixes(path)))
+            for path in sorted(dependencies)
+        )
 
     def get_status(self, condition: Condition) -> bool | npt.NDArray[bool]:
-        if condition.identifier in self.status_memo:
-            return self.status_memo[condition.identifier]
+        """ Returned arrays are shared with the memo and must not be modified """
+        if self.profiler is not None:
+            return self.profiler.condition_status(self, condition)
+        return self.memo_status(condition)[0]
+
+    def memo_status(self, condition: Condition) -> tuple[bool | npt.NDArray[bool], bool]:
+        """ Status and whether it came from the memo """
+        stamp = self.stamp(condition.dependencies)
+        memo = self.status_memo.get(condition.identifier)
+        if memo is not None and memo[0] == stamp:
+            return memo[1], True
+
+        status = condition.check(self)
+        self.status_memo[condition.identifier] = (stamp, status)
+        return status, False
 
-        self.status_memo[condition.identifier] = condition.check(self)
-        print(f'{condition.identifier}: {self.status_memo[condition.identifier]}')
-        return self.status_memo[condition.identifier].copy()
+
+def _prefixes(path: str) -> list[str]:
+    parts = path.split('.')
+    return ['.'.join(parts[:depth]) for depth in range(1, len(parts))]
+
+
+def modifies(*paths: str) -> Callable:
+    """ Decorates a request handler func(context, *args) to touch the given field paths after it runs """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(context: ConditionKeeper, *args):
+            result = func(context, *args)
+            context.touch(*paths)
+            return result
+        return wrapper
+    return decorator
 
 
 @dataclass
 class Condition:
     value: Optional[int] = field(kw_only=True, default=None)
+    reads: ClassVar[Optional[tuple[str, ...]]] = None  # dotted GameData field paths checked; None = anything
 
-    @property
+    @functools.cached_property
+    def dependencies(self) -> Optional[frozenset[str]]:
+        return None if self.reads is None else frozenset(self.reads)
+
+    @functools.cached_property
     def identifier(self) -> str:
         if self.value is None:
             return self.__class__.__name__
         return f'{self.__class__.__name__}_{self.value}'
 
+    @property
+    def structure_key(self) -> Hashable:
+        """ Structurally identical leaf conditions share this key (falls back to object identity if unhashable) """
+        key = (type(self), tuple(getattr(self, f.name) for f in fields(self)))
+        try:
+            hash(key)
+        except TypeError:
+            return type(self), id(self)
+        return key
+
     def get_status(self, keeper: ConditionKeeper) -> bool | npt.NDArray[bool]:
         return keeper.get_status(self)
 
@@ -47,14 +124,23 @@ class Condition:
         return InvertCondition(cond=self)
 
 
+def union_dependencies(conditions: list[Condition]) -> Optional[frozenset[str]]:
+    deps = [cond.dependencies for cond in conditions]
+    return None if any(d is None for d in deps) else frozenset().union(*deps)
+
+
 @dataclass
 class AnyTrue(Condition):
     condition: Condition = field(default=None)
 
-    @property
+    @functools.cached_property
     def identifier(self) -> str:
         return f'any_{self.condition.identifier}'
 
+    @functools.cached_property
+    def dependencies(self) -> Optional[frozenset[str]]:
+        return self.condition.dependencies
+
     def check(self, keeper: ConditionKeeper) -> bool | npt.NDArray[bool]:
         return np.any(self.condition.check(keeper))
 
@@ -63,10 +149,14 @@ class AnyTrue(Condition):
 class LogicalAndCondition(Condition):
     conditions: list[Condition] = field(kw_only=True, default_factory=list)
 
-    @property
+    @functools.cached_property
     def identifier(self) -> str:
         return '&'.join(cond.identifier for cond in self.conditions)
 
+    @functools.cached_property
+    def dependencies(self) -> Optional[frozenset[str]]:
+        return union_dependencies(self.conditions)
+
     def check(self, keeper: ConditionKeeper) -> bool | npt.NDArray[bool]:
         return np.logical_and.reduce([keeper.get_status(cond) for cond in self.conditions])
 
@@ -75,10 +165,14 @@ class LogicalAndCondition(Condition):
 class LogicalOrCondition(Condition):
     conditions: list[Condition] = field(kw_only=True, default_factory=list)
 
-    @property
+    @functools.cached_property
     def identifier(self) -> str:
         return '|'.join(cond.identifier for cond in self.conditions)
 
+    @functools.cached_property
+    def dependencies(self) -> Optional[frozenset[str]]:
+        return union_dependencies(self.conditions)
+
     def check(self, keeper: ConditionKeeper) -> bool | npt.NDArray[bool]:
         return np.logical_or.reduce([keeper.get_status(cond) for cond in self.conditions])
 
@@ -87,14 +181,137 @@ class LogicalOrCondition(Condition):
 class InvertCondition(Condition):
     cond: Condition = field(kw_only=True, default=None)
 
-    @property
+    @functools.cached_property
     def identifier(self) -> str:
-        return f'~{self.cond}'
+        return f'~{self.cond.identifier}'
+
+    @functools.cached_property
+    def dependencies(self) -> Optional[frozenset[str]]:
+        return self.cond.dependencies
 
     def check(self, keeper: ConditionKeeper) -> bool | npt.NDArray[bool]:
         return np.invert(keeper.get_status(self.cond))
 
 
+class PlanOp(Enum):
+    Leaf = 0
+    And = 1
+    Or = 2
+    Invert = 3
+    Any = 4
+
+
+@dataclass
+class PlanNode:
+    op: PlanOp
+    inputs: tuple[int, ...] = ()
+    condition: Optional[Condition] = None  # leaves only
+
+
+@dataclass
+class ConditionPlan:
+    """
+    Flat, topologically ordered evaluation plan for one or more Condition trees
+    Structurally identical subexpressions (commutative And/Or included) compile to a single node;
+    evaluation checks each leaf once and runs every other node as in-place NumPy ops over preallocated buffers
+    """
+    roots: InitVar[list[Condition]]
+    nodes: list[PlanNode] = field(init=False, default_factory=list)
+    outputs: list[int] = field(init=False, default_factory=list)
+    leaves: list[int] = field(init=False, default_factory=list)
+    _buffers: list[npt.NDArray[bool]] = field(init=False, default_factory=list, repr=False)
+    _program: list[tuple[int, tuple[int, ...], list[tuple[Callable, tuple, Optional[npt.NDArray[bool]]]]]] = \
+        field(init=False, default_factory=list, repr=False)
+    _stamps: dict[int, Hashable] = field(init=False, default_factory=dict, repr=False)
+
+    def __post_init__(self, roots: list[Condition]):
+        index: dict[Hashable, int] = {}
+        self.outputs = [self._add(root, index) for root in roots]
+        self.leaves = [i for i, node in enumerate(self.nodes) if node.op == PlanOp.Leaf]
+
+    def _add(self, cond: Condition, index: dict[Hashable, int]) -> int:
+        if isinstance(cond, (LogicalAndCondition, LogicalOrCondition)):
+            op = PlanOp.And if isinstance(cond, LogicalAndCondition) else PlanOp.Or
+            inputs = tuple(dict.fromkeys(self._add(c, index) for c in cond.conditions))
+            key = (op, frozenset(inputs))
+        elif isinstance(cond, (InvertCondition, AnyTrue)):
+            op = PlanOp.Invert if isinstance(cond, InvertCondition) else PlanOp.Any
+            inputs = (self._add(cond.cond if op == PlanOp.Invert else cond.condition, index),)
+            key = (op, inputs)
+        else:
+            op, inputs, key = PlanOp.Leaf, (), cond.structure_key
+
+        if key not in index:
+            self.nodes.append(PlanNode(op, inputs, cond if op == PlanOp.Leaf else None))
+            index[key] = len(self.nodes) - 1
+        return index[key]
+
+    def _bind(self, leaf_shapes: dict[int, tuple[int, ...]]) -> None:
+        """ Allocates one buffer per node and resolves every op to (ufunc, input buffers, output buffer) calls """
+        shapes = []
+        for i, node in enumerate(self.nodes):
+            if node.op == PlanOp.Leaf:
+                shapes.append(leaf_shapes[i])
+            elif node.op == PlanOp.Any:
+                shapes.append(())
+            else:
+                shapes.append(np.broadcast_shapes(*(shapes[j] for j in node.inputs)))
+        self._buffers = [np.empty(shape, dtype=bool) for shape in shapes]
+
+        self._program = []
+        for i, node in enumerate(self.nodes):
+            out, ins = self._buffers[i], [self._buffers[j] for j in node.inputs]
+            calls = []
+            if node.op in (PlanOp.And, PlanOp.Or):
+                ufunc = np.logical_and if node.op == PlanOp.And else np.logical_or
+                if len(ins) == 1:
+                    calls.append((np.copyto, (out, ins[0]), None))
+                else:
+                    calls.append((ufunc, (ins[0], ins[1]), out))
+                    calls.extend((ufunc, (out, other), out) for other in ins[2:])
+            elif node.op == PlanOp.Invert:
+                calls.append((np.logical_not, (ins[0],), out))
+            elif node.op == PlanOp.Any:
+                calls.append((np.logical_or.reduce, (ins[0].reshape(-1),), out))
+            if calls:
+                self._program.append((i, node.inputs, calls))
+
+    def evaluate(self, keeper: ConditionKeeper) -> list[npt.NDArray[bool]]:
+        """
+        Returns the value of each root condition, in the order given at compile time
+        Only leaves whose dependencies were touched since the last call are checked again, and only nodes
+        downstream of them are recomputed; returned arrays are plan buffers, overwritten by the next call
+        """
+        bound = bool(self._buffers)
+        stamps = {i: keeper.stamp(self.nodes[i].condition.dependencies) for i in self.leaves}
+        stale = [i for i in self.leaves if not bound or self._stamps.get(i) != stamps[i]]
+        results = {i: np.asarray(self.nodes[i].condition.check(keeper), dtype=bool) for i in stale}
+        if not bound or any(results[i].shape != self._buffers[i].shape for i in stale):
+            results.update({i: np.asarray(self.nodes[i].condition.check(keeper), dtype=bool)
+                            for i in self.leaves if i not in results})
+            self._bind({i: r.shape for i, r in results.items()})
+        self._stamps = stamps
+
+        dirty = [False] * len(self.nodes)
+        for i, result in results.items():
+            np.copyto(self._buffers[i], result)
+            dirty[i] = True
+        for i, inputs, calls in self._program:
+            if not any(dirty[j] for j in inputs):
+                continue
+            dirty[i] = True
+            for func, args, out in calls:
+                if out is None:
+                    func(*args)
+                else:
+                    func(*args, out=out)
+        return [self._buffers[i] for i in self.outputs]
+
+
+def compile_conditions(*conditions: Condition) -> ConditionPlan:
+    return ConditionPlan(list(conditions))
+
+
 #
 # @dataclass
 # class TestA(Condition):
@@ -0,0 +1,253 @@
+"""
+Board layouts of any shape declared as hexes at axial (q, r) coordinates (pointy-top, r grows downwards)
+Tiles are numbered like hex_topology (hexes, intersections, then paths), so the default rows compile to
+exactly the tiles of make_default_board
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from catan_objects import Space, Environment
+from hex_board import CSRAdjacency
+from hex_board.board_maker import ISEC_OFFSETS, PATH_OFFSETS
+from gamedata.layout import BoardLayout
+from game_loading.compiled_layout import CompiledLayout, LAYOUT_FORMAT, LAYOUT_SOURCES, source_digest
+from game_loading.default_board import (
+    DockOrientation, OBJECT_DEFAULTS, HEX_ENVS, SEA_HEX_CONNECTIONS, TRADE_SHIP_PLACEMENTS
+)
+from typing import Optional, Sequence, Union
+import hashlib
+import json
+import numpy as np
+import numpy.typing as npt
+
+
+Axial = tuple[int, int]
+Dock = tuple[int, int, DockOrientation]   # (q, r, orientation) of a sea hex
+ROW_LEGEND = {'S': Environment.Sea, 'L': Environment.Land, '.': None}
+AXIAL_DIRECTIONS = ((1, 0), (1, -1), (0, -1), (-1, 0), (-1, 1), (0, 1))
+
+
+def offset_to_axial(row: int, column: int) -> Axial:
+    """ Axial coordinates of an offset grid position (odd rows shifted right, as in HEX_ENVS) """
+    return column - (row - (row & 1)) // 2, row
+
+
+def hex_ring(radius: int, center: Axial = (0, 0)) -> list[Axial]:
+    """ Hexes exactly radius steps from center """
+    if radius == 0:
+        return [center]
+    q, r = center[0] - radius, center[1] + radius
+    ring = []
+    for dq, dr in AXIAL_DIRECTIONS:
+        for _ in range(radius):
+            ring.append((q, r))
+            q, r = q + dq, r + dr
+    return ring
+
+
+@dataclass
+class AxialLayoutSpec:
+    """
+    Hex environments by axial coordinate, and the docks of the trade ship hexes in placement order
+    (the order of CompiledLayout.dock_hexes, i.e. of the board generator's trade ship slots)
+    """
+    hexes: dict[Axial, Environment]
+    docks: list[Dock] = field(default_factory=list)
+
+    def __post_init__(self):
+        if not self.hexes:
+            raise ValueError('AxialLayoutSpec needs at least one hex')
+        for q, r, orientation in self.docks:
+            if (q, r) not in self.hexes:
+                raise ValueError(f'Dock at {(q, r)} is not on a hex of the layout')
+        if len({(q, r) for q, r, _ in self.docks}) != len(self.docks):
+            raise ValueError('Every hex holds at most one dock')
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Union[str, Sequence[Optional[Environment]]]], docks: Sequence = (),
+                  legend: dict[str, Optional[Environment]] = None) -> AxialLayoutSpec:
+        """
+        From offset grid rows (odd rows shifted right), either lists of Environments (None for no hex) or
+        strings of space separated legend symbols; docks are (row, column, DockOrientation) in the same grid
+        """
+        legend = ROW_LEGEND if legend is None else legend
+        hexes = {}
+        for y, row in enumerate(rows):
+            cells = [legend[symbol] for symbol in row.split()] if isinstance(row, str) else row
+            hexes.update({offset_to_axial(y, x): env for x, env in enumerate(cells) if env is not None})
+        return cls(hexes, [(*offset_to_axial(y, x), orientation) for y, x, orientation in docks])
+
+    @classmethod
+    def from_land(cls, land: Sequence[Axial], sea_rings: int = 1, docks: Sequence[Dock] = ()) -> AxialLayoutSpec:
+        """ Land hexes surrounded by sea_rings rings of sea hexes """
+        hexes = dict.fromkeys(map(tuple, land), Environment.Land)
+        border = set(hexes)
+        for _ in range(sea_rings):
+            border = {(q + dq, r + dr) for q, r in border for dq, dr in AXIAL_DIRECTIONS} - set(hexes)
+            hexes.update(dict.fromkeys(sorted(border), Environment.Sea))
+        return cls(hexes, list(docks))
+
+    @classmethod
+    def hexagon(cls, land_radius: int, sea_rings: int = 1, docks: Sequence[Dock] = ()) -> AxialLayoutSpec:
+        """ A hexagon of land hexes land_radius rings around (0, 0), surrounded by sea """
+        return cls.from_land([h for radius in range(land_radius + 1) for h in hex_ring(radius)], sea_rings, docks)
+
+    @classmethod
+    def from_dict(cls, spec: dict) -> AxialLayoutSpec:
+        """
+        From a JSON-style dict: {"rows": [...]} (see from_rows; docks as [row, column, orientation name]) or
+        {"hexes": [[q, r, environment name], ...]} (docks as [q, r, orientation name]),
+        with an optional "legend" of symbol -> environment name (or null) for rows
+        """
+        docks = [(a, b, DockOrientation[name]) for a, b, name in spec.get('docks', [])]
+        if 'rows' in spec:
+            legend = None if 'legend' not in spec else {
+                symbol: None if name is None else Environment[name] for symbol, name in spec['legend'].items()}
+            return cls.from_rows(spec['rows'], docks, legend)
+        return cls({(q, r): Environment[name] for q, r, name in spec['hexes']}, docks)
+
+    @classmethod
+    def load(cls, path: str) -> AxialLayoutSpec:
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def to_dict(self) -> dict:
+        return {
+            'hexes': [[q, r, env.name] for (q, r), env in sorted(self.hexes.items())],
+            'docks': [[q, r, orientation.name] for q, r, orientation in self.docks],
+        }
+
+    @property
+    def key(self) -> str:
+        """ Cache key of the compiled layout (see compiled_layout.load_default_layout) """
+        sources = source_digest(LAYOUT_SOURCES + ('game_loading.axial_layout',))
+        return hashlib.blake2b(repr([LAYOUT_FORMAT, 'axial', self.to_dict(), sources]).encode(),
+                               digest_size=16).hexdigest()
+
+    def compile(self) -> CompiledLayout:
+        return compile_axial_layout(self)
+
+
+def _pairs_to_index(pairs: npt.NDArray[np.int64]) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.intp]]:
+    """ Unique lattice points of (..., 2) pairs in reading order, and each pair's position among them """
+    points, inverse = np.unique(pairs.reshape(-1, 2), axis=0, return_inverse=True)
+    return points, inverse.reshape(pairs.shape[:-1])
+
+
+def compile_axial_layout(spec: AxialLayoutSpec) -> CompiledLayout:
+    """ Tiles, environments, connections and dock intersections of spec, as a CompiledLayout """
+    axial = np.array(list(spec.hexes), dtype=np.int64).reshape(-1, 2)
+    centers = np.stack([6 * axial[:, 1], 8 * axial[:, 0] + 4 * axial[:, 1]], axis=1)
+    centers += 4 - centers.min(axis=0)
+    order = np.lexsort((centers[:, 1], centers[:, 0]))
+    axial, centers = axial[order], centers[order]
+    hex_env = np.array([spec.hexes[tuple(a)].value for a in axial.tolist()], dtype=np.uint8)
+
+    isec_locs, hex_isecs = _pairs_to_index(centers[:, None] + np.array(ISEC_OFFSETS))    # (hexes, 6) corners
+    path_locs, hex_paths = _pairs_to_index(centers[:, None] + np.array(PATH_OFFSETS))    # (hexes, 6) sides
+    n_hexes, n_isecs, n_paths = len(centers), len(isec_locs), len(path_locs)
+    hex_isecs += n_hexes
+    hex_paths += n_hexes + n_isecs
+    n_tiles = n_hexes + n_isecs + n_paths
+
+    # corner i of a hex lies between its sides i and i + 1
+    hex_ids = np.broadcast_to(np.arange(n_hexes)[:, None], hex_isecs.shape)
+    links = np.concatenate([
+        np.stack([hex_ids, hex_isecs], axis=-1).reshape(-1, 2),
+        np.stack([hex_isecs, hex_paths], axis=-1).reshape(-1, 2),
+        np.stack([hex_isecs, np.roll(hex_paths, -1, axis=1)], axis=-1).reshape(-1, 2),
+    ])
+    links = np.unique(np.concatenate([links, links[:, ::-1]]), axis=0)
+    offsets = np.zeros(n_tiles + 1, dtype=np.int64)
+    np.cumsum(np.bincount(links[:, 0], minlength=n_tiles), out=offsets[1:])
+    connections = CSRAdjacency(offsets, links[:, 1].astype(np.int32)).padded().astype(np.uint16)
+
+    space = np.repeat([Space.Hex.value, Space.Intersection.value, Space.Path.value],
+                      [n_hexes, n_isecs, n_paths]).astype(np.uint8)
+    environment = np.zeros(n_tiles, dtype=np.uint8)
+    environment[:n_hexes] = hex_env
+    # intersections: Land without sea hexes around, Sea without land hexes, Coast otherwise (make_default_board)
+    corner_env = np.broadcast_to(hex_env[:, None], hex_isecs.shape)
+    touches = {env: np.zeros(n_tiles, dtype=bool) for env in (Environment.Land, Environment.Sea)}
+    for env, touched in touches.items():
+        touched[hex_isecs[corner_env == env.value]] = True
+    isecs = np.arange(n_hexes, n_hexes + n_isecs)
+    environment[isecs] = np.select(
+        [~touches[Environment.Sea][isecs], ~touches[Environment.Land][isecs]],
+        [Environment.Land.value, Environment.Sea.value], Environment.Coast.value)
+    # paths: Land next to a land intersection, else Sea next to a sea intersection, else Coast
+    path_ends = links[(links[:, 0] >= n_hexes + n_isecs)]
+    end_env = environment[path_ends[:, 1]]
+    near = {env: np.zeros(n_tiles, dtype=bool) for env in (Environment.Land, Environment.Sea)}
+    for env, touched in near.items():
+        touched[path_ends[end_env == env.value, 0]] = True
+    paths = np.arange(n_hexes + n_isecs, n_tiles)
+    environment[paths] = np.select(
+        [near[Environment.Land][paths], near[Environment.Sea][paths]],
+        [Environment.Land.value, Environment.Sea.value], Environment.Coast.value)
+
+    # a dock hex keeps only its two dock intersections as connections, like SEA_HEX_CONNECTIONS does
+    index_of = {tuple(a): i for i, a in enumerate(axial.tolist())}
+    dock_hexes = np.array([index_of[(q, r)] for q, r, _ in spec.docks], dtype=np.intp)
+    corners = np.sort(hex_isecs, axis=1)           # reading order: N, NW, NE, SW, SE, S
+    dock_isecs = np.sort(np.array(
+        [corners[h, list(orientation.connections)] for h, (_, _, orientation) in zip(dock_hexes, spec.docks)],
+        dtype=np.int64).reshape(-1, 2), axis=1)
+    connections[dock_hexes] = dock_isecs[:, [1]]
+    connections[dock_hexes, 0] = dock_isecs[:, 0]
+
+    defaults = np.zeros(len(Space), dtype=np.uint8)
+    for tile_space, default in OBJECT_DEFAULTS.items():
+        defaults[tile_space.value] = default.value
+    objects = defaults[space]
+    loc = np.concatenate([centers, isec_locs, path_locs]).astype(np.int32)
+    return CompiledLayout(
+        key=spec.key,
+        space=space,
+        environment=environment,
+        objects=objects,
+        chit=np.zeros(n_tiles, dtype=np.uint8),
+        connections=connections,
+        loc=loc,
+        dock_hexes=dock_hexes.astype(np.uint16),
+        dock_isecs=dock_isecs.astype(np.uint16),
+        layout=BoardLayout.build(space, connections)
+    )
+
+
+def default_spec() -> AxialLayoutSpec:
+    """ The default board (HEX_ENVS, with the SEA_HEX_CONNECTIONS docks in TRADE_SHIP_PLACEMENTS order) """
+    n_columns = len(HEX_ENVS[0])
+    dock_corners = {hex_index: tuple(sorted(conns)) for group, conns in SEA_HEX_CONNECTIONS.items()
+                    for hex_index in group}
+    orientation_of = {tuple(sorted(o.connections)): o for o in DockOrientation}
+    docks = [(*divmod(h, n_columns), orientation_of[dock_corners[h]]) for group in TRADE_SHIP_PLACEMENTS for h in group]
+    return AxialLayoutSpec.from_rows(HEX_ENVS, docks)
+
+
+def expansion_spec(sea_rings: int = 1) -> AxialLayoutSpec:
+    """ The five-six player board shape: 30 land hexes in centered rows of 3-4-5-6-5-4-3, without docks """
+    return AxialLayoutSpec.from_land([(q, r) for r, length in zip(range(-3, 4), (3, 4, 5, 6, 5, 4, 3))
+                                      for q in range((2 - length - r) // 2, (2 + length - r) // 2)], sea_rings)
+
+
+if __name__ == '__main__':
+    import time
+    from game_loading.default_board import make_default_board
+    from gamedata.board import BoardData
+
+    default = default_spec().compile()
+    board = BoardData(make_default_board())
+    for name in ('space', 'environment', 'objects', 'chit', 'connections'):
+        assert np.array_equal(getattr(default, name), getattr(board, name)), name
+    assert np.array_equal(default.dock_isecs, board.connections[default.dock_hexes.astype(np.intp), :2])
+    print('default board: identical tiles, environments and connections')
+
+    expansion = expansion_spec().compile()
+    n_land = np.count_nonzero(expansion.environment[expansion.layout.hexes] == Environment.Land.value)
+    print(f'expansion board: {n_land} land hexes, {len(expansion.space)} tiles')
+    for radius in (5, 10, 50):
+        start = time.perf_counter()
+        spec = AxialLayoutSpec.hexagon(radius)
+        compiled = spec.compile()
+        print(f'hexagon({radius}): {len(spec.hexes)} hexes, {len(compiled.space)} tiles in '
+              f'{time.perf_counter() - start:.2f}s')
@@ -0,0 +1,156 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from catan_objects import Terrain, Environment, TradeShip
+from gamedata.board import BoardData
+from game_loading.default_board import TERRAIN_COUNTS, CHITS, TRADE_SHIP_TILES, TRADE_SHIP_PLACEMENTS
+from tools import enum_value
+from typing import Optional
+import numpy as np
+import numpy.typing as npt
+
+
+RED_CHITS = (6, 8)
+
+
+@dataclass
+class RandomBoards:
+    """
+    n boards worth of hex contents, indexed like hexes (the board's hex tile indices)
+    objects hold Terrain values on land hexes and TradeShip values on sea hexes
+    """
+    hexes: npt.NDArray[np.intp]
+    objects: npt.NDArray[np.uint8]     # (boards, hexes)
+    chits: npt.NDArray[np.uint8]       # (boards, hexes)
+    robber: npt.NDArray[np.uint16]     # (boards,), the desert hex
+
+    def __len__(self) -> int:
+        return len(self.objects)
+
+
+@dataclass
+class BoardGenerator:
+    """
+    Draws batches of boards from a seeded Generator: shuffled terrains and chits on the land hexes, trade ships
+    dealt onto trade_ship_placements, redrawing only the boards that break a constraint (adjacent red chits,
+    more than max_same_terrain same-terrain neighbors)
+    """
+    board: BoardData
+    terrain_counts: dict[Terrain, int] = field(default_factory=lambda: dict(TERRAIN_COUNTS))
+    chit_counts: dict[int, int] = field(default_factory=lambda: dict(CHITS))
+    trade_ship_tiles: list[tuple[TradeShip, ...]] = field(default_factory=lambda: list(TRADE_SHIP_TILES))
+    trade_ship_placements: list[tuple[int, ...]] = field(default_factory=lambda: list(TRADE_SHIP_PLACEMENTS))
+    separate_red_chits: bool = True
+    max_same_terrain: int = 1
+    max_rounds: int = 100
+    seed: Optional[int] = None
+    rng: np.random.Generator = field(init=False, repr=False)
+    hexes: npt.NDArray[np.intp] = field(init=False, repr=False)
+    land: npt.NDArray[np.intp] = field(init=False, repr=False)          # positions in hexes
+    edges: npt.NDArray[np.intp] = field(init=False, repr=False)         # (pairs, 2) adjacent land positions
+    incidence: npt.NDArray[np.int32] = field(init=False, repr=False)    # (pairs, land)
+    terrain_pile: npt.NDArray[np.uint8] = field(init=False, repr=False)
+    chit_pile: npt.NDArray[np.uint8] = field(init=False, repr=False)
+    ship_groups: npt.NDArray[np.uint8] = field(init=False, repr=False)  # (groups, slots)
+    ship_slots: npt.NDArray[np.intp] = field(init=False, repr=False)    # (placements, slots), positions in hexes
+
+    def __post_init__(self):
+        board = self.board
+        self.rng = np.random.default_rng(self.seed)
+        self.hexes = board.layout.hexes
+        self.land = np.flatnonzero(board.environment[self.hexes] == Environment.Land.value)
+        position = np.full(board.n_tiles, -1)
+        position[self.hexes[self.land]] = np.arange(len(self.land))
+        edges = np.stack([position[tiles] for tiles in board.layout.pairs(2)], axis=1)  # hexes sharing a corner
+        self.edges = edges[(edges[:, 0] >= 0) & (edges[:, 0] < edges[:, 1])]
+        self.incidence = np.zeros((len(self.edges), len(self.land)), dtype=np.int32)
+        self.incidence[np.arange(len(self.edges))[:, None], self.edges] = 1
+
+        self.terrain_pile = np.repeat(
+            [enum_value(t) for t in self.terrain_counts], list(self.terrain_counts.values())).astype(np.uint8)
+        self.chit_pile = np.repeat(list(self.chit_counts), list(self.chit_counts.values())).astype(np.uint8)
+        n_deserts = int(np.sum(self.terrain_pile == Terrain.Desert.value))
+        if len(self.terrain_pile) != len(self.land) or len(self.chit_pile) != len(self.land) - n_deserts:
+            raise ValueError(f'{len(self.land)} land hexes need as many terrains and a chit per non-desert, got '
+                             f'{len(self.terrain_pile)} terrains and {len(self.chit_pile)} chits')
+
+        self.ship_groups = np.array([[enum_value(s) for s in group] for group in self.trade_ship_tiles],
+                                    dtype=np.uint8)
+        position = {int(tile): i for i, tile in enumerate(self.hexes)}
+        self.ship_slots = np.array([[position[t] for t in group] for group in self.trade_ship_placements])
+        if self.ship_groups.shape != self.ship_slots.shape:
+            raise ValueError('Every trade ship placement needs a trade ship group of the same size')
+
+    def _shuffled(self, pile: npt.NDArray[np.uint8], n: int) -> npt.NDArray[np.uint8]:
+        return pile[np.argsort(self.rng.random((n, len(pile))), axis=1)]
+
+    def _sample(self, n: int, draw, accept) -> npt.NDArray:
+        """ Rejection sampling in batches: redraws only the rows that failed, oversampled by the accept rate """
+        out, pending, rate = None, np.arange(n), 1.
+        for _ in range(self.max_rounds):
+            k = len(pending)
+            tries = min(max(4, int(np.ceil(1.5 / max(rate, 1e-3)))), 1024)
+            candidates = draw(np.repeat(pending, tries))
+            ok = accept(candidates).reshape(k, tries)
+            rate = max(ok.mean(), 1e-3)
+            if out is None:
+                out = np.zeros((n,) + candidates.shape[1:], dtype=candidates.dtype)
+            found = ok.any(axis=1)
+            first = np.argmax(ok, axis=1)[found]
+            out[pending[found]] = candidates.reshape((k, tries) + candidates.shape[1:])[found, first]
+            pending = pending[~found]
+            if not len(pending):
+                return out
+        raise RuntimeError(f'Board constraints unsatisfied after {self.max_rounds} rounds; relax them')
+
+    def terrains(self, n: int) -> npt.NDArray[np.uint8]:
+        """ (n, land) terrain values """
+        def accept(terrain):
+            same = terrain[:, self.edges[:, 0]] == terrain[:, self.edges[:, 1]]
+            return (same.astype(np.int32) @ self.incidence).max(axis=1, initial=0) <= self.max_same_terrain
+        return self._sample(n, lambda rows: self._shuffled(self.terrain_pile, len(rows)), accept)
+
+    def chits(self, terrain: npt.NDArray[np.uint8]) -> npt.NDArray[np.uint8]:
+        """ (n, land) chits for the given terrains, 0 on deserts """
+        chit_slots = np.argsort(terrain == Terrain.Desert.value, axis=1, kind='stable')[:, :len(self.chit_pile)]
+
+        def draw(rows):
+            chits = np.zeros((len(rows), len(self.land)), dtype=np.uint8)
+            np.put_along_axis(chits, chit_slots[rows], self._shuffled(self.chit_pile, len(rows)), axis=1)
+            return chits
+
+        def accept(chits):
+            if not self.separate_red_chits:
+                return np.ones(len(chits), dtype=bool)
+            red = np.isin(chits, RED_CHITS)
+            return ~np.any(red[:, self.edges[:, 0]] & red[:, self.edges[:, 1]], axis=1)
+        return self._sample(len(terrain), draw, accept)
+
+    def trade_ships(self, n: int) -> npt.NDArray[np.uint8]:
+        """ (n, hexes) TradeShip values, each group of slots dealt to a random placement """
+        groups = np.argsort(self.rng.random((n, len(self.ship_groups))), axis=1)
+        ships = np.zeros((n, len(self.hexes)), dtype=np.uint8)
+        ships[:, self.ship_slots.ravel()] = self.ship_groups[groups].reshape(n, -1)
+        return ships
+
+    def generate(self, n: int) -> RandomBoards:
+        terrain = self.terrains(n)
+        objects = self.trade_ships(n)
+        objects[:, self.land] = terrain
+        chits = np.zeros((n, len(self.hexes)), dtype=np.uint8)
+        chits[:, self.land] = self.chits(terrain)
+        desert = self.land[np.argmax(terrain == Terrain.Desert.value, axis=1)]
+        return RandomBoards(self.hexes, objects, chits, self.hexes[desert].astype(np.uint16))
+
+
+if __name__ == '__main__':
+    import time
+    from game_loading.default_board import make_default_board
+
+    generator = BoardGenerator(BoardData(make_default_board()), seed=0)
+    start = time.perf_counter()
+    boards = generator.generate(10_000)
+    print(f'{len(boards) / (time.perf_counter() - start):,.0f} boards/s')
+    for hex_index, obj, chit in zip(boards.hexes, boards.objects[0], boards.chits[0]):
+        if obj:
+            print(hex_index, Terrain(obj).name if hex_index in generator.hexes[generator.land] else TradeShip(obj).name,
+                  chit or '')
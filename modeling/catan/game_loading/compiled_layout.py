@@ -0,0 +1,143 @@
+from __future__ import annotations
+from dataclasses import dataclass, fields
+from gamedata.board import BoardData
+from gamedata.layout import BoardLayout, register_layout
+from typing import Optional
+import hashlib
+import importlib.util
+import itertools
+import os
+import shutil
+import tempfile
+import numpy as np
+import numpy.typing as npt
+
+
+LAYOUT_FORMAT = 2  # bump whenever the saved files change; edits to LAYOUT_SOURCES change the key by themselves
+CACHE_ENV_VAR = 'CATAN_LAYOUT_CACHE'
+TILE_ARRAYS = ('space', 'environment', 'objects', 'chit', 'connections', 'loc', 'dock_hexes', 'dock_isecs')
+LAYOUT_SOURCES = (
+    'hex_board.board_maker', 'hex_board.adjacency', 'hex_board.calculations', 'hex_board.tiles',
+    'catan_objects', 'tools', 'game_loading.default_board', 'game_loading.compiled_layout',
+    'gamedata.board', 'gamedata.layout',
+)
+
+
+def default_cache_dir() -> str:
+    return os.environ.get(CACHE_ENV_VAR, os.path.join(os.path.expanduser('~'), '.cache', 'catan_layouts'))
+
+
+def source_digest(modules: Optional[tuple[str, ...]] = None) -> str:
+    """ Hash of the source files of the given modules (LAYOUT_SOURCES if None), found without importing them """
+    digest = hashlib.blake2b(digest_size=16)
+    for name in LAYOUT_SOURCES if modules is None else modules:
+        with open(importlib.util.find_spec(name).origin, 'rb') as f:
+            digest.update(name.encode() + b'\0' + f.read())
+    return digest.hexdigest()
+
+
+def default_layout_key() -> str:
+    """ Hash of every input make_default_board depends on, the sources of the code producing the layout included """
+    from game_loading import default_board as db
+    inputs = [
+        LAYOUT_FORMAT, db.BOARD_RESOLUTION, db.BOARD_MARGIN,
+        [[env.name for env in row] for row in db.HEX_ENVS],
+        sorted(db.SEA_HEX_CONNECTIONS.items()),
+        db.TRADE_SHIP_PLACEMENTS,
+        source_digest(),
+    ]
+    return hashlib.blake2b(repr(inputs).encode(), digest_size=16).hexdigest()
+
+
+@dataclass(frozen=True)
+class CompiledLayout:
+    """
+    Everything derived from a board layout, as flat arrays that can be stored as .npy files and memory-mapped
+    Tile arrays are indexed by tile; dock_isecs lists the two dock intersections of each trade ship hex
+    """
+    key: str
+    space: npt.NDArray[np.uint8]
+    environment: npt.NDArray[np.uint8]
+    objects: npt.NDArray[np.uint8]
+    chit: npt.NDArray[np.uint8]
+    connections: npt.NDArray[np.uint16]
+    loc: npt.NDArray[np.int32]
+    dock_hexes: npt.NDArray[np.uint16]
+    dock_isecs: npt.NDArray[np.uint16]
+    layout: BoardLayout
+
+    @classmethod
+    def compile(cls, key: str, tile_data: list, dock_hexes: list[int]) -> CompiledLayout:
+        """ From ConvertedTiles (whose dock hexes' connections are already reduced to their docks) """
+        board = BoardData(tile_data)
+        return cls(
+            key=key,
+            space=board.space,
+            environment=board.environment,
+            objects=board.objects.copy(),
+            chit=board.chit,
+            connections=board.connections,
+            loc=np.array([tile.loc for tile in tile_data], dtype=np.int32),
+            dock_hexes=np.array(dock_hexes, dtype=np.uint16),
+            dock_isecs=np.array([tile_data[h].connections[:2] for h in dock_hexes], dtype=np.uint16),
+            layout=board.layout
+        )
+
+    def save(self, directory: str) -> str:
+        """
+        Writes one .npy per array into directory/key; the files appear atomically (written to a temporary
+        directory, then renamed), so concurrent workers either find a complete layout or build their own
+        """
+        path = os.path.join(directory, self.key)
+        os.makedirs(directory, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=f'{self.key}.', dir=directory)
+        for name in TILE_ARRAYS:
+            np.save(os.path.join(tmp, f'{name}.npy'), getattr(self, name))
+        for f in fields(self.layout):
+            np.save(os.path.join(tmp, f'layout_{f.name}.npy'), getattr(self.layout, f.name))
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not os.path.isdir(path):
+                raise
+        return path
+
+    @classmethod
+    def load(cls, directory: str, key: str, mmap_mode: Optional[str] = 'r') -> CompiledLayout:
+        """ Loads a saved layout; with mmap_mode='r' all processes share the arrays through the page cache """
+        path = os.path.join(directory, key)
+        load = lambda name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+        layout = BoardLayout(**{f.name: load(f'layout_{f.name}') for f in fields(BoardLayout)})
+        return cls(key=key, **{name: load(name) for name in TILE_ARRAYS}, layout=layout)
+
+    def board_data(self) -> BoardData:
+        """ A fresh BoardData on this layout; the shared lookup tables are not rebuilt """
+        register_layout(self.space, self.connections, self.layout)
+        return BoardData.from_arrays(self.space, self.environment, self.objects, self.chit, self.connections)
+
+
+def load_default_layout(cache_dir: Optional[str] = None) -> CompiledLayout:
+    """ The default board's compiled layout, built and saved by the first process that asks for it """
+    cache_dir = default_cache_dir() if cache_dir is None else cache_dir
+    key = default_layout_key()
+    if not os.path.isdir(os.path.join(cache_dir, key)):
+        from game_loading.default_board import make_default_board, TRADE_SHIP_PLACEMENTS
+        dock_hexes = list(itertools.chain.from_iterable(TRADE_SHIP_PLACEMENTS))
+        CompiledLayout.compile(key, make_default_board(), dock_hexes).save(cache_dir)
+    return CompiledLayout.load(cache_dir, key)
+
+
+if __name__ == '__main__':
+    import time
+
+    start = time.perf_counter()
+    from game_loading.default_board import make_default_board
+    BoardData(make_default_board())
+    print(f'make_default_board + BoardData: {time.perf_counter() - start:.3f}s')
+
+    load_default_layout()
+    start = time.perf_counter()
+    compiled = load_default_layout()
+    compiled.board_data()
+    print(f'load_default_layout + board_data: {time.perf_counter() - start:.3f}s ({compiled.key})')
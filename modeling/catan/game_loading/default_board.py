@@ -29,6 +29,9 @@ HEX_ENVS = [
     [S, S, S, S, S, S, S]
 ]
 
+BOARD_RESOLUTION = (1920, 1080)
+BOARD_MARGIN = 5
+
 
 OBJECT_DEFAULTS = {
     Space.Hex: Terrain.NoTerrain,
@@ -172,10 +175,10 @@ def make_default_board():
                 tile_data[i].connections = [c[k] for k in conns]
     #
     hb = HexBoard(
-        resolution=(1920, 1080),
+        resolution=BOARD_RESOLUTION,
         n_hexes_yaxis=len(HEX_ENVS),
         n_hexes_xaxis=len(HEX_ENVS[0]),
-        margin=5
+        margin=BOARD_MARGIN
     )
 
     tile_data = [
@@ -203,7 +206,7 @@ TERRAIN_COUNTS = {
     Terrain.Mountain: 3,
     Terrain.Desert: 1
 }
-CHITS = {c: 2 if c not in (2, 12) else 1 for c in range(2, 13)}
+CHITS = {c: 2 if c not in (2, 12) else 1 for c in range(2, 13) if c != 7}
 
 
 def randomize_chits_terrains():
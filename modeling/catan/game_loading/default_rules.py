@@ -0,0 +1,82 @@
+from dataclasses import dataclass, field
+from catan_objects import Resource, DevelopmentCard, Space, Environment, Terrain, Building, TradeShip
+
+
+@dataclass
+class BuildingSpec:
+    building: Building
+    space_req: Space
+    env_req: list[Environment]
+    building_req: Building
+    resource_cost: dict[Resource, int] = field(default_factory=dict)
+    build_limit: int = 0
+    resource_yield: int = 0
+    victory_points: int = 0
+
+
+DEFAULT_BUILDINGS = [
+    BuildingSpec(
+        building=Building.Settlement,
+        space_req=Space.Intersection,
+        env_req=[Environment.Land, Environment.Coast],
+        building_req=Building.NoBuilding,
+        resource_cost={Resource.Brick: 1, Resource.Lumber: 1, Resource.Wool: 1, Resource.Grain: 1},
+        build_limit=5,
+        resource_yield=1,
+        victory_points=1
+    ),
+    BuildingSpec(
+        building=Building.City,
+        space_req=Space.Intersection,
+        env_req=[Environment.Land, Environment.Coast],
+        building_req=Building.Settlement,
+        resource_cost={Resource.Grain: 2, Resource.Ore: 3},
+        build_limit=4,
+        resource_yield=2,
+        victory_points=2
+    ),
+    BuildingSpec(
+        building=Building.Road,
+        space_req=Space.Path,
+        env_req=[Environment.Land, Environment.Coast],
+        building_req=Building.NoBuilding,
+        resource_cost={Resource.Brick: 1, Resource.Lumber: 1},
+        build_limit=15
+    )
+]
+
+TERRAIN_RESOURCES = {
+    Terrain.Hill: Resource.Brick,
+    Terrain.Forest: Resource.Lumber,
+    Terrain.Pasture: Resource.Wool,
+    Terrain.Field: Resource.Grain,
+    Terrain.Mountain: Resource.Ore
+}
+
+DEV_CARD_COUNTS = {
+    DevelopmentCard.Knight: 14,
+    DevelopmentCard.RoadBuilding: 2,
+    DevelopmentCard.YearOfPlenty: 2,
+    DevelopmentCard.Monopoly: 2,
+    DevelopmentCard.VictoryPoint: 5
+}
+DEV_CARD_COST = {Resource.Wool: 1, Resource.Grain: 1, Resource.Ore: 1}
+
+DISCARD_LIMIT = 7  # players holding more cards than this discard half of them on a 7
+ROAD_BUILDING_ROADS = 2
+YEAR_OF_PLENTY_PICKS = 2
+
+BANK_TRADE_RATIO = 4
+TRADE_SHIP_RATIOS = {
+    TradeShip.BrickShip: {Resource.Brick: 2},
+    TradeShip.LumberShip: {Resource.Lumber: 2},
+    TradeShip.WoolShip: {Resource.Wool: 2},
+    TradeShip.GrainShip: {Resource.Grain: 2},
+    TradeShip.OreShip: {Resource.Ore: 2},
+    TradeShip.AllShip: {resource: 3 for resource in Resource}
+}
+VICTORY_POINTS_TO_WIN = 10
+LONGEST_ROAD_MIN = 5
+LONGEST_ROAD_POINTS = 2
+LARGEST_ARMY_MIN = 3
+LARGEST_ARMY_POINTS = 2
@@ -0,0 +1,380 @@
+"""
+Append-only binary log of self-play games: each game's starting board and valid actions with the random
+outcomes they drew, which is all BatchedEngine needs to replay it; read through a memory map
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from collections import OrderedDict
+from catan_objects import *
+from gamedata.board import BoardData, NO_OWNER
+from gamedata.snapshot import Snapshot
+from game_loading.board_generator import RandomBoards
+from batched_engine import BatchedEngine, N_OUTCOMES
+from typing import Optional, Iterator
+import mmap
+import os
+import struct
+import zlib
+import numpy as np
+import numpy.typing as npt
+
+
+# file = header, hexes (n_hexes uint16), chunk*, where header = MAGIC, LOG_FORMAT, layout key, n_tiles, n_hexes,
+# n_players and chunk = CHUNK_MAGIC, flags, n_games, n_records, records size, stored size, game table, records
+MAGIC, CHUNK_MAGIC = b'CATANLOG', b'CHNK'
+LOG_FORMAT = 2
+COMPRESSED = 1
+HEADER = struct.Struct('<8sI32sIII')
+CHUNK_HEADER = struct.Struct('<4sIIIQQ')
+RECORD_DTYPE = np.dtype([
+    ('event', 'u1'), ('request', 'u1'), ('arg', '<i4'), ('outcomes', 'u1', (N_OUTCOMES,))
+])
+
+
+def game_dtype(n_hexes: int) -> np.dtype:
+    return np.dtype([
+        ('first', '<u4'),        # index of the game's first record in its chunk
+        ('n_records', '<u4'),
+        ('winner', 'u1'),        # NO_OWNER if the game ended without a winner (max_turns)
+        ('robber', '<u2'),
+        ('objects', 'u1', (n_hexes,)),
+        ('chits', 'u1', (n_hexes,)),
+    ])
+
+
+@dataclass(frozen=True)
+class Chunk:
+    offset: int              # of the records in the file
+    flags: int
+    n_games: int
+    n_records: int
+    raw_nbytes: int
+    nbytes: int              # stored size of the records
+
+
+@dataclass
+class GameLogWriter:
+    """
+    Buffers finished games and appends them to path one chunk of chunk_games games at a time
+    An existing log is appended to, provided it was written for the same layout; a chunk cut short by an
+    interrupted write is truncated away first
+    """
+    path: str
+    layout_key: str
+    hexes: npt.NDArray[np.integer]
+    n_tiles: int
+    n_players: int = 4
+    chunk_games: int = 1024
+    compress: bool = True
+    level: int = 1
+    games: list[npt.NDArray] = field(init=False, default_factory=list, repr=False)
+    records: list[npt.NDArray] = field(init=False, default_factory=list, repr=False)
+    dtype: np.dtype = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.hexes = np.asarray(self.hexes, dtype=np.uint16)
+        self.dtype = game_dtype(len(self.hexes))
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            with open(self.path, 'r+b') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:  # only the chunk headers are read
+                    header = read_header(data)
+                    end = scan_chunks(data, len(self.hexes))[2]
+                    size = len(data)
+                if header != (self.layout_key, self.n_tiles, self.n_players, tuple(self.hexes.tolist())):
+                    raise ValueError(f'{self.path} is a log of a different layout')
+                if end < size:
+                    f.truncate(end)
+        else:
+            with open(self.path, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, LOG_FORMAT, self.layout_key.encode(), self.n_tiles, len(self.hexes),
+                                    self.n_players))
+                f.write(self.hexes.tobytes())
+
+    def add(self, objects: npt.NDArray[np.uint8], chits: npt.NDArray[np.uint8], robber: int, winner: int,
+            records: npt.NDArray) -> None:
+        """ One finished game: its starting hex objects/chits/robber, its winner and its RECORD_DTYPE records """
+        game = np.zeros((), dtype=self.dtype)
+        game['n_records'], game['winner'], game['robber'] = len(records), winner, robber
+        game['objects'], game['chits'] = objects, chits
+        self.games.append(game)
+        self.records.append(records)
+        if len(self.games) >= self.chunk_games:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.games:
+            return
+        games = np.stack(self.games)
+        records = np.concatenate(self.records).astype(RECORD_DTYPE, copy=False)
+        games['first'] = np.concatenate(([0], np.cumsum(games['n_records'])[:-1]))
+        raw = records.tobytes()
+        stored = zlib.compress(raw, self.level) if self.compress else raw
+        with open(self.path, 'ab') as f:
+            f.write(CHUNK_HEADER.pack(CHUNK_MAGIC, COMPRESSED if self.compress else 0, len(games), len(records),
+                                      len(raw), len(stored)))
+            f.write(games.tobytes())
+            f.write(stored)
+        self.games.clear()
+        self.records.clear()
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> GameLogWriter:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_header(data: bytes | mmap.mmap) -> tuple[str, int, int, tuple[int, ...]]:
+    magic, version, key, n_tiles, n_hexes, n_players = HEADER.unpack_from(data)
+    if magic != MAGIC or version != LOG_FORMAT:
+        raise ValueError('Not a game log of this format')
+    hexes = np.frombuffer(data, dtype=np.uint16, count=n_hexes, offset=HEADER.size)
+    return key.decode(), n_tiles, n_players, tuple(hexes.tolist())
+
+
+def scan_chunks(data: bytes | mmap.mmap, n_hexes: int) -> tuple[list[Chunk], list[npt.NDArray], int]:
+    """ The complete chunks of a log, their game tables (views into data) and the offset where they end """
+    dtype = game_dtype(n_hexes)
+    offset, chunks, tables = HEADER.size + 2 * n_hexes, [], []
+    while offset + CHUNK_HEADER.size <= len(data):
+        magic, flags, n_games, n_records, raw_nbytes, nbytes = CHUNK_HEADER.unpack_from(data, offset)
+        table = offset + CHUNK_HEADER.size
+        chunk = Chunk(table + n_games * dtype.itemsize, flags, n_games, n_records, raw_nbytes, nbytes)
+        complete = magic == CHUNK_MAGIC and n_games > 0 and raw_nbytes == n_records * RECORD_DTYPE.itemsize
+        if not complete or chunk.offset + nbytes > len(data):
+            break  # a chunk cut short by an interrupted write
+        chunks.append(chunk)
+        tables.append(np.frombuffer(data, dtype=dtype, count=n_games, offset=table))
+        offset = chunk.offset + nbytes
+    return chunks, tables, offset
+
+
+@dataclass
+class GameRecorder:
+    """
+    Steps a BatchedEngine and logs each game's valid actions and random outcomes as it goes
+    A game is written when it finishes; unfinished games are dropped on close
+    """
+    engine: BatchedEngine
+    writer: GameLogWriter
+    staging: npt.NDArray = field(init=False, repr=False)             # (steps, games) records
+    lengths: npt.NDArray[np.intp] = field(init=False, repr=False)    # (games,)
+    starts: dict[str, npt.NDArray] = field(init=False, repr=False)   # starting boards of the running games
+    n_games_logged: int = field(init=False, default=0)
+
+    def __post_init__(self):
+        self.staging = np.zeros((256, self.engine.n_games), dtype=RECORD_DTYPE)
+        self.lengths = np.zeros(self.engine.n_games, dtype=np.intp)
+        self.starts = {}
+        self._start(np.arange(self.engine.n_games))
+
+    def _start(self, g: npt.NDArray[np.intp]) -> None:
+        d, hexes = self.engine.data, self.writer.hexes
+        for name, values in (('objects', d.objects[g[:, None], hexes]), ('chits', d.chit[g[:, None], hexes]),
+                             ('robber', d.robber[g])):
+            if name not in self.starts:
+                self.starts[name] = np.zeros((self.engine.n_games, *values.shape[1:]), dtype=values.dtype)
+            self.starts[name][g] = values
+        self.lengths[g] = 0
+
+    def step(self, requests: npt.NDArray[np.integer], args: npt.NDArray[np.integer]
+             ) -> tuple[npt.NDArray[np.float32], npt.NDArray[bool], npt.NDArray[bool]]:
+        """ BatchedEngine.step, logging the step's valid actions """
+        engine = self.engine
+        event, actor = engine.data.event.copy(), engine.data.cur_player.copy()
+        rewards, done, valid = engine.step(requests, args)
+        g = np.flatnonzero(valid)
+        if len(g):
+            if self.lengths.max() >= len(self.staging):
+                self.staging = np.concatenate((self.staging, np.zeros_like(self.staging)))
+            at = (self.lengths[g], g)
+            self.staging['event'][at], self.staging['request'][at] = event[g], np.asarray(requests)[g]
+            self.staging['arg'][at], self.staging['outcomes'][at] = np.asarray(args)[g], engine.outcomes[g]
+            self.lengths[g] += 1
+        if done.any():
+            finished = np.flatnonzero(done)
+            for game in finished:
+                winner = actor[game] if rewards[game] > 0 else NO_OWNER
+                self.writer.add(self.starts['objects'][game], self.starts['chits'][game],
+                                int(self.starts['robber'][game]), int(winner),
+                                self.staging[:self.lengths[game], game].copy())
+            self.n_games_logged += len(finished)
+            self._start(finished)
+        return rewards, done, valid
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+@dataclass
+class GameLog:
+    """ Read access to a game log through a memory map; compressed chunks are inflated on demand """
+    path: str
+    cache_chunks: int = 4
+    layout_key: str = field(init=False)
+    n_tiles: int = field(init=False)
+    n_players: int = field(init=False)
+    hexes: npt.NDArray[np.intp] = field(init=False, repr=False)
+    chunks: list[Chunk] = field(init=False, default_factory=list, repr=False)
+    games: npt.NDArray = field(init=False, repr=False)               # game table of every chunk
+    chunk_of: npt.NDArray[np.intp] = field(init=False, repr=False)   # (games,) chunk of each game
+    _map: Optional[mmap.mmap] = field(init=False, default=None, repr=False)
+    _cache: OrderedDict = field(init=False, default_factory=OrderedDict, repr=False)
+
+    def __post_init__(self):
+        with open(self.path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.layout_key, self.n_tiles, self.n_players, hexes = read_header(self._map)
+        self.hexes = np.array(hexes, dtype=np.intp)
+        self.chunks, tables, _ = scan_chunks(self._map, len(self.hexes))
+        self.games = np.concatenate(tables) if tables else np.zeros(0, dtype=game_dtype(len(self.hexes)))
+        self.chunk_of = np.repeat(np.arange(len(self.chunks)), [c.n_games for c in self.chunks])
+
+    def __len__(self) -> int:
+        return len(self.games)
+
+    def _records(self, c: int) -> memoryview | bytes:
+        chunk = self.chunks[c]
+        if not chunk.flags & COMPRESSED:
+            return memoryview(self._map)[chunk.offset:chunk.offset + chunk.nbytes]
+        if c not in self._cache:
+            self._cache[c] = zlib.decompress(self._map[chunk.offset:chunk.offset + chunk.nbytes])
+            if len(self._cache) > self.cache_chunks:
+                self._cache.popitem(last=False)
+        self._cache.move_to_end(c)
+        return self._cache[c]
+
+    def records(self, game: int) -> npt.NDArray:
+        """ The RECORD_DTYPE records of one game (read-only, zero-copy for uncompressed chunks) """
+        c = int(self.chunk_of[game])
+        chunk, row = self.chunks[c], self.games[game]
+        return np.frombuffer(self._records(c), dtype=RECORD_DTYPE, count=int(row['n_records']),
+                             offset=int(row['first']) * RECORD_DTYPE.itemsize)
+
+    def boards(self, games: npt.NDArray[np.integer] | int) -> RandomBoards:
+        rows = self.games[np.atleast_1d(games)]
+        return RandomBoards(self.hexes, rows['objects'], rows['chits'], rows['robber'])
+
+    def __iter__(self) -> Iterator[npt.NDArray]:
+        for game in range(len(self)):
+            yield self.records(game)
+
+    def close(self) -> None:
+        self.games = self.games.copy()
+        self._cache.clear()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def __enter__(self) -> GameLog:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+@dataclass
+class GameReplay:
+    """
+    Reconstructs one logged game after any number of its actions by replaying them with their recorded outcomes
+    A snapshot every keyframe_interval actions bounds the cost of a seek once the game has been played through
+    """
+    log: GameLog
+    game: int
+    board: Optional[BoardData] = None    # the log's layout; the default board's compiled layout if None
+    keyframe_interval: int = 64
+    engine: BatchedEngine = field(init=False, repr=False)
+    records: npt.NDArray = field(init=False, repr=False)
+    keyframes: dict[int, Snapshot] = field(init=False, default_factory=dict, repr=False)
+    position: int = field(init=False, default=0)
+
+    def __post_init__(self):
+        if self.keyframe_interval < 1:
+            raise ValueError('keyframe_interval must be positive')
+        if self.board is None:
+            from game_loading.compiled_layout import load_default_layout
+            layout = load_default_layout()
+            if layout.key != self.log.layout_key:
+                raise ValueError('Log was not written on the default layout; pass its board')
+            self.board = layout.board_data()
+        if self.board.n_tiles != self.log.n_tiles:
+            raise ValueError('Board does not match the log layout')
+        self.engine = BatchedEngine(board=self.board, n_games=1, n_players=self.log.n_players, auto_reset=False)
+        self.engine.forced = np.zeros((1, N_OUTCOMES), dtype=np.uint8)
+        self.records = self.log.records(self.game)
+        self.engine.reset(self.log.boards(self.game))
+        self.keyframes[0] = self.engine.snapshot()
+
+    @property
+    def n_steps(self) -> int:
+        return len(self.records)
+
+    @property
+    def data(self):
+        return self.engine.data
+
+    def _advance(self) -> None:
+        record = self.records[self.position]
+        if self.engine.data.event[0] != record['event']:
+            raise ValueError(f'Replay of game {self.game} diverged at step {self.position}')
+        self.engine.forced[0] = record['outcomes']
+        _, _, valid = self.engine.step(record['request'][None], record['arg'][None])
+        if not valid[0]:
+            raise ValueError(f'Replay of game {self.game} diverged at step {self.position}')
+        self.position += 1
+        if self.position % self.keyframe_interval == 0:
+            self.keyframes.setdefault(self.position, self.engine.snapshot())
+
+    def seek(self, step: int):
+        """ Puts the engine in the state after the game's first step actions and returns its BatchedGameData """
+        if not 0 <= step <= self.n_steps:
+            raise ValueError(f'Game {self.game} has {self.n_steps} steps')
+        base = max(k for k in self.keyframes if k <= step)
+        if not base <= self.position <= step:
+            self.engine.restore(self.keyframes[base])
+            self.position = base
+        while self.position < step:
+            self._advance()
+        return self.engine.data
+
+    def snapshot(self, step: int) -> Snapshot:
+        self.seek(step)
+        return self.engine.snapshot()
+
+
+if __name__ == '__main__':
+    import sys
+    import tempfile
+    import time
+    from game_loading.board_generator import BoardGenerator
+    from game_loading.compiled_layout import load_default_layout
+
+    compiled = load_default_layout()
+    board = compiled.board_data()
+    engine = BatchedEngine(board=board, n_games=256, seed=0, max_turns=200, generator=BoardGenerator(board, seed=0))
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(tempfile.mkdtemp(), 'games.log')
+    hexes = np.flatnonzero(board.space == Space.Hex.value)
+    writer = GameLogWriter(path, compiled.key, hexes, board.n_tiles, chunk_games=256)
+    recorder = GameRecorder(engine, writer)
+    n_steps, start = 3000, time.perf_counter()
+    for _ in range(n_steps):
+        mask = engine.action_mask()
+        recorder.step(*engine.decode_actions(np.argmax(mask + engine.rng.random(mask.shape), axis=1)))
+    recorder.close()
+    elapsed = time.perf_counter() - start
+    print(f'{n_steps * engine.n_games / elapsed:,.0f} recorded env-steps/s, {recorder.n_games_logged} games')
+
+    with GameLog(path) as log:
+        n_records = sum(len(records) for records in log)
+        print(f'{os.path.getsize(path) / max(1, n_records):.2f} bytes per action over {len(log)} games')
+        replay = GameReplay(log, 0, board)
+        start = time.perf_counter()
+        replay.seek(replay.n_steps)
+        elapsed = time.perf_counter() - start
+        print(f'replay: {replay.n_steps / elapsed:,.0f} steps/s; seek(n/2) after keyframes:', end=' ')
+        start = time.perf_counter()
+        replay.seek(replay.n_steps // 2)
+        print(f'{(time.perf_counter() - start) * 1000:.2f} ms')
@@ -2,8 +2,17 @@ from __future__ import annotations
 from dataclasses import dataclass, field, InitVar
 from catan_objects import Request, Event
 from condition import Condition
-from typing import Protocol, Callable
+from typing import Protocol, Callable, Mapping, Optional, TYPE_CHECKING
+from types import MappingProxyType
 from abc import ABC, abstractmethod
+import numpy as np
+import numpy.typing as npt
+
+if TYPE_CHECKING:
+    from instrumentation import Profiler
+
+
+Handler = Callable[..., object]
 
 
 @dataclass
@@ -21,6 +30,8 @@ class GameState(ABC):
     Allows mapping custom functions/methods to handle requests in different ways for various game states
     """
     _context: GameContext = field(default=None, repr=False)
+    event: Optional[Event] = field(default=None, repr=False)        # set when registered in a StateMap
+    profiler: Optional[Profiler] = field(default=None, repr=False)
 
     @property
     def context(self) -> GameContext:
@@ -33,12 +44,26 @@ class GameState(ABC):
     def handle_request(self, request: Request, *args) -> None:
         """ Looks up which function/method to call for given request
         in _request_handling and passes arguments to that function """
-        func = self.request_functions[request]
-        func(self.context, *args)
+        if self.profiler is not None:
+            self.profiler.handle(self.event, request, self.handlers[request.value], self.context, *args,
+                                 defined=request in self.request_functions)
+            return
+        self.handlers[request.value](self.context, *args)
 
-    def handle_undefined_request(self) -> None:
+    def handle_undefined_request(self, context: GameContext = None, *args) -> None:
         return
 
+    @property
+    def handlers(self) -> list[Callable[[GameContext, ...], None]]:
+        """ request_functions compiled to a list indexed by Request.value, undefined requests included """
+        handlers = self.__dict__.get('_handlers')
+        if handlers is None:
+            handlers = [self.handle_undefined_request] * len(Request)
+            for request, func in self.request_functions.items():
+                handlers[request.value] = func
+            self.__dict__['_handlers'] = handlers
+        return handlers
+
     @property
     @abstractmethod
     def request_functions(self) -> dict[Request, Callable[[GameContext, ...], None]]:
@@ -50,13 +75,107 @@ class StateMap(dict):
     data: InitVar[dict[Event, GameState]]
     _state_map: dict[int, GameState] = field(default_factory=dict)
 
+    _table: Optional[DispatchTable] = field(init=False, default=None, repr=False)
+
     def __post_init__(self, data: dict[Event, GameState]):
         for event, state in data.items():
-            self.register(event.value, state)
+            self.register(event, state)
 
     @property
-    def state_map(self) -> dict[int, GameState]:
-        return self._state_map.copy()
+    def state_map(self) -> Mapping[int, GameState]:
+        return MappingProxyType(self._state_map)
+
+    @property
+    def table(self) -> DispatchTable:
+        """ Dispatch table of every registered state, compiled on first use after a registration """
+        if self._table is None:
+            self._table = DispatchTable.from_states(self._state_map)
+        return self._table
 
     def register(self, event: Event, state: GameState):
+        state.event = event
         self._state_map[event.value] = state
+        self._table = None
+
+
+@dataclass
+class DispatchTable:
+    """
+    Request handlers in a dense [Event.value][Request.value] table, so dispatching an action is two list
+    indexings instead of a state lookup plus a dict lookup
+    Slots with no handler hold undefined_handler (and are False in defined)
+    """
+    handlers: list[list[Handler]]
+    undefined_handler: Handler
+    defined: npt.NDArray[bool] = field(init=False, repr=False)           # (events, requests)
+    profiler: Optional[Profiler] = field(init=False, default=None, repr=False)
+    _flat: list[Handler] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.defined = np.array([[h is not self.undefined_handler for h in row] for row in self.handlers])
+        self._flat = [h for row in self.handlers for h in row]
+
+    @classmethod
+    def from_handlers(cls, handlers: Mapping[tuple[Event, Request], Handler],
+                      undefined_handler: Handler = None) -> DispatchTable:
+        """ From {(event, request): handler} """
+        undefined_handler = undefined_request if undefined_handler is None else undefined_handler
+        table = [[undefined_handler] * len(Request) for _ in Event]
+        for (event, request), handler in handlers.items():
+            table[event.value][request.value] = handler
+        return cls(table, undefined_handler)
+
+    @classmethod
+    def from_states(cls, states: Mapping[int, GameState]) -> DispatchTable:
+        """
+        From a StateMap's {Event.value: GameState}; each handler is called with its state's current context
+        Requests a state does not define go to that state's handle_undefined_request
+        """
+        table = [[undefined_request] * len(Request) for _ in Event]
+        for event, state in states.items():
+            table[event] = [_bind_context(state, func) for func in state.handlers]
+        dispatch = cls(table, undefined_request)
+        for event, state in states.items():
+            dispatch.defined[event] = [request in state.request_functions for request in Request]
+        return dispatch
+
+    def lookup(self, event: Event | int, request: Request | int) -> Handler:
+        return self.handlers[getattr(event, 'value', event)][getattr(request, 'value', request)]
+
+    def handle_request(self, event: Event | int, request: Request | int, *args) -> object:
+        if self.profiler is not None:
+            event, request = Event(getattr(event, 'value', event)), Request(getattr(request, 'value', request))
+            return self.profiler.handle(event, request, self.lookup(event, request), *args,
+                                        defined=bool(self.defined[event.value, request.value]))
+        return self.lookup(event, request)(*args)
+
+    def handle_requests(self, events: npt.NDArray[np.integer], requests: npt.NDArray[np.integer],
+                        args: npt.NDArray[np.integer]) -> npt.NDArray[bool]:
+        """
+        Batched dispatch of one (event, request, arg) action per game: each defined handler is called once as
+        handler(games, args) with the games that sent it and returns which of them were valid (None meaning all)
+        Requests outside the table (e.g. negative) and undefined slots are invalid
+        """
+        n_events, n_requests = self.defined.shape
+        events, requests = np.asarray(events, dtype=np.intp), np.asarray(requests, dtype=np.intp)
+        codes = events * n_requests + requests
+        codes[(events < 0) | (events >= n_events) | (requests < 0) | (requests >= n_requests)] = -1
+        valid = np.zeros(len(codes), dtype=bool)
+        present = np.bincount(codes + 1, minlength=n_events * n_requests + 1)[1:]
+        for code in np.flatnonzero(present.astype(bool) & self.defined.ravel()):
+            games = np.flatnonzero(codes == code)
+            if self.profiler is not None:
+                event, request = divmod(int(code), n_requests)
+                ok = self.profiler.handle_batch(Event(event), Request(request), self._flat[code], games, args[games])
+            else:
+                ok = self._flat[code](games, args[games])
+            valid[games] = True if ok is None else ok
+        return valid
+
+
+def undefined_request(*args) -> None:
+    return
+
+
+def _bind_context(state: GameState, func: Callable[[GameContext, ...], None]) -> Handler:
+    return lambda *args: func(state.context, *args)
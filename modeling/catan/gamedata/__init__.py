@@ -1,16 +1,20 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
 from condition import ConditionKeeper
 from .board import BoardData
 from .building_data import BuildingData
-from .development import DevelopmentData
-from .event import EventData
-from .resources import ResourceData
-from .status import StatusData
-from .trade import TradeData
+from .observation import ObservationLayout, ObservationBuffer
 import numpy as np
 import numpy.typing as npt
 
+if TYPE_CHECKING:
+    from .development import DevelopmentData
+    from .event import EventData
+    from .resources import ResourceData
+    from .status import StatusData
+    from .trade import TradeData
+
 
 @dataclass
 class GameData(ConditionKeeper):
@@ -22,6 +26,10 @@ class GameData(ConditionKeeper):
     board: BoardData
     buildings: BuildingData
 
+    def __post_init__(self):
+        super().__post_init__()
+        self.board.keeper = self
+
     def package_observation(self) -> dict[str, npt.NDArray[np.uint8]]:
         cur_player = self.status.cur_player
         return {
@@ -32,3 +40,22 @@ class GameData(ConditionKeeper):
             **self.development.package_observation(cur_player),
             **self.board.package_observation(cur_player)
         }
+
+    def observation_layout(self) -> ObservationLayout:
+        return ObservationLayout(self.package_observation())
+
+    def write_observation(self, out: ObservationBuffer) -> None:
+        """ Fills a preallocated buffer from observation_layout() in place of building a new dict """
+        cur_player = self.status.cur_player
+        for data, args in [
+            (self.status, ()),
+            (self.event, ()),
+            (self.resources, (cur_player,)),
+            (self.trade, (cur_player,)),
+            (self.development, (cur_player,)),
+            (self.board, (cur_player,))
+        ]:
+            if hasattr(data, 'write_observation'):
+                data.write_observation(out.views, *args)
+            else:  # sub-datas defined outside this package still build their dict once per call
+                out.write(data.package_observation(*args))
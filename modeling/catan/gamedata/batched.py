@@ -0,0 +1,266 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from catan_objects import *
+from .board import BoardData, NO_OWNER
+from .building_data import BuildingData
+from .observation import ObservationBuffer
+from .snapshot import Snapshot, state_buffer
+from .zobrist import byte_keys, bytes_hash
+from .bitboard import PLANES, PLANE_OF, NO_PLANE, n_words, pack, tile_bit
+from typing import Optional, TYPE_CHECKING
+if TYPE_CHECKING:
+    from game_loading.board_generator import RandomBoards
+import numpy as np
+import numpy.typing as npt
+
+
+# Fields position_hash leaves out: the board (hashed incrementally into board_hash; chits never change in a game),
+# state derived from it, the turn counter (so that a position reached on different turns is one transposition)
+# and the last roll, which no longer matters once its production or robber is resolved
+UNHASHED_FIELDS = ('objects', 'owner', 'chit', 'robber', 'turn', 'last_roll', 'road_lengths', 'board_hash',
+                   'pieces', 'occupied')
+
+
+def observation_specs(n_tiles: int, n_players: int) -> dict[str, tuple[tuple[int, ...], type]]:
+    """ Per-game (shape, dtype) of every package_observation field, known from the board size alone """
+    return {
+        'event': ((1,), np.uint8),
+        'cur_player': ((1,), np.uint8),
+        'last_roll': ((1,), np.uint8),
+        'resources': ((len(Resource),), np.uint8),
+        'development': ((len(DevelopmentCard),), np.uint8),
+        'victory_points': ((n_players,), np.uint8),
+        'longest_road': ((n_players,), np.uint8),
+        'road_holder': ((1,), np.uint8),
+        'knights_played': ((n_players,), np.uint8),
+        'army_holder': ((1,), np.uint8),
+        'discards': ((n_players,), np.uint8),
+        'picks': ((1,), np.uint8),
+        'board_objects': ((n_tiles,), np.uint8),
+        'board_owners': ((n_tiles,), np.uint8),
+        'board_chits': ((n_tiles,), np.uint8),
+        'board_robber': ((1,), np.uint16),
+        'board_last': ((1,), np.uint16),
+    }
+
+
+@dataclass
+class BatchedGameData:
+    """
+    Mutable state of n_games games played on one board layout
+    Every per-game field carries a leading batch axis; static layout data stays on the shared BoardData
+    """
+    board: BoardData
+    buildings: BuildingData
+    n_games: int
+    n_players: int
+    dev_deck_counts: npt.NDArray[np.uint8]
+
+    objects: npt.NDArray[np.uint8] = field(init=False)           # (games, tiles)
+    owner: npt.NDArray[np.uint8] = field(init=False)             # (games, tiles)
+    chit: npt.NDArray[np.uint8] = field(init=False)              # (games, tiles)
+    robber: npt.NDArray[np.uint16] = field(init=False)           # (games,)
+    last_placement: npt.NDArray[np.uint16] = field(init=False)   # (games,)
+    hands: npt.NDArray[np.uint8] = field(init=False)             # (games, players, resources)
+    dev_cards: npt.NDArray[np.uint8] = field(init=False)         # (games, players, dev cards)
+    dev_deck: npt.NDArray[np.uint8] = field(init=False)          # (games, dev cards)
+    qty_built: npt.NDArray[np.uint8] = field(init=False)         # (games, players, buildings)
+    victory_points: npt.NDArray[np.uint8] = field(init=False)    # (games, players)
+    cur_player: npt.NDArray[np.uint8] = field(init=False)        # (games,), the player to act (discarding included)
+    turn_player: npt.NDArray[np.uint8] = field(init=False)       # (games,), whose turn it is
+    event: npt.NDArray[np.uint8] = field(init=False)             # (games,)
+    turn: npt.NDArray[np.uint16] = field(init=False)             # (games,)
+    last_roll: npt.NDArray[np.uint8] = field(init=False)         # (games,)
+    road_lengths: npt.NDArray[np.uint8] = field(init=False)      # (games, tiles), longest trail of each road's network
+    longest_road: npt.NDArray[np.uint8] = field(init=False)      # (games, players)
+    road_holder: npt.NDArray[np.uint8] = field(init=False)       # (games,), NO_OWNER when unclaimed
+    knights_played: npt.NDArray[np.uint8] = field(init=False)    # (games, players)
+    army_holder: npt.NDArray[np.uint8] = field(init=False)       # (games,), NO_OWNER when unclaimed
+    discards: npt.NDArray[np.uint8] = field(init=False)          # (games, players), cards still to discard on a 7
+    picks: npt.NDArray[np.uint8] = field(init=False)             # (games,), free roads / resources left to take
+    new_cards: npt.NDArray[np.uint8] = field(init=False)         # (games, dev cards) bought this turn
+    dev_played: npt.NDArray[np.uint8] = field(init=False)        # (games,), a dev card was played this turn
+    board_hash: npt.NDArray[np.uint64] = field(init=False)       # (games,), Zobrist hash of objects/owner/robber
+    pieces: npt.NDArray[np.uint64] = field(init=False)           # (games, players, PLANES, words) bitboards
+    occupied: npt.NDArray[np.uint64] = field(init=False)         # (games, words), tiles with any building
+    state: ObservationBuffer = field(init=False, repr=False)     # one (games, bytes) block behind every field above
+
+    def __post_init__(self):
+        n, p, t = self.n_games, self.n_players, self.board.n_tiles
+        self.state = state_buffer({
+            'objects': ((t,), np.uint8),
+            'owner': ((t,), np.uint8),
+            'chit': ((t,), np.uint8),
+            'robber': ((), np.uint16),
+            'last_placement': ((), np.uint16),
+            'hands': ((p, len(Resource)), np.uint8),
+            'dev_cards': ((p, len(DevelopmentCard)), np.uint8),
+            'dev_deck': ((len(DevelopmentCard),), np.uint8),
+            'qty_built': ((p, self.buildings.n_buildings), np.uint8),
+            'victory_points': ((p,), np.uint8),
+            'cur_player': ((), np.uint8),
+            'turn_player': ((), np.uint8),
+            'event': ((), np.uint8),
+            'turn': ((), np.uint16),
+            'last_roll': ((), np.uint8),
+            'road_lengths': ((t,), np.uint8),
+            'longest_road': ((p,), np.uint8),
+            'road_holder': ((), np.uint8),
+            'knights_played': ((p,), np.uint8),
+            'army_holder': ((), np.uint8),
+            'discards': ((p,), np.uint8),
+            'picks': ((), np.uint8),
+            'new_cards': ((len(DevelopmentCard),), np.uint8),
+            'dev_played': ((), np.uint8),
+            'board_hash': ((), np.uint64),
+            'pieces': ((p, len(PLANES), n_words(t)), np.uint64),
+            'occupied': ((n_words(t),), np.uint64),
+        }, n)
+        for name, view in self.state.views.items():
+            setattr(self, name, view)
+        self._games = np.arange(n)
+        self._hashed = np.concatenate([np.arange(f.offset, f.offset + f.nbytes)
+                                       for name, f in self.state.layout.fields.items() if name not in UNHASHED_FIELDS])
+        self.reset()
+
+    @property
+    def robber_start(self) -> int:
+        deserts = np.flatnonzero(
+            (self.board.space == Space.Hex.value) & (self.board.objects == Terrain.Desert.value))
+        return int(deserts[0]) if len(deserts) else self.board.robber
+
+    def reset(self, games: npt.NDArray[bool] | None = None, boards: Optional[RandomBoards] = None) -> None:
+        """
+        Restores the given games (boolean mask or indices, all games if None) to the start of the setup phase
+        boards (one per reset game) replaces the board's hex terrains, trade ships and chits
+        """
+        g = slice(None) if games is None else games
+        self.objects[g] = self.board.objects
+        self.owner[g] = NO_OWNER
+        self.chit[g] = self.board.chit
+        self.robber[g] = self.robber_start
+        if boards is not None:
+            rows = self._games[g][:, None]
+            self.objects[rows, boards.hexes] = boards.objects
+            self.chit[rows, boards.hexes] = boards.chits
+            self.robber[g] = boards.robber
+        self.last_placement[g] = 0
+        self.hands[g] = 0
+        self.dev_cards[g] = 0
+        self.dev_deck[g] = self.dev_deck_counts
+        self.qty_built[g] = 0
+        self.victory_points[g] = 0
+        self.cur_player[g] = 0
+        self.turn_player[g] = 0
+        self.event[g] = Event.PlaceInitialBuilding1A.value
+        self.turn[g] = 0
+        self.last_roll[g] = 0
+        self.road_lengths[g] = 0
+        self.longest_road[g] = 0
+        self.road_holder[g] = NO_OWNER
+        self.knights_played[g] = 0
+        self.army_holder[g] = NO_OWNER
+        self.discards[g] = 0
+        self.picks[g] = 0
+        self.new_cards[g] = 0
+        self.dev_played[g] = 0
+        self.board_hash[g] = self.full_hash(g)
+        self.rebuild_bitboards(games)
+
+    def full_hash(self, games: npt.NDArray[bool] | npt.NDArray[np.intp] | slice | None = None
+                  ) -> npt.NDArray[np.uint64]:
+        """ board_hash of the given games recomputed from scratch """
+        g = slice(None) if games is None else games
+        return self.board.zobrist.board_hash(self.objects[g], self.owner[g], self.robber[g])
+
+    def rebuild_bitboards(self, games: npt.NDArray[bool] | None = None) -> None:
+        """ Recomputes pieces/occupied of the given games from objects and owner (hex objects are terrains) """
+        g = slice(None) if games is None else games
+        objects, owner = self.objects[g], self.owner[g]
+        planes = np.array([b.value for b in PLANES], dtype=np.uint8)
+        self.pieces[g] = pack((objects[:, None, None, :] == planes[:, None]) &
+                              (owner[:, None, None, :] == np.arange(self.n_players)[:, None, None]))
+        self.occupied[g] = np.bitwise_or.reduce(self.pieces[g], axis=(1, 2))
+
+    def place(self, g: npt.NDArray[np.intp], t: npt.NDArray[np.integer], building: npt.NDArray[np.uint8],
+              owner: npt.NDArray[np.uint8]) -> None:
+        """ Writes building/owner to tile t[i] of game g[i] (games listed once), keeping board_hash current """
+        self.board_hash[g] ^= self.board.zobrist.tile_change(t, self.objects[g, t], self.owner[g, t], building, owner)
+        word, bit = tile_bit(t)
+        old_plane = PLANE_OF[self.objects[g, t]]
+        had = old_plane != NO_PLANE
+        self.pieces[g[had], self.owner[g, t][had], old_plane[had], word[had]] &= ~bit[had]
+        new_plane = PLANE_OF[building]
+        has = np.broadcast_to(new_plane != NO_PLANE, g.shape)
+        self.pieces[g[has], np.broadcast_to(owner, g.shape)[has], np.broadcast_to(new_plane, g.shape)[has],
+                    word[has]] |= bit[has]
+        self.occupied[g, word] = np.where(has, self.occupied[g, word] | bit, self.occupied[g, word] & ~bit)
+        self.objects[g, t] = building
+        self.owner[g, t] = owner
+
+    def move_robber(self, g: npt.NDArray[np.intp], t: npt.NDArray[np.integer]) -> None:
+        self.board_hash[g] ^= self.board.zobrist.robber_change(self.robber[g], t)
+        self.robber[g] = t
+
+    def position_hash(self, games: npt.NDArray[bool] | npt.NDArray[np.intp] | None = None
+                      ) -> npt.NDArray[np.uint64]:
+        """
+        64-bit hash of everything that decides legal actions and play from here: the board hash and the bytes of
+        every other field but UNHASHED_FIELDS (event, players, hands, cards, decks, counts, awards, ...)
+        """
+        g = slice(None) if games is None else games
+        return self.board_hash[g] ^ bytes_hash(byte_keys(len(self._hashed)), self.state.data[g][..., self._hashed])
+
+    def snapshot(self, games: npt.NDArray[bool] | npt.NDArray[np.intp] | int | None = None) -> Snapshot:
+        """ Copies the state rows of the given games (all if None); board and buildings are shared """
+        rows = self.state.data if games is None else self.state.data[games]
+        return Snapshot((self.board, self.buildings), rows.copy())
+
+    def restore(self, snapshot: Snapshot, games: npt.NDArray[bool] | npt.NDArray[np.intp] | int | None = None
+                ) -> None:
+        """ Writes snapshot rows back into the given games; the games need not be the ones snapshotted """
+        snapshot.check((self.board, self.buildings))
+        self.state.data[slice(None) if games is None else games] = snapshot.state
+
+    def package_observation(self) -> dict[str, npt.NDArray[np.uint8 | np.uint16]]:
+        """ Batched counterpart of GameData.package_observation, seen from each game's current player """
+        games = self._games
+        return {
+            'event': self.event[:, None],
+            'cur_player': self.cur_player[:, None],
+            'last_roll': self.last_roll[:, None],
+            'resources': self.hands[games, self.cur_player],
+            'development': self.dev_cards[games, self.cur_player],
+            'victory_points': self.victory_points,
+            'longest_road': self.longest_road,
+            'road_holder': self.road_holder[:, None],
+            'knights_played': self.knights_played,
+            'army_holder': self.army_holder[:, None],
+            'discards': self.discards,
+            'picks': self.picks[:, None],
+            'board_objects': self.objects,
+            'board_owners': self.owner,
+            'board_chits': self.chit,
+            'board_robber': self.robber[:, None],
+            'board_last': self.last_placement[:, None],
+        }
+
+    def write_observation(self, out: dict[str, npt.NDArray]) -> None:
+        """ Writes package_observation's fields into preallocated (games, ...) arrays without temporaries """
+        np.copyto(out['event'][:, 0], self.event)
+        np.copyto(out['cur_player'][:, 0], self.cur_player)
+        np.copyto(out['last_roll'][:, 0], self.last_roll)
+        out['resources'][...] = self.hands[self._games, self.cur_player]
+        out['development'][...] = self.dev_cards[self._games, self.cur_player]
+        np.copyto(out['victory_points'], self.victory_points)
+        np.copyto(out['longest_road'], self.longest_road)
+        np.copyto(out['road_holder'][:, 0], self.road_holder)
+        np.copyto(out['knights_played'], self.knights_played)
+        np.copyto(out['army_holder'][:, 0], self.army_holder)
+        np.copyto(out['discards'], self.discards)
+        np.copyto(out['picks'][:, 0], self.picks)
+        np.copyto(out['board_objects'], self.objects)
+        np.copyto(out['board_owners'], self.owner)
+        np.copyto(out['board_chits'], self.chit)
+        np.copyto(out['board_robber'][:, 0], self.robber)
+        np.copyto(out['board_last'][:, 0], self.last_placement)
@@ -0,0 +1,167 @@
+from __future__ import annotations
+from dataclasses import dataclass, fields
+from catan_objects import *
+from .layout import BoardLayout
+import numpy as np
+import numpy.typing as npt
+
+
+WORD_BITS = 64
+# Piece planes of the per-player bitboards
+PLANES = (Building.Settlement, Building.City, Building.Road)
+SETTLEMENT_PLANE, CITY_PLANE, ROAD_PLANE = range(len(PLANES))
+NO_PLANE = 255
+PLANE_OF = np.full(len(Building), NO_PLANE, dtype=np.uint8)
+PLANE_OF[[b.value for b in PLANES]] = np.arange(len(PLANES))
+
+
+def n_words(n_tiles: int) -> int:
+    return -(-n_tiles // WORD_BITS)
+
+
+def pack(mask: npt.NDArray[bool]) -> npt.NDArray[np.uint64]:
+    """ (..., tiles) bools to (..., words) bitboards; tile t is bit t % 64 of word t // 64 """
+    words = n_words(mask.shape[-1])
+    padded = np.zeros((*mask.shape[:-1], words * WORD_BITS), dtype=bool)
+    padded[..., :mask.shape[-1]] = mask
+    return np.packbits(padded, axis=-1, bitorder='little').view('<u8').astype(np.uint64, copy=False)
+
+
+def unpack(bits: npt.NDArray[np.uint64], n_tiles: int) -> npt.NDArray[bool]:
+    raw = np.ascontiguousarray(bits, dtype='<u8').view(np.uint8)
+    return np.unpackbits(raw, axis=-1, count=n_tiles, bitorder='little').astype(bool)
+
+
+def tile_bit(t: npt.NDArray[np.integer]) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.uint64]]:
+    """ Word index and single-bit word of tiles t """
+    t = np.asarray(t)
+    return t >> 6, np.left_shift(np.uint64(1), (t & 63).astype(np.uint64))
+
+
+def test(bits: npt.NDArray[np.uint64], t: npt.NDArray[np.integer]) -> npt.NDArray[bool]:
+    """ Bit t[i] of bitboard bits[i] (bits (..., words), t shaped like bits' leading axes) """
+    word, bit = tile_bit(t)
+    return (np.take_along_axis(bits, word[..., None], axis=-1)[..., 0] & bit) != 0
+
+
+def intersects(a: npt.NDArray[np.uint64], b: npt.NDArray[np.uint64]) -> npt.NDArray[bool]:
+    """ Whether bitboards a and b (broadcast against each other) share any tile """
+    return np.any(a & b, axis=-1)
+
+
+@dataclass(frozen=True)
+class NeighborMasks:
+    """
+    One bitboard per tile, stored sparsely: the (at most k) words it touches and their bits
+    Neighbours of a tile have nearby indices, so k is 1 or 2 and a check costs k gathers instead of a full row
+    """
+    words: npt.NDArray[np.intp]      # (tiles, k), padded with word 0
+    bits: npt.NDArray[np.uint64]     # (tiles, k), padded with 0
+
+    @classmethod
+    def from_pairs(cls, tiles: npt.NDArray[np.integer], members: npt.NDArray[np.integer], n_tiles: int
+                   ) -> NeighborMasks:
+        """ Masks holding members[i] in the bitboard of tiles[i] """
+        word, bit = tile_bit(members)
+        key, entry = np.unique(np.asarray(tiles, dtype=np.int64) * n_words(n_tiles) + word, return_inverse=True)
+        bits = np.zeros(len(key), dtype=np.uint64)
+        np.bitwise_or.at(bits, entry, bit)
+        rows, words = np.divmod(key, n_words(n_tiles))
+        counts = np.bincount(rows, minlength=n_tiles)
+        column = np.arange(len(key)) - (np.cumsum(counts) - counts)[rows]
+        k = max(1, int(counts.max(initial=0)))
+        masks = cls(np.zeros((n_tiles, k), dtype=np.intp), np.zeros((n_tiles, k), dtype=np.uint64))
+        masks.words[rows, column], masks.bits[rows, column] = words, bits
+        return masks
+
+    def _any(self, picked: npt.NDArray[np.uint64], t) -> npt.NDArray[bool]:
+        picked &= self.bits[t]
+        hit = picked[..., 0]
+        for i in range(1, picked.shape[-1]):
+            hit |= picked[..., i]
+        return hit != 0
+
+    def hits(self, boards: npt.NDArray[np.uint64], t: npt.NDArray[np.integer]) -> npt.NDArray[bool]:
+        """
+        Whether boards (..., words) share a tile with the masks of tiles t, where t matches boards' leading
+        axes (one tile per board) or has one more trailing axis (several tiles per board)
+        """
+        t = np.asarray(t)
+        if t.ndim == boards.ndim:
+            boards = boards[..., None, :]
+        return self._any(np.take_along_axis(boards, self.words[t], axis=-1), t)
+
+    def hits_each(self, boards: npt.NDArray[np.uint64], tiles: npt.NDArray[np.integer]) -> npt.NDArray[bool]:
+        """ (..., len(tiles)): whether each of boards (..., words) shares a tile with each tile's mask """
+        return self._any(boards[..., self.words[tiles]], tiles)
+
+
+@dataclass(frozen=True)
+class TileMasks:
+    """
+    Bitboards of one layout: tile types, and per tile the tiles that legality checks look at
+    Rows of tiles that are not of the source type hold only the tile itself
+    """
+    hexes: npt.NDArray[np.uint64]           # (words,)
+    isecs: npt.NDArray[np.uint64]
+    paths: npt.NDArray[np.uint64]
+    isec_block: NeighborMasks               # the intersection and those one path away (distance rule)
+    isec_paths: NeighborMasks
+    path_isecs: NeighborMasks
+    hex_isecs: NeighborMasks
+
+    @classmethod
+    def build(cls, layout: BoardLayout) -> TileMasks:
+        n_tiles = layout.n_tiles
+
+        def rows(table: npt.NDArray[np.integer], mask: npt.NDArray[bool], include_self: bool = False):
+            src = np.broadcast_to(np.arange(n_tiles)[:, None], table.shape)[mask]
+            dst = table[mask].astype(np.intp)
+            alone = np.ones(n_tiles, dtype=bool) if include_self else np.bincount(src, minlength=n_tiles) == 0
+            src, dst = np.r_[src, np.flatnonzero(alone)], np.r_[dst, np.flatnonzero(alone)]
+            return NeighborMasks.from_pairs(src, dst, n_tiles)
+
+        def of(tiles: npt.NDArray[np.intp]) -> npt.NDArray[np.uint64]:
+            mask = np.zeros(n_tiles, dtype=bool)
+            mask[tiles] = True
+            return pack(mask)
+
+        masks = cls(
+            of(layout.hexes), of(layout.isecs), of(layout.paths),
+            rows(layout.isec_isecs, layout.isec_isecs_mask, include_self=True),
+            rows(layout.isec_paths, layout.isec_paths_mask),
+            rows(layout.path_isecs, layout.path_isecs_mask),
+            rows(layout.hex_isecs, layout.hex_isecs_mask),
+        )
+        for array in (masks.hexes, masks.isecs, masks.paths):
+            array.flags.writeable = False
+        for f in fields(masks)[3:]:
+            getattr(masks, f.name).words.flags.writeable = False
+            getattr(masks, f.name).bits.flags.writeable = False
+        return masks
+
+
+if __name__ == '__main__':
+    import time
+    from game_loading.default_board import make_default_board
+    from gamedata.board import BoardData
+
+    board = BoardData(make_default_board())
+    masks = TileMasks.build(board.layout)
+    rng = np.random.default_rng(0)
+    occupied = pack(rng.random((4096, board.n_tiles)) < 0.1)
+    objects = unpack(occupied, board.n_tiles).astype(np.uint8)
+    targets = rng.choice(board.layout.isecs, size=4096)
+    games = np.arange(4096)
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        bit_ok = ~masks.isec_block.hits(occupied, targets)
+    bit_rate = 4096 * 1000 / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for _ in range(1000):
+        byte_ok = (objects[games, targets] == 0) & \
+            ~np.any(objects[games[:, None], board.layout.isec_isecs[targets]] != 0, axis=-1)
+    byte_rate = 4096 * 1000 / (time.perf_counter() - start)
+    print(f'distance rule: {bit_rate:,.0f} checks/s on bitboards, {byte_rate:,.0f} on tile bytes '
+          f'({occupied.shape[1] * 8} vs {board.n_tiles * 2} bytes of occupancy per game)')
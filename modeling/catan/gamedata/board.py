@@ -1,8 +1,20 @@
+from __future__ import annotations
 from dataclasses import dataclass, field, InitVar
 from catan_objects import *
 import numpy as np
 import numpy.typing as npt
-from typing import Protocol
+from typing import Optional, Protocol, TYPE_CHECKING
+from tools import enum_value
+from .layout import BoardLayout, get_layout
+from .observation import ObservationBuffer
+from .snapshot import Snapshot, state_buffer
+from .zobrist import ZobristKeys, zobrist_keys
+
+if TYPE_CHECKING:
+    from condition import ConditionKeeper
+
+
+NO_OWNER = np.iinfo(np.uint8).max
 
 
 class TileInfo(Protocol):
@@ -22,19 +34,94 @@ class BoardData:
     objects: npt.NDArray[CatanBoardObject] = field(init=False)
     owner: npt.NDArray[np.uint8] = field(init=False)
     chit: npt.NDArray[np.uint8] = field(init=False)
-    connections: npt.NDArray[np.uint8] = field(init=False)
-    build_dists: npt.NDArray[np.uint8] = field(init=False)
+    connections: npt.NDArray[np.uint16] = field(init=False)
+    layout: BoardLayout = field(init=False, repr=False)
+    build_dists: tuple[npt.NDArray[np.int64], npt.NDArray[np.uint16], npt.NDArray[np.uint8]] = \
+        field(init=False, repr=False)  # CSR (offsets, tiles, dists) of the tiles within LAYOUT_RADIUS hops
+    state: ObservationBuffer = field(init=False, repr=False)  # objects, owner, markers and hash in one block
+    # objects and owner are read-only views of state: writes go through place so the hash stays current
+    zobrist: ZobristKeys = field(init=False, repr=False)
     robber: int = 0
     last_placement: int = 0
+    keeper: Optional[ConditionKeeper] = field(init=False, default=None, repr=False)  # touched as 'board.<field>'
 
     def __post_init__(self, tile_data: list[TileInfo]):
-        self.n_tiles = len(tile_data)
-        self.space, self.environment, self.objects, self.chit = np.array(
-            [[tile.space, tile.env, tile.object, tile.chit_value] for tile in tile_data],
+        space, environment, objects, chit = np.array(
+            [list(map(enum_value, (tile.space, tile.env, tile.object, tile.chit_value))) for tile in tile_data],
             dtype=np.uint8
         ).T
-        self.owner = np.full((self.n_tiles,), -1, dtype=np.uint8)
-        self.connections = np.array(fill_connections([tile.connections for tile in tile_data]), dtype=np.uint8)
+        connections = np.array(fill_connections([list(tile.connections) for tile in tile_data]), dtype=np.uint16)
+        self._set_arrays(space, environment, objects, chit, connections)
+
+    @classmethod
+    def from_arrays(cls, space: npt.NDArray[np.uint8], environment: npt.NDArray[np.uint8],
+                    objects: npt.NDArray[np.uint8], chit: npt.NDArray[np.uint8],
+                    connections: npt.NDArray[np.uint16]) -> BoardData:
+        """ BoardData from per-tile value arrays (e.g. a compiled layout) instead of TileInfo objects """
+        board = cls.__new__(cls)
+        board.robber, board.last_placement, board.keeper = 0, 0, None
+        board._set_arrays(space, environment, objects, chit, connections)
+        return board
+
+    def _set_arrays(self, space, environment, objects, chit, connections) -> None:
+        self.n_tiles = len(space)
+        self.space, self.environment, self.chit = space, environment, np.array(chit, dtype=np.uint8)
+        self.state = state_buffer({
+            'objects': ((self.n_tiles,), np.uint8),
+            'owner': ((self.n_tiles,), np.uint8),
+            'markers': ((2,), np.uint16),  # robber, last_placement
+            'zobrist': ((), np.uint64),
+        })
+        self.state['objects'][:] = objects
+        self.state['owner'][:] = NO_OWNER
+        self.objects, self.owner = read_only(self.state['objects']), read_only(self.state['owner'])
+        self.connections = connections
+        self.layout = get_layout(self.space, self.connections)
+        self.build_dists = self.layout.hop_offsets, self.layout.hop_tiles, self.layout.hop_dists
+        self.zobrist = zobrist_keys(self.n_tiles)
+        self.rehash()
+
+    @property
+    def zobrist_hash(self) -> int:
+        """ Zobrist hash of tile objects/owners and the robber, kept current by place/move_robber """
+        return int(self.state['zobrist'])
+
+    def full_hash(self) -> int:
+        """ zobrist_hash recomputed from scratch """
+        return int(self.zobrist.board_hash(self.objects, self.owner, self.robber))
+
+    def rehash(self) -> None:
+        self.state['zobrist'][...] = self.full_hash()
+
+    def place(self, tile: int, building: Building, owner: int) -> None:
+        """ Puts building (owned by owner) on tile, updating the hash in O(1) """
+        building = enum_value(building)
+        self.state['zobrist'][...] ^= self.zobrist.tile_change(
+            tile, self.objects[tile], self.owner[tile], building, owner)
+        self.state['objects'][tile] = building
+        self.state['owner'][tile] = owner
+        self.last_placement = tile
+        self._touch('objects', 'owner', 'last_placement')
+
+    def move_robber(self, tile: int) -> None:
+        self.state['zobrist'][...] ^= self.zobrist.robber_change(self.robber, tile)
+        self.robber = tile
+        self._touch('robber')
+
+    def _touch(self, *names: str) -> None:
+        if self.keeper is not None:
+            self.keeper.touch(*(f'board.{name}' for name in names))
+
+    def snapshot(self) -> Snapshot:
+        """ Copies owner, objects, robber and last_placement; space, environment, chits and layout are shared """
+        self.state['markers'][:] = self.robber, self.last_placement
+        return Snapshot((self.layout, self.chit), self.state.data.copy())
+
+    def restore(self, snapshot: Snapshot) -> None:
+        snapshot.check((self.layout, self.chit))
+        np.copyto(self.state.data, snapshot.state)
+        self.robber, self.last_placement = map(int, self.state['markers'])
+        self._touch('objects', 'owner', 'robber', 'last_placement')
 
     def package_observation(self, cur_player: int) -> dict[str, npt.NDArray[np.uint8]]:
         return {
@@ -43,10 +130,24 @@ class BoardData:
             'board_objects': self.objects,
             'board_owners': self.owner,
             'board_chits': self.chit,
-            'board_robber': np.array([self.robber], dtype=np.uint8),
-            'board_last': np.array([self.last_placement], dtype=np.uint8),
+            'board_robber': np.array([self.robber], dtype=np.uint16),
+            'board_last': np.array([self.last_placement], dtype=np.uint16),
         }
 
+    def write_observation(self, out: dict[str, npt.NDArray], cur_player: int) -> None:
+        """ Writes package_observation's fields into preallocated arrays (e.g. ObservationBuffer views) """
+        np.copyto(out['board_objects'], self.objects)
+        np.copyto(out['board_owners'], self.owner)
+        np.copyto(out['board_chits'], self.chit)
+        out['board_robber'][0] = self.robber
+        out['board_last'][0] = self.last_placement
+
+
+def read_only(array: npt.NDArray) -> npt.NDArray:
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
 
 def fill_connections(connection_list: list[list[int]]) -> list[list[int]]:
     """ Makes sublist lengths uniform so they can be converted to array """
@@ -3,6 +3,7 @@ from catan_objects import *
 import numpy as np
 import numpy.typing as npt
 from typing import Protocol
+from tools import enum_value
 
 
 @dataclass
@@ -14,6 +15,7 @@ class BuildingInfo(Protocol):
     resource_cost: dict[Resource, int]
     build_limit: int
     resource_yield: int
+    victory_points: int
 
 
 @dataclass
@@ -28,23 +30,18 @@ class BuildingData:
     costs: npt.NDArray[np.uint8] = field(init=False)
     build_limits: npt.NDArray[np.uint8] = field(init=False)
     yield_qtys: npt.NDArray[np.uint8] = field(init=False)
+    victory_points: npt.NDArray[np.uint8] = field(init=False)
     # qty_built: npt.NDArray[np.uint8] = field(init=False)  # TODO - move to board
     n_buildings: int = field(init=False)
 
     def __post_init__(self, building_data: list[BuildingInfo]):
         self.n_buildings = len(building_data)
-        self.buildings, self.space_reqs, self.building_reqs, self.build_limits, self.yield_qtys = [
+        self.buildings, self.space_reqs, self.building_reqs, self.build_limits, self.yield_qtys, self.victory_points = [
             np.array(
-                [object.__getattribute__(b, attr) for b in building_data],
-                dtype=np.dtype(data_type)
+                [enum_value(object.__getattribute__(b, attr)) for b in building_data],
+                dtype=np.uint8
             )
-            for attr, data_type in [
-                ('building', Building),
-                ('space_req', Space),
-                ('building_req', Building),
-                ('build_limit', np.uint8),
-                ('resource_yield', np.uint8)
-            ]
+            for attr in ['building', 'space_req', 'building_req', 'build_limit', 'resource_yield', 'victory_points']
         ]
 
         self.costs = np.array(
@@ -71,6 +68,7 @@ class BuildingData:
             'costs': self.costs.ravel(),
             'build_limits': self.build_limits,
             'yield_qtys': self.yield_qtys,
+            'victory_points': self.victory_points,
             # 'qty_built': self.qty_built.ravel(),  # TODO - remove
         }
 
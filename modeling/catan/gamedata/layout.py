@@ -0,0 +1,172 @@
+from __future__ import annotations
+from dataclasses import dataclass, fields
+from catan_objects import *
+import hashlib
+import numpy as np
+import numpy.typing as npt
+
+
+LAYOUT_RADIUS = 2  # hops covered by a layout's distance table: a path away, the reach of every building rule
+
+
+def hop_distances(space: npt.NDArray[np.uint8], connections: npt.NDArray[np.integer], max_dist: int = LAYOUT_RADIUS,
+                  block_words: int = 4) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.uint16], npt.NDArray[np.uint8]]:
+    """
+    Hop distances from every tile to the tiles within max_dist hops (itself at 0) as CSR (offsets, tiles, dists)
+    Hexes are never passed through, so intersections and paths are measured along the road network
+    Sources are searched bit-parallel, 64 per uint64 word, stepping only the tiles that gained bits
+    """
+    n_tiles = len(space)
+    src = np.repeat(np.arange(n_tiles), connections.shape[1])
+    dst = connections.ravel().astype(np.int64)
+    edges = np.unique(np.concatenate([np.stack([src, dst]), np.stack([dst, src])], axis=1), axis=1)
+    edges = edges[:, edges[0] != edges[1]]
+    src, dst = edges  # sorted by source
+    offsets = np.zeros(n_tiles + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n_tiles), out=offsets[1:])
+    transit = space != Space.Hex.value
+
+    found = [(np.arange(n_tiles), np.arange(n_tiles), np.zeros(n_tiles, dtype=np.uint8))]  # (source, target, dist)
+    for first in range(0, n_tiles, 64 * block_words):
+        sources = np.arange(first, min(n_tiles, first + 64 * block_words))
+        reached = np.zeros((n_tiles, -(-len(sources) // 64)), dtype=np.uint64)
+        reached[sources, (sources - first) >> 6] = np.left_shift(np.uint64(1), (sources & 63).astype(np.uint64))
+        tiles, bits = sources, reached[sources]
+        for dist in range(1, max_dist + 1):
+            if dist > 1:
+                tiles, bits = tiles[transit[tiles]], bits[transit[tiles]]
+            degrees = offsets[tiles + 1] - offsets[tiles]
+            entry = np.repeat(np.arange(len(tiles)), degrees)
+            targets = dst[np.repeat(offsets[tiles] - np.cumsum(degrees) + degrees, degrees) + np.arange(len(entry))]
+            order = np.argsort(targets, kind='stable')
+            targets = targets[order]
+            if not len(targets):
+                break
+            heads = np.flatnonzero(np.r_[True, targets[1:] != targets[:-1]])
+            tiles = targets[heads]
+            bits = np.bitwise_or.reduceat(bits[entry[order]], heads, axis=0) & ~reached[tiles]
+            gained = np.any(bits != 0, axis=1)
+            tiles, bits = tiles[gained], bits[gained]
+            if not len(tiles):
+                break
+            reached[tiles] |= bits
+            new = np.unpackbits(bits.astype('<u8').view(np.uint8), axis=1, count=len(sources), bitorder='little')
+            target, source = np.nonzero(new)
+            found.append((first + source, tiles[target], np.full(len(target), dist, dtype=np.uint8)))
+
+    source, target, dists = (np.concatenate(column) for column in zip(*found))
+    order = np.lexsort((target, source))
+    table = np.zeros(n_tiles + 1, dtype=np.int64)
+    np.cumsum(np.bincount(source, minlength=n_tiles), out=table[1:])
+    return table, target[order].astype(np.uint16), dists[order]
+
+
+def padded_pairs(rows: npt.NDArray[np.integer], cols: npt.NDArray[np.integer], n_rows: int
+                 ) -> tuple[npt.NDArray[np.uint16], npt.NDArray[bool]]:
+    """
+    Lists the columns paired with every row (pairs sorted by row, then column), padded by repeating the row's
+    last entry (like fill_connections)
+    Rows without any pair list their own index; the returned mask flags real entries
+    """
+    counts = np.bincount(rows, minlength=n_rows)
+    width = max(1, int(counts.max(initial=0)))
+    offsets = np.cumsum(counts) - counts
+    take = offsets[:, None] + np.minimum(np.arange(width), np.maximum(counts - 1, 0)[:, None])
+    table = np.asarray(cols)[np.minimum(take, max(len(cols) - 1, 0))] if len(cols) else \
+        np.zeros((n_rows, width), dtype=np.intp)
+    table[counts == 0] = np.arange(n_rows)[counts == 0, None]
+    return table.astype(np.uint16), np.arange(width) < counts[:, None]
+
+
+@dataclass(frozen=True)
+class BoardLayout:
+    """
+    Static lookup tables derived from one board layout, shared read-only by every game on that layout
+    Neighbor tables are (n_tiles, width) with rows padded by repetition; *_mask flags real entries
+    Rows of tiles that are not of the source type list only themselves
+    """
+    hop_offsets: npt.NDArray[np.int64]      # (tiles + 1,) CSR of the tiles within LAYOUT_RADIUS hops
+    hop_tiles: npt.NDArray[np.uint16]
+    hop_dists: npt.NDArray[np.uint8]
+    hexes: npt.NDArray[np.intp]
+    isecs: npt.NDArray[np.intp]
+    paths: npt.NDArray[np.intp]
+    hex_isecs: npt.NDArray[np.uint16]
+    hex_isecs_mask: npt.NDArray[bool]
+    isec_hexes: npt.NDArray[np.uint16]
+    isec_hexes_mask: npt.NDArray[bool]
+    isec_paths: npt.NDArray[np.uint16]
+    isec_paths_mask: npt.NDArray[bool]
+    isec_isecs: npt.NDArray[np.uint16]      # intersections one path away (settlement distance rule)
+    isec_isecs_mask: npt.NDArray[bool]
+    path_isecs: npt.NDArray[np.uint16]
+    path_isecs_mask: npt.NDArray[bool]
+    path_paths: npt.NDArray[np.uint16]      # paths sharing an intersection
+    path_paths_mask: npt.NDArray[bool]
+
+    @classmethod
+    def build(cls, space: npt.NDArray[np.uint8], connections: npt.NDArray[np.integer]) -> BoardLayout:
+        hops = hop_distances(space, connections)
+        sources = np.repeat(np.arange(len(space)), np.diff(hops[0]))
+        is_space = {s: space == s.value for s in (Space.Hex, Space.Intersection, Space.Path)}
+
+        def table(from_space: Space, to_space: Space, dist: int) -> tuple[npt.NDArray, npt.NDArray]:
+            pairs = (hops[2] == dist) & is_space[from_space][sources] & is_space[to_space][hops[1]]
+            return padded_pairs(sources[pairs], hops[1][pairs], len(space))
+
+        layout = cls(
+            *hops,
+            *(np.flatnonzero(is_space[s]) for s in (Space.Hex, Space.Intersection, Space.Path)),
+            *table(Space.Hex, Space.Intersection, 1),
+            *table(Space.Intersection, Space.Hex, 1),
+            *table(Space.Intersection, Space.Path, 1),
+            *table(Space.Intersection, Space.Intersection, 2),
+            *table(Space.Path, Space.Intersection, 1),
+            *table(Space.Path, Space.Path, 2),
+        )
+        for f in fields(layout):
+            getattr(layout, f.name).flags.writeable = False
+        return layout
+
+    @property
+    def n_tiles(self) -> int:
+        return len(self.hop_offsets) - 1
+
+    def within(self, tile: int, dist: int) -> npt.NDArray[np.intp]:
+        """ Tiles at most dist hops from tile (tile included), ascending """
+        if dist > LAYOUT_RADIUS:
+            raise ValueError(f'Layouts store distances up to {LAYOUT_RADIUS} hops, got {dist}')
+        row = slice(self.hop_offsets[tile], self.hop_offsets[tile + 1])
+        return self.hop_tiles[row][self.hop_dists[row] <= dist].astype(np.intp)
+
+    def pairs(self, dist: int) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.intp]]:
+        """ (tile, tile) pairs exactly dist hops apart, sorted by the first tile, then the second """
+        if dist > LAYOUT_RADIUS:
+            raise ValueError(f'Layouts store distances up to {LAYOUT_RADIUS} hops, got {dist}')
+        found = self.hop_dists == dist
+        sources = np.repeat(np.arange(self.n_tiles), np.diff(self.hop_offsets))
+        return sources[found], self.hop_tiles[found].astype(np.intp)
+
+
+_LAYOUTS: dict[str, BoardLayout] = {}
+
+
+def layout_key(space: npt.NDArray[np.uint8], connections: npt.NDArray[np.integer]) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for array in (space, connections):
+        digest.update(str(array.shape).encode())
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def register_layout(space: npt.NDArray[np.uint8], connections: npt.NDArray[np.integer], layout: BoardLayout) -> None:
+    """ Makes get_layout return a prebuilt (e.g. memory-mapped) layout for (space, connections) """
+    _LAYOUTS[layout_key(space, connections)] = layout
+
+
+def get_layout(space: npt.NDArray[np.uint8], connections: npt.NDArray[np.integer]) -> BoardLayout:
+    """ Returns the BoardLayout for (space, connections), building it only the first time it is seen """
+    key = layout_key(space, connections)
+    if key not in _LAYOUTS:
+        _LAYOUTS[key] = BoardLayout.build(space, connections)
+    return _LAYOUTS[key]
@@ -0,0 +1,81 @@
+from __future__ import annotations
+from dataclasses import dataclass, field, InitVar
+from typing import Optional
+import numpy as np
+import numpy.typing as npt
+
+
+@dataclass(frozen=True)
+class ObservationField:
+    name: str
+    dtype: np.dtype
+    shape: tuple[int, ...]
+    offset: int  # bytes from the start of a game's row
+
+    @property
+    def nbytes(self) -> int:
+        return int(np.prod(self.shape, dtype=np.int64)) * self.dtype.itemsize
+
+
+@dataclass
+class ObservationLayout:
+    """
+    Byte layout of one flat observation: every package_observation key gets a fixed, aligned slot
+    Built once from a sample observation (batched samples drop their leading games axis)
+    """
+    sample: InitVar[dict[str, npt.NDArray]]
+    batched: InitVar[bool] = False
+    fields: dict[str, ObservationField] = field(init=False, default_factory=dict)
+    nbytes: int = field(init=False, default=0)
+
+    def __post_init__(self, sample: dict[str, npt.NDArray], batched: bool):
+        offset, align = 0, 1
+        for name, array in sample.items():
+            array = np.asarray(array)
+            dtype, shape = array.dtype, array.shape[1:] if batched else array.shape
+            offset = -(-offset // dtype.itemsize) * dtype.itemsize
+            self.fields[name] = ObservationField(name, dtype, shape, offset)
+            offset += self.fields[name].nbytes
+            align = max(align, dtype.itemsize)
+        self.nbytes = -(-offset // align) * align
+
+    def allocate(self, n_games: Optional[int] = None) -> ObservationBuffer:
+        return ObservationBuffer(self, n_games)
+
+    def views(self, data: npt.NDArray[np.uint8]) -> dict[str, npt.NDArray]:
+        """ Typed views of every field into data, shaped (nbytes,) or (n_games, nbytes) """
+        lead = data.shape[:-1]
+        views = {}
+        for name, f in self.fields.items():
+            raw = data[..., f.offset:f.offset + f.nbytes]
+            views[name] = raw.view(f.dtype).reshape(lead + f.shape)
+        return views
+
+
+@dataclass
+class ObservationBuffer:
+    """
+    One contiguous uint8 array holding whole observations (one row per game when batched),
+    plus the package_observation dict as zero-copy views into it
+    """
+    layout: ObservationLayout
+    n_games: Optional[int] = None
+    data: npt.NDArray[np.uint8] = field(init=False, repr=False)
+    views: dict[str, npt.NDArray] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        shape = (self.layout.nbytes,) if self.n_games is None else (self.n_games, self.layout.nbytes)
+        self.attach(np.zeros(shape, dtype=np.uint8))
+
+    def attach(self, data: npt.NDArray[np.uint8]) -> None:
+        """ Points the buffer at externally owned memory (e.g. shared memory) of the same shape """
+        self.data = data
+        self.views = self.layout.views(data)
+
+    def write(self, observation: dict[str, npt.NDArray]) -> None:
+        """ Copies an already packaged observation in (fallback for data without write_observation) """
+        for name, value in observation.items():
+            np.copyto(self.views[name], value, casting='unsafe')
+
+    def __getitem__(self, name: str) -> npt.NDArray:
+        return self.views[name]
@@ -0,0 +1,31 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Optional
+from .observation import ObservationLayout, ObservationBuffer
+import numpy as np
+import numpy.typing as npt
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    Copy of the mutable state of one or more games, taken with a single memcpy
+    Static data (layout, rules) is referenced through static, never copied
+    """
+    static: tuple[Any, ...]
+    state: npt.NDArray[np.uint8]
+
+    def check(self, static: tuple[Any, ...]) -> None:
+        if len(static) != len(self.static) or any(a is not b for a, b in zip(static, self.static)):
+            raise ValueError('Snapshot was taken from a game with different static data')
+
+
+def state_buffer(specs: dict[str, tuple[tuple[int, ...], np.dtype]], n_games: Optional[int] = None
+                 ) -> ObservationBuffer:
+    """
+    One contiguous uint8 block (a row per game when n_games is given) with a typed view per field,
+    so that a whole game state can be copied or restored at once
+    """
+    layout = ObservationLayout({name: np.empty(shape, dtype=dtype) for name, (shape, dtype) in specs.items()})
+    return layout.allocate(n_games)
+
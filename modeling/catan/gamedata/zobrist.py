@@ -0,0 +1,69 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from functools import lru_cache
+from catan_objects import *
+import numpy as np
+import numpy.typing as npt
+
+
+N_OBJECT_VALUES = max(len(Terrain), len(Building))
+MAX_PLAYERS = 8
+
+
+@dataclass(frozen=True)
+class ZobristKeys:
+    """
+    Random 64-bit keys whose XOR over a board's features is that board's hash
+    A change XORs out the old key and XORs in the new one, so place/move_robber update the hash in O(1)
+    Owners are indexed by player, with MAX_PLAYERS standing for NO_OWNER
+    """
+    n_tiles: int
+    seed: int = 0
+    tile: npt.NDArray[np.uint64] = field(init=False, repr=False)       # (tiles, object values, players + 1)
+    robber: npt.NDArray[np.uint64] = field(init=False, repr=False)     # (tiles,)
+
+    def __post_init__(self):
+        rng = np.random.default_rng(self.seed)
+        for name, shape in [('tile', (self.n_tiles, N_OBJECT_VALUES, MAX_PLAYERS + 1)), ('robber', (self.n_tiles,))]:
+            keys = rng.integers(0, np.iinfo(np.uint64).max, size=shape, dtype=np.uint64, endpoint=True)
+            keys.flags.writeable = False
+            object.__setattr__(self, name, keys)
+
+    def owner_index(self, owner: npt.NDArray[np.uint8]) -> npt.NDArray[np.intp]:
+        return np.minimum(owner, MAX_PLAYERS)
+
+    def board_hash(self, objects: npt.NDArray[np.uint8], owner: npt.NDArray[np.uint8],
+                   robber: npt.NDArray[np.integer]) -> npt.NDArray[np.uint64]:
+        """ Full board hash of (games, tiles) objects/owners and (games,) robbers """
+        tiles = np.arange(self.n_tiles)
+        keys = self.tile[tiles, objects, self.owner_index(owner)]
+        return np.bitwise_xor.reduce(keys, axis=-1) ^ self.robber[robber]
+
+    def tile_change(self, t: npt.NDArray[np.integer], old_objects, old_owner, new_objects, new_owner
+                    ) -> npt.NDArray[np.uint64]:
+        """ Value to XOR into a board hash when tiles t change from old to new (object, owner) """
+        return self.tile[t, old_objects, self.owner_index(old_owner)] ^ \
+            self.tile[t, new_objects, self.owner_index(new_owner)]
+
+    def robber_change(self, old: npt.NDArray[np.integer], new: npt.NDArray[np.integer]) -> npt.NDArray[np.uint64]:
+        return self.robber[old] ^ self.robber[new]
+
+
+@lru_cache(maxsize=None)
+def zobrist_keys(n_tiles: int) -> ZobristKeys:
+    """ Shared keys per board size, identical in every process so hashes can be compared across workers """
+    return ZobristKeys(n_tiles)
+
+
+@lru_cache(maxsize=None)
+def byte_keys(n_bytes: int, seed: int = 1) -> npt.NDArray[np.uint64]:
+    """ (n_bytes, 256) keys hashing a row of n_bytes bytes by position and value (see bytes_hash) """
+    keys = np.random.default_rng(seed).integers(
+        0, np.iinfo(np.uint64).max, size=(n_bytes, 256), dtype=np.uint64, endpoint=True)
+    keys.flags.writeable = False
+    return keys
+
+
+def bytes_hash(keys: npt.NDArray[np.uint64], rows: npt.NDArray[np.uint8]) -> npt.NDArray[np.uint64]:
+    """ Zobrist hash of (..., n_bytes) uint8 rows: a change of any byte changes the hash """
+    return np.bitwise_xor.reduce(keys[np.arange(rows.shape[-1]), rows], axis=-1)
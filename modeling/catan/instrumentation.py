@@ -0,0 +1,175 @@
+from __future__ import annotations
+from dataclasses import dataclass, field, asdict
+from contextlib import contextmanager
+from collections import defaultdict
+from typing import Any, Callable, Hashable, Iterator
+import time
+import numpy as np
+
+
+@dataclass
+class Counter:
+    calls: int = 0
+    items: int = 0       # games covered by batched calls (equal to calls otherwise)
+    hits: int = 0        # memo hits for conditions, valid requests for handlers
+    misses: int = 0      # memo misses for conditions, invalid requests for handlers
+    seconds: float = 0.  # cumulative, children included
+
+
+@dataclass
+class Profiler:
+    """
+    Opt-in counters and self-time stacks (flamegraph.pl's collapsed format) of condition evaluation and request
+    handling, keyed by Condition.identifier and (event name, request name)
+    Attach it to anything with a profiler attribute (ConditionKeeper, GameState, DispatchTable)
+    """
+    conditions: dict[str, Counter] = field(default_factory=lambda: defaultdict(Counter))
+    handlers: dict[tuple[str, str], Counter] = field(default_factory=lambda: defaultdict(Counter))
+    stacks: dict[tuple[str, ...], float] = field(default_factory=lambda: defaultdict(float))
+    _frames: list[str] = field(default_factory=list, repr=False)
+    _child_seconds: list[float] = field(default_factory=list, repr=False)
+
+    def attach(self, *targets: Any) -> None:
+        for target in targets:
+            target.profiler = self
+
+    def detach(self, *targets: Any) -> None:
+        for target in targets:
+            if target.profiler is self:
+                target.profiler = None
+
+    @contextmanager
+    def attached(self, *targets: Any) -> Iterator[Profiler]:
+        self.attach(*targets)
+        try:
+            yield self
+        finally:
+            self.detach(*targets)
+
+    def clear(self) -> None:
+        self.conditions.clear()
+        self.handlers.clear()
+        self.stacks.clear()
+
+    def _enter(self, frame: str) -> float:
+        self._frames.append(frame)
+        self._child_seconds.append(0.)
+        return time.perf_counter()
+
+    def _exit(self, start: float) -> float:
+        elapsed = time.perf_counter() - start
+        self.stacks[tuple(self._frames)] += elapsed - self._child_seconds.pop()
+        self._frames.pop()
+        if self._child_seconds:
+            self._child_seconds[-1] += elapsed
+        return elapsed
+
+    def condition_status(self, keeper, condition) -> Any:
+        """ ConditionKeeper.get_status, counted """
+        counter = self.conditions[condition.identifier]
+        start = self._enter(condition.identifier)
+        try:
+            status, hit = keeper.memo_status(condition)
+        finally:
+            counter.seconds += self._exit(start)
+        counter.calls += 1
+        counter.items += 1
+        counter.hits += hit
+        counter.misses += not hit
+        return status
+
+    def handle(self, event: Hashable, request: Hashable, handler: Callable, *args, defined: bool = True) -> Any:
+        """ Calls one request handler, counted under (event, request); undefined requests count as misses """
+        key = (getattr(event, 'name', str(event)), getattr(request, 'name', str(request)))
+        counter = self.handlers[key]
+        start = self._enter('.'.join(key))
+        try:
+            result = handler(*args)
+        finally:
+            counter.seconds += self._exit(start)
+        counter.calls += 1
+        counter.items += 1
+        counter.hits += defined
+        counter.misses += not defined
+        return result
+
+    def handle_batch(self, event: Hashable, request: Hashable, handler: Callable, games, args) -> Any:
+        """ Calls one batched handler(games, args), counting its games and how many of them were valid """
+        key = (getattr(event, 'name', str(event)), getattr(request, 'name', str(request)))
+        counter = self.handlers[key]
+        start = self._enter('.'.join(key))
+        try:
+            valid = handler(games, args)
+        finally:
+            counter.seconds += self._exit(start)
+        n_valid = len(games) if valid is None else int(np.count_nonzero(valid))
+        counter.calls += 1
+        counter.items += len(games)
+        counter.hits += n_valid
+        counter.misses += len(games) - n_valid
+        return valid
+
+    def to_dict(self) -> dict[str, dict[str, dict[str, float]]]:
+        return {
+            'conditions': {name: asdict(c) for name, c in self.conditions.items()},
+            'handlers': {'.'.join(key): asdict(c) for key, c in self.handlers.items()},
+        }
+
+    def flamegraph(self) -> str:
+        """ Collapsed stacks ('frame;frame;frame microseconds' per line) of self time """
+        return '\n'.join(
+            f'{";".join(stack)} {round(seconds * 1e6)}' for stack, seconds in sorted(self.stacks.items())
+        )
+
+    def report(self, top: int = 20) -> str:
+        lines = []
+        for title, counters in (('conditions', self.conditions), ('handlers', {
+                '.'.join(key): c for key, c in self.handlers.items()})):
+            lines.append(f'{title + ":":<42} {"calls":>10} {"items":>10} {"hits":>10} {"misses":>10} {"ms":>10}')
+            for name, c in sorted(counters.items(), key=lambda item: -item[1].seconds)[:top]:
+                lines.append(f'  {name[:40]:<40} {c.calls:>10} {c.items:>10} {c.hits:>10} {c.misses:>10} '
+                             f'{c.seconds * 1000:>10.2f}')
+        return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import sys
+    from catan_objects import Event
+    from condition import Condition, ConditionKeeper
+    from game_loading.compiled_layout import load_default_layout
+    from game_loading.default_rules import DISCARD_LIMIT
+    from batched_engine import BatchedEngine
+
+    @dataclass
+    class EngineKeeper(ConditionKeeper):
+        engine: BatchedEngine = None
+
+    @dataclass
+    class InEvent(Condition):
+        reads = ('data.event',)
+
+        def check(self, keeper):
+            return keeper.engine.data.event == self.value
+
+    @dataclass
+    class HoldsMore(Condition):
+        reads = ('data.hands',)
+
+        def check(self, keeper):
+            return keeper.engine.data.hands.sum(axis=2).max(axis=1) > self.value
+
+    engine = BatchedEngine(board=load_default_layout().board_data(), n_games=256, seed=0)
+    keeper = EngineKeeper(engine=engine)
+    must_discard = InEvent(value=Event.PlayerTurn.value) & HoldsMore(value=DISCARD_LIMIT)
+    profiler = Profiler()
+    with profiler.attached(engine.dispatch, keeper):
+        for _ in range(300):
+            mask = engine.action_mask()
+            engine.step(*engine.decode_actions(np.argmax(mask + engine.rng.random(mask.shape), axis=1)))
+            keeper.touch('data.event', 'data.hands')
+            for _ in range(2):  # the second evaluation of a step is answered from the memo
+                keeper.get_status(must_discard)
+    print(profiler.report())
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'w') as f:
+            f.write(profiler.flamegraph())
@@ -0,0 +1,179 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from catan_objects import *
+from gamedata.board import BoardData, NO_OWNER
+from gamedata.batched import BatchedGameData
+from gamedata.layout import BoardLayout
+from game_loading.default_rules import LONGEST_ROAD_MIN
+import numpy as np
+import numpy.typing as npt
+
+
+#
+# Single-board helpers; owner/objects/road_lengths are 1-d per-tile arrays of one game
+#
+def is_blocked(owner: npt.NDArray[np.uint8], player: int, isec: int) -> bool:
+    """ An intersection holding another player's building breaks the player's road """
+    return owner[isec] != NO_OWNER and owner[isec] != player
+
+
+def player_roads_at(layout: BoardLayout, owner, objects, player: int, isec: int) -> list[int]:
+    return [
+        int(path) for path, real in zip(layout.isec_paths[isec], layout.isec_paths_mask[isec])
+        if real and objects[path] == Building.Road.value and owner[path] == player
+    ]
+
+
+def road_component(layout: BoardLayout, owner, objects, player: int, path: int) -> list[int]:
+    """ Roads of player connected to path without passing through intersections blocked for player """
+    component, frontier = {path}, [path]
+    while frontier:
+        for isec in layout.path_isecs[frontier.pop()][:2]:
+            if is_blocked(owner, player, isec):
+                continue
+            for nbr in player_roads_at(layout, owner, objects, player, isec):
+                if nbr not in component:
+                    component.add(nbr)
+                    frontier.append(nbr)
+    return sorted(component)
+
+
+def longest_trail(layout: BoardLayout, owner, player: int, roads: list[int]) -> int:
+    """ Most roads walkable in one go (no road used twice, never continuing through a blocked intersection) """
+    bit = {road: 1 << i for i, road in enumerate(roads)}
+    ends = {road: tuple(int(i) for i in layout.path_isecs[road][:2]) for road in roads}
+    edges_at: dict[int, list[int]] = {}
+    for road, (a, b) in ends.items():
+        edges_at.setdefault(a, []).append(road)
+        edges_at.setdefault(b, []).append(road)
+
+    best = 0
+
+    def walk(isec: int, used: int, length: int) -> None:
+        nonlocal best
+        best = max(best, length)
+        if length and is_blocked(owner, player, isec):
+            return
+        for road in edges_at[isec]:
+            if not used & bit[road]:
+                a, b = ends[road]
+                walk(b if a == isec else a, used | bit[road], length + 1)
+
+    for start in edges_at:
+        walk(start, 0, 0)
+        if best == len(roads):
+            break
+    return best
+
+
+def refresh_component(layout: BoardLayout, owner, objects, road_lengths, player: int, path: int) -> list[int]:
+    """ Recomputes the longest trail of path's component and stores it on every road of the component """
+    component = road_component(layout, owner, objects, player, path)
+    road_lengths[component] = longest_trail(layout, owner, player, component)
+    return component
+
+
+def update_after_road(layout: BoardLayout, owner, objects, road_lengths, player: int, path: int) -> None:
+    """ A new road can only join components touching it, so only that merged component is recomputed """
+    refresh_component(layout, owner, objects, road_lengths, player, path)
+
+
+def update_after_settlement(layout: BoardLayout, owner, objects, road_lengths, player: int, isec: int) -> list[int]:
+    """ A settlement can only split opponents' roads running through isec; returns the affected players """
+    affected = []
+    for opponent in {int(owner[p]) for p in layout.isec_paths[isec]} - {NO_OWNER, player}:
+        roads = player_roads_at(layout, owner, objects, opponent, isec)
+        if len(roads) < 2:
+            continue
+        done: set[int] = set()
+        for road in roads:
+            if road not in done:
+                done.update(refresh_component(layout, owner, objects, road_lengths, opponent, road))
+        affected.append(opponent)
+    return affected
+
+
+def longest_by_player(owner, objects, road_lengths, n_players: int) -> npt.NDArray[np.uint8]:
+    """ Longest road per player, reading the per-road component lengths; works on any leading batch axes """
+    roads = objects == Building.Road.value
+    return np.stack([
+        np.max(np.where(roads & (owner == p), road_lengths, 0), axis=-1) for p in range(n_players)
+    ], axis=-1).astype(np.uint8)
+
+
+def award_holder(longest: npt.NDArray[np.uint8], holder: npt.NDArray[np.uint8]) -> npt.NDArray[np.uint8]:
+    """
+    Longest Road holder after a change, for (games, players) lengths and (games,) current holders
+    The holder keeps the card while still tied for longest; otherwise a unique longest road of at least
+    LONGEST_ROAD_MIN takes it, and a tie for the lead leaves it unclaimed
+    """
+    games = np.arange(len(longest))
+    best = longest.max(axis=1)
+    held = holder != NO_OWNER
+    holder_len = np.where(held, longest[games, np.where(held, holder, 0)], 0)
+    unique = (longest == best[:, None]).sum(axis=1) == 1
+    keep = held & (holder_len == best) & (best >= LONGEST_ROAD_MIN)
+    claim = ~keep & unique & (best >= LONGEST_ROAD_MIN)
+    return np.where(keep, holder, np.where(claim, np.argmax(longest, axis=1), NO_OWNER)).astype(np.uint8)
+
+
+@dataclass
+class LongestRoad:
+    """ Incrementally maintained road lengths for a single BoardData """
+    board: BoardData
+    n_players: int
+    road_lengths: npt.NDArray[np.uint8] = field(init=False)
+    longest: npt.NDArray[np.uint8] = field(init=False)
+    holder: int = NO_OWNER
+
+    def __post_init__(self):
+        self.road_lengths = np.zeros(self.board.n_tiles, dtype=np.uint8)
+        self.longest = np.zeros(self.n_players, dtype=np.uint8)
+
+    def on_placement(self, player: int, tile: int) -> None:
+        """ Call after a road or settlement has been written to board.owner/objects """
+        b = self.board
+        if b.objects[tile] == Building.Road.value:
+            update_after_road(b.layout, b.owner, b.objects, self.road_lengths, player, tile)
+        elif b.objects[tile] == Building.Settlement.value:
+            update_after_settlement(b.layout, b.owner, b.objects, self.road_lengths, player, tile)
+        self.longest = longest_by_player(b.owner, b.objects, self.road_lengths, self.n_players)
+        self.holder = int(award_holder(self.longest[None], np.array([self.holder], dtype=np.uint8))[0])
+
+
+@dataclass
+class BatchedLongestRoad:
+    """
+    Longest road bookkeeping for BatchedGameData (road_lengths, longest_road and road_holder)
+    Placements are processed per game, each touching only the road components around the placed tile
+    """
+    data: BatchedGameData
+    layout: BoardLayout = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.layout = self.data.board.layout
+
+    def on_placements(self, g: npt.NDArray[np.intp], p: npt.NDArray[np.integer], t: npt.NDArray[np.integer]
+                      ) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.uint8], npt.NDArray[np.uint8]]:
+        """
+        Updates lengths after roads/settlements were placed (one per listed game, already written to the board)
+        Returns the games whose road lengths were refreshed with their previous and new Longest Road holders
+        """
+        d = self.data
+        objects = d.objects[g, t]
+        touched = []
+        for game, player, tile, obj in zip(g.tolist(), p.tolist(), t.tolist(), objects.tolist()):
+            owner, objs, lengths = d.owner[game], d.objects[game], d.road_lengths[game]
+            if obj == Building.Road.value:
+                update_after_road(self.layout, owner, objs, lengths, player, tile)
+                touched.append(game)
+            elif obj == Building.Settlement.value and \
+                    update_after_settlement(self.layout, owner, objs, lengths, player, tile):
+                touched.append(game)
+
+        games = np.unique(np.array(touched, dtype=np.intp))
+        old = d.road_holder[games].copy()
+        d.longest_road[games] = longest_by_player(d.owner[games], d.objects[games], d.road_lengths[games],
+                                                  d.n_players)
+        d.road_holder[games] = award_holder(d.longest_road[games], old)
+        return games, old, d.road_holder[games]
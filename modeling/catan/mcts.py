@@ -0,0 +1,258 @@
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from catan_objects import *
+from gamedata.snapshot import Snapshot
+from batched_engine import BatchedEngine
+from game_loading.default_rules import VICTORY_POINTS_TO_WIN
+from typing import Callable, Optional
+import numpy as np
+import numpy.typing as npt
+
+
+# (observation rows of the leaves, (leaves, n_actions) legal mask) -> ((leaves, n_actions) priors,
+# (leaves, n_players) values from each player's point of view)
+Evaluator = Callable[[dict[str, npt.NDArray], npt.NDArray[bool]], tuple[npt.NDArray, npt.NDArray]]
+
+
+def heuristic_evaluator(observation: dict[str, npt.NDArray], mask: npt.NDArray[bool]
+                        ) -> tuple[npt.NDArray[np.float32], npt.NDArray[np.float32]]:
+    """ Uniform priors over legal actions; values from each player's victory point lead """
+    priors = mask / np.maximum(mask.sum(axis=1, keepdims=True), 1)
+    vp = observation['victory_points'].astype(np.float32)
+    values = (vp - vp.mean(axis=1, keepdims=True)) / VICTORY_POINTS_TO_WIN
+    return priors.astype(np.float32), values
+
+
+@dataclass
+class Node:
+    """
+    Search statistics of one position, indexed by the legal actions it was expanded with
+    Chance is sampled open-loop: an edge drawing from the engine rng samples one outcome per traversal and its
+    value averages over them; outcomes only records what was sampled, for inspection
+    """
+    key: int
+    player: int
+    actions: npt.NDArray[np.intp]
+    prior: npt.NDArray[np.float32]
+    visits: npt.NDArray[np.int32] = field(init=False)
+    value_sum: npt.NDArray[np.float32] = field(init=False)
+    virtual: npt.NDArray[np.int32] = field(init=False)   # in-flight traversals of the current batch
+    outcomes: dict[int, dict[int, int]] = field(init=False, default_factory=dict)
+
+    def __post_init__(self):
+        self.visits = np.zeros(len(self.actions), dtype=np.int32)
+        self.value_sum = np.zeros(len(self.actions), dtype=np.float32)
+        self.virtual = np.zeros(len(self.actions), dtype=np.int32)
+
+    @property
+    def n_visits(self) -> int:
+        return int(self.visits.sum())
+
+    def select(self, c_puct: float, virtual_loss: float, legal: npt.NDArray[bool]) -> int:
+        """
+        PUCT choice among the actions legal in the live position (legal is aligned with self.actions);
+        pending traversals count as losses to spread out a batch
+        """
+        n = self.visits + self.virtual
+        q = (self.value_sum - virtual_loss * self.virtual) / np.maximum(n, 1)
+        u = c_puct * self.prior * np.sqrt(n.sum() + 1) / (1 + n)
+        return int(np.argmax(np.where(legal, q + u, -np.inf)))
+
+    def record(self, index: int, outcome: int) -> None:
+        counts = self.outcomes.setdefault(index, {})
+        counts[outcome] = counts.get(outcome, 0) + 1
+
+    def backup(self, index: int, value: float) -> None:
+        self.virtual[index] -= 1
+        self.visits[index] += 1
+        self.value_sum[index] += value
+
+    def policy(self, temperature: float = 1.) -> npt.NDArray[np.float64]:
+        """ Visit-count distribution over self.actions """
+        if temperature == 0:
+            probs = np.zeros(len(self.actions))
+            probs[np.argmax(self.visits)] = 1.
+            return probs
+        weights = self.visits.astype(np.float64) ** (1 / temperature)
+        total = weights.sum()
+        return weights / total if total else np.full(len(self.actions), 1 / len(self.actions))
+
+
+@dataclass
+class TranspositionTable:
+    """ Nodes by position hash, evicting the least recently used beyond capacity (pinned keys are kept) """
+    capacity: int
+    nodes: OrderedDict[int, Node] = field(init=False, default_factory=OrderedDict)
+    pinned: set[int] = field(init=False, default_factory=set)
+    evictions: int = field(init=False, default=0)
+
+    def __post_init__(self):
+        if self.capacity < 1:
+            raise ValueError('TranspositionTable capacity must be positive')
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self.nodes
+
+    def get(self, key: int) -> Optional[Node]:
+        node = self.nodes.get(key)
+        if node is not None:
+            self.nodes.move_to_end(key)
+        return node
+
+    def put(self, node: Node) -> None:
+        self.nodes[node.key] = node
+        self.nodes.move_to_end(node.key)
+        for _ in range(len(self.nodes)):
+            if len(self.nodes) <= self.capacity:
+                break
+            key, oldest = self.nodes.popitem(last=False)
+            if key in self.pinned:
+                self.nodes[key] = oldest
+            else:
+                self.evictions += 1
+
+
+@dataclass
+class MCTS:
+    """
+    PUCT search over BatchedEngine positions: the engine's games are lanes walked down the tree in lockstep and
+    leaves are evaluated in one call; nodes are keyed by position_hash, which leaves out the turn, so stored
+    actions are checked against the live action mask when selecting
+    """
+    engine: BatchedEngine
+    evaluator: Evaluator = heuristic_evaluator
+    capacity: int = 100_000
+    c_puct: float = 1.5
+    virtual_loss: float = 1.
+    max_depth: int = 64
+    table: TranspositionTable = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.table = TranspositionTable(self.capacity)
+
+    @classmethod
+    def for_engine(cls, engine: BatchedEngine, n_lanes: int = 32, seed: Optional[int] = None, **kwargs) -> MCTS:
+        """ Search whose lanes play by engine's rules (snapshots of engine games can be searched directly) """
+        lanes = BatchedEngine(
+            board=engine.board, n_games=n_lanes, n_players=engine.n_players, buildings=engine.buildings,
+            win_points=engine.win_points, max_turns=engine.max_turns, seed=seed
+        )
+        return cls(lanes, **kwargs)
+
+    def keys(self) -> list[int]:
+        return self.engine.data.position_hash().tolist()
+
+    def search(self, root: Snapshot, n_simulations: int) -> Node:
+        """ Runs n_simulations traversals from the single-game snapshot root and returns the root node """
+        self.engine.restore(root)
+        root_key = self.keys()[0]
+        self.table.pinned = {root_key}
+        if root_key not in self.table:
+            self._simulate(root, 1)
+        done = 0
+        while done < n_simulations:
+            n = min(self.engine.n_games, n_simulations - done)
+            self._simulate(root, n)
+            done += n
+        return self.table.get(root_key)
+
+    def _simulate(self, root: Snapshot, n: int) -> None:
+        e = self.engine
+        e.restore(root)
+        keys = self.keys()
+        paths: list[list[tuple[Node, int]]] = [[] for _ in range(n)]
+        visited: list[set[int]] = [set() for _ in range(n)]
+        values: dict[int, npt.NDArray[np.float32]] = {}
+        active = np.zeros(e.n_games, dtype=bool)
+        active[:n] = True
+        leaves = []
+
+        for depth in range(self.max_depth + 1):
+            actions = np.full(e.n_games, -1, dtype=np.int64)
+            # positions repeat (turns without change), so a lane back at a position on its path stops there
+            stop = depth == self.max_depth
+            nodes = {lane: None if stop or keys[lane] in visited[lane] else self.table.get(keys[lane])
+                     for lane in np.flatnonzero(active)}
+            live = e.action_mask() if any(node is not None for node in nodes.values()) else None
+            for lane, node in nodes.items():
+                legal = None if node is None else live[lane, node.actions]
+                # a node without a live legal action can only come from a hash collision: evaluate it as a leaf
+                if node is None or not legal.any():
+                    active[lane] = False
+                    leaves.append(lane)
+                    continue
+                index = node.select(self.c_puct, self.virtual_loss, legal)
+                node.virtual[index] += 1
+                paths[lane].append((node, index))
+                visited[lane].add(keys[lane])
+                actions[lane] = node.actions[index]
+            if not active.any():
+                break
+
+            actor = e.data.cur_player.copy()
+            requests, args = e.decode_actions(actions)
+            rewards, finished, _ = e.step(requests, args)
+            new_keys = self.keys()
+            for lane in np.flatnonzero(active):
+                node, index = paths[lane][-1]
+                if finished[lane]:
+                    active[lane] = False
+                    values[lane] = self._terminal_value(int(actor[lane]), float(rewards[lane]))
+                else:
+                    keys[lane] = new_keys[lane]
+                    node.record(index, keys[lane])
+
+        values.update(self._evaluate(leaves, keys))
+        for lane in range(n):
+            for node, index in paths[lane]:
+                node.backup(index, float(values[lane][node.player]))
+
+    def _evaluate(self, leaves: list[int], keys: list[int]) -> dict[int, npt.NDArray[np.float32]]:
+        """ Evaluates each distinct leaf position once and expands it into the table """
+        if not leaves:
+            return {}
+        first = {}
+        for lane in leaves:
+            first.setdefault(keys[lane], lane)
+        rows = np.array(list(first.values()))
+        e = self.engine
+        mask = e.action_mask()[rows]
+        observation = {name: value[rows] for name, value in e.data.package_observation().items()}
+        priors, values = self.evaluator(observation, mask)
+
+        by_key = {}
+        for i, (key, lane) in enumerate(first.items()):
+            by_key[key] = values[i]
+            if key not in self.table:
+                actions = np.flatnonzero(mask[i])
+                prior = priors[i, actions].astype(np.float32)
+                prior /= max(float(prior.sum()), 1e-12)
+                self.table.put(Node(key, int(e.data.cur_player[lane]), actions, prior))
+        return {lane: by_key[keys[lane]] for lane in leaves}
+
+    def _terminal_value(self, actor: int, reward: float) -> npt.NDArray[np.float32]:
+        n_players = self.engine.n_players
+        values = np.full(n_players, -reward / (n_players - 1), dtype=np.float32)
+        values[actor] = reward
+        return values
+
+
+if __name__ == '__main__':
+    import time
+    from game_loading.default_board import make_default_board
+    from gamedata.board import BoardData
+
+    game = BatchedEngine(board=BoardData(make_default_board()), n_games=1, seed=0)
+    search = MCTS.for_engine(game, n_lanes=32, seed=1, capacity=20_000)
+    n_moves, n_simulations, start = 20, 256, time.perf_counter()
+    for _ in range(n_moves):
+        root = search.search(game.snapshot(0), n_simulations)
+        action = root.actions[np.argmax(root.visits)]
+        game.step(*game.decode_actions(np.array([action])))
+    elapsed = time.perf_counter() - start
+    print(f'{n_moves * n_simulations / elapsed:,.0f} simulations/s, {len(search.table)} nodes, '
+          f'{search.table.evictions} evictions')
@@ -0,0 +1,85 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from catan_objects import *
+from gamedata.board import BoardData
+from gamedata.layout import padded_pairs
+import numpy as np
+import numpy.typing as npt
+
+
+def trade_ship_ratios(ship_map: dict[TradeShip, dict[Resource, int]], bank_ratio: int) -> npt.NDArray[np.uint8]:
+    """ Lookup table from TradeShip value to the trade ratio of every Resource (bank_ratio where it has none) """
+    table = np.full((len(TradeShip), len(Resource)), bank_ratio, dtype=np.uint8)
+    for ship, ratios in ship_map.items():
+        for resource, ratio in ratios.items():
+            table[ship.value, resource.value] = min(ratio, bank_ratio)
+    return table
+
+
+def dock_intersections(board: BoardData, dock_hexes: npt.NDArray[np.integer]) -> npt.NDArray[np.uint16]:
+    """
+    (docks, 2) intersections served by each dock hex
+    make_default_board reduces a dock hex's connections to its two docks (SEA_HEX_CONNECTIONS), so they are
+    the first two connections of the hex
+    """
+    return board.connections[np.asarray(dock_hexes, dtype=np.intp), :2]
+
+
+@dataclass
+class PortIndex:
+    """
+    Bank trade ratio per resource of every player, for games sharing one layout
+    Ratios only fall as settlements are added, so on_building takes a minimum over the new settlements' docks
+    """
+    ship_ratios: npt.NDArray[np.uint8]            # (TradeShip values, resources), see trade_ship_ratios
+    bank_ratio: int
+    dock_hexes: npt.NDArray[np.integer]           # (docks,)
+    dock_isecs: npt.NDArray[np.integer]           # (docks, 2)
+    objects: npt.NDArray[np.uint8]                # (games, tiles)
+    owner: npt.NDArray[np.uint8]                  # (games, tiles)
+    n_players: int
+
+    isec_docks: npt.NDArray[np.uint16] = field(init=False, repr=False)      # (tiles, width), by intersection
+    isec_docks_mask: npt.NDArray[bool] = field(init=False, repr=False)
+    dock_ratios: npt.NDArray[np.uint8] = field(init=False, repr=False)     # (games, docks, resources)
+    ratios: npt.NDArray[np.uint8] = field(init=False)                      # (games, players, resources)
+
+    def __post_init__(self):
+        self.dock_hexes = np.asarray(self.dock_hexes, dtype=np.intp)
+        self.dock_isecs = np.asarray(self.dock_isecs, dtype=np.intp)
+        if self.dock_isecs.shape != (len(self.dock_hexes), 2):
+            raise ValueError(f'PortIndex needs two dock intersections per dock hex, got {self.dock_isecs.shape}')
+        n_games, n_tiles = self.objects.shape
+        isecs, docks = self.dock_isecs.ravel(), np.repeat(np.arange(len(self.dock_hexes)), 2)
+        order = np.lexsort((docks, isecs))
+        docks, self.isec_docks_mask = padded_pairs(isecs[order], docks[order], n_tiles)
+        self.isec_docks = np.where(self.isec_docks_mask, docks, 0).astype(np.uint16)  # rows without docks -> dock 0
+
+        self.dock_ratios = np.zeros((n_games, len(self.dock_hexes), len(Resource)), dtype=np.uint8)
+        self.ratios = np.zeros((n_games, self.n_players, len(Resource)), dtype=np.uint8)
+        self.rebuild()
+
+    def rebuild(self, games: npt.NDArray[bool] | npt.NDArray[np.intp] | int | None = None) -> None:
+        """ Re-derives dock and player ratios of the given games, e.g. after a reset, new ships or a restore """
+        g = np.atleast_1d(np.arange(len(self.objects))[slice(None) if games is None else games])
+        self.dock_ratios[g] = self.ship_ratios[self.objects[g[:, None], self.dock_hexes]]
+        owners = self.owner[g[:, None, None], self.dock_isecs]                     # (games, docks, 2)
+        owns = np.any(owners[:, None] == np.arange(self.n_players)[:, None, None], axis=-1)
+        self.ratios[g] = np.min(
+            np.where(owns[..., None], self.dock_ratios[g][:, None], self.bank_ratio), axis=2, initial=self.bank_ratio)
+
+    def on_building(self, g: npt.NDArray[np.intp], p: npt.NDArray[np.integer], isecs: npt.NDArray[np.integer]
+                    ) -> None:
+        """ Call after player p[i] placed a settlement (or city) at isecs[i] of game g[i] (games listed once) """
+        docks = self.isec_docks[isecs]
+        reached = np.where(self.isec_docks_mask[isecs][..., None], self.dock_ratios[g[:, None], docks],
+                           self.bank_ratio)
+        self.ratios[g, p] = np.minimum(self.ratios[g, p], reached.min(axis=1))
+
+    def isec_ratios(self, games: npt.NDArray[bool] | npt.NDArray[np.intp] | int | None = None
+                    ) -> npt.NDArray[np.uint8]:
+        """ (games, tiles, resources) ratios a settlement on each tile would give (bank_ratio away from docks) """
+        g = np.atleast_1d(np.arange(len(self.objects))[slice(None) if games is None else games])
+        docks = self.dock_ratios[g[:, None, None], self.isec_docks]
+        return np.where(self.isec_docks_mask[..., None], docks, self.bank_ratio).min(axis=2).astype(np.uint8)
+
@@ -0,0 +1,125 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from catan_objects import *
+from gamedata.board import NO_OWNER
+from gamedata.building_data import BuildingData
+from gamedata.layout import BoardLayout, padded_pairs
+import numpy as np
+import numpy.typing as npt
+
+
+NO_RESOURCE = np.iinfo(np.uint8).max
+ROLLS = range(2, 13)
+
+
+def terrain_resources(terrain_map: dict[Terrain, Resource]) -> npt.NDArray[np.uint8]:
+    """ Lookup table from Terrain value to produced Resource value (NO_RESOURCE if none) """
+    table = np.full(len(Terrain), NO_RESOURCE, dtype=np.uint8)
+    for terrain, resource in terrain_map.items():
+        table[terrain.value] = resource.value
+    return table
+
+
+def building_yields(buildings: BuildingData) -> npt.NDArray[np.uint8]:
+    """ Lookup table from Building value to resources produced per roll """
+    table = np.zeros(len(Building), dtype=np.uint8)
+    table[buildings.buildings] = buildings.yield_qtys
+    return table
+
+
+@dataclass
+class ProductionIndex:
+    """
+    Dice-roll production of games sharing one layout: every (hex, intersection) pair is a slot, sorted by chit
+    per game and kept current by on_building/on_robber, so a roll is one np.add.at into hands
+    """
+    layout: BoardLayout
+    yields: npt.NDArray[np.uint8]                 # by Building value
+    terrain_resource: npt.NDArray[np.uint8]       # by Terrain value
+    objects: npt.NDArray[np.uint8]                # (games, tiles)
+    owner: npt.NDArray[np.uint8]                  # (games, tiles)
+    chit: npt.NDArray[np.uint8]                   # (games, tiles)
+    robber: npt.NDArray[np.integer]               # (games,)
+
+    slot_hex: npt.NDArray[np.intp] = field(init=False, repr=False)          # (slots,)
+    slot_isec: npt.NDArray[np.intp] = field(init=False, repr=False)         # (slots,)
+    isec_slots: npt.NDArray[np.uint16] = field(init=False, repr=False)      # (tiles, width), by intersection
+    isec_slots_mask: npt.NDArray[bool] = field(init=False, repr=False)
+    hex_slots: npt.NDArray[np.uint16] = field(init=False, repr=False)       # (tiles, width), by hex
+    hex_slots_mask: npt.NDArray[bool] = field(init=False, repr=False)
+    order: npt.NDArray[np.intp] = field(init=False, repr=False)             # (games, slots), sorted by roll
+    offsets: npt.NDArray[np.intp] = field(init=False, repr=False)           # (games, 14), run of roll r
+    resource: npt.NDArray[np.uint8] = field(init=False, repr=False)         # (games, slots)
+    qty: npt.NDArray[np.uint8] = field(init=False, repr=False)              # (games, slots)
+    slot_owner: npt.NDArray[np.uint8] = field(init=False, repr=False)       # (games, slots)
+    width: int = field(init=False, repr=False)
+
+    def __post_init__(self):
+        layout = self.layout
+        hexes = layout.hexes
+        self.slot_hex = np.repeat(hexes, layout.hex_isecs_mask[hexes].sum(axis=1))
+        self.slot_isec = layout.hex_isecs[hexes][layout.hex_isecs_mask[hexes]].astype(np.intp)
+
+        slots = np.arange(len(self.slot_hex))
+        by_isec, by_hex = np.lexsort((slots, self.slot_isec)), np.lexsort((slots, self.slot_hex))
+        self.isec_slots, self.isec_slots_mask = padded_pairs(self.slot_isec[by_isec], by_isec, layout.n_tiles)
+        self.hex_slots, self.hex_slots_mask = padded_pairs(self.slot_hex[by_hex], by_hex, layout.n_tiles)
+
+        n_games = len(self.objects)
+        self.order = np.zeros((n_games, len(slots)), dtype=np.intp)
+        self.offsets = np.zeros((n_games, max(ROLLS) + 2), dtype=np.intp)
+        self.resource = np.zeros((n_games, len(slots)), dtype=np.uint8)
+        self.qty = np.zeros((n_games, len(slots)), dtype=np.uint8)
+        self.slot_owner = np.zeros((n_games, len(slots)), dtype=np.uint8)
+        self.rebuild()
+
+    def rebuild(self, games: npt.NDArray[bool] | npt.NDArray[np.intp] | None = None) -> None:
+        """ Re-derives the index of the given games from scratch, e.g. after a reset or new chits/terrain """
+        g = np.arange(len(self.objects)) if games is None else np.arange(len(self.objects))[games]
+        resource = self.terrain_resource[self.objects[g[:, None], self.slot_hex]]
+        roll = np.where(resource != NO_RESOURCE, self.chit[g[:, None], self.slot_hex], 0)
+        self.resource[g] = resource
+        self.order[g] = np.argsort(roll, axis=1, kind='stable')
+        self.offsets[g] = (roll[:, :, None] < np.arange(self.offsets.shape[1])).sum(axis=1)
+        counts = np.diff(self.offsets, axis=1)[:, min(ROLLS):]
+        self.width = max(1, int(counts.max(initial=0)))
+        self._refresh(g[:, None], np.arange(len(self.slot_hex))[None, :])
+
+    def refresh(self, games: npt.NDArray[bool] | npt.NDArray[np.intp] | int | None = None) -> None:
+        """ Recomputes slot owners/yields after owner, objects or robber were overwritten (e.g. a restore) """
+        g = np.arange(len(self.objects))[slice(None) if games is None else games]
+        self._refresh(np.atleast_1d(g)[:, None], np.arange(len(self.slot_hex))[None, :])
+
+    def _refresh(self, g, slots) -> None:
+        """ Recomputes owner/yield of the given slots (broadcast against game indices g) """
+        isecs = self.slot_isec[slots]
+        owner = self.owner[g, isecs]
+        blocked = self.slot_hex[slots] == self.robber[g]
+        self.qty[g, slots] = np.where(blocked | (owner == NO_OWNER), 0, self.yields[self.objects[g, isecs]])
+        self.slot_owner[g, slots] = np.where(owner == NO_OWNER, 0, owner)
+
+    def on_building(self, g: npt.NDArray[np.intp], isecs: npt.NDArray[np.integer]) -> None:
+        """ Call after settlements/cities were placed at isecs[i] in game g[i] """
+        slots = self.isec_slots[isecs]
+        keep = self.isec_slots_mask[isecs]
+        self._refresh(np.broadcast_to(g[:, None], slots.shape)[keep], slots[keep])
+
+    def on_robber(self, g: npt.NDArray[np.intp], old_hexes: npt.NDArray[np.integer]) -> None:
+        """ Call after the robber of games g moved away from old_hexes (new positions read from robber) """
+        for hexes in (old_hexes, self.robber[g]):
+            slots = self.hex_slots[hexes]
+            keep = self.hex_slots_mask[hexes]
+            self._refresh(np.broadcast_to(g[:, None], slots.shape)[keep], slots[keep])
+
+    def produce(self, g: npt.NDArray[np.intp], rolls: npt.NDArray[np.integer], hands: npt.NDArray[np.uint8]) -> None:
+        """ Adds production for rolls[i] of game g[i] into hands (games, players, resources) """
+        start = self.offsets[g, rolls]
+        runs = start[:, None] + np.arange(self.width)
+        in_run = runs < self.offsets[g, rolls + 1][:, None]
+        games = np.broadcast_to(g[:, None], runs.shape)[in_run]
+        slots = self.order[games, runs[in_run]]
+        qty = self.qty[games, slots]
+        give = qty > 0
+        np.add.at(hands, (games[give], self.slot_owner[games, slots][give], self.resource[games, slots][give]),
+                  qty[give])
+
@@ -0,0 +1,215 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from gamedata.observation import ObservationLayout
+from typing import Optional
+import os
+import numpy as np
+import numpy.typing as npt
+
+
+@dataclass
+class SumTree:
+    """
+    Binary tree of priority sums over capacity leaves stored in one array (node i has children 2i, 2i+1,
+    leaves start at the first power of two >= capacity); updates and sampling are vectorized per tree level
+    """
+    capacity: int
+    tree: npt.NDArray[np.float64] = field(init=False, repr=False)
+    leaves: int = field(init=False)
+
+    def __post_init__(self):
+        self.leaves = 1 << max(0, int(self.capacity - 1).bit_length())
+        self.tree = np.zeros(2 * self.leaves, dtype=np.float64)
+
+    @property
+    def total(self) -> float:
+        return float(self.tree[1])
+
+    def __getitem__(self, indices: npt.NDArray[np.integer]) -> npt.NDArray[np.float64]:
+        return self.tree[self.leaves + np.asarray(indices)]
+
+    def update(self, indices: npt.NDArray[np.integer], priorities: npt.NDArray[np.floating]) -> None:
+        nodes = self.leaves + np.asarray(indices)
+        self.tree[nodes] = priorities
+        while len(nodes) and nodes[0] > 1:
+            nodes = np.unique(nodes >> 1)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def find(self, targets: npt.NDArray[np.floating]) -> npt.NDArray[np.intp]:
+        """ Leaf index whose prefix sum interval contains each target (0 <= target < total) """
+        nodes = np.ones(len(targets), dtype=np.intp)
+        targets = np.array(targets, dtype=np.float64)
+        while nodes[0] < self.leaves:
+            left = 2 * nodes
+            right = targets >= self.tree[left]
+            targets -= np.where(right, self.tree[left], 0)
+            nodes = left + right
+        return np.minimum(nodes - self.leaves, self.capacity - 1)
+
+
+@dataclass
+class ReplayBatch:
+    indices: npt.NDArray[np.intp]
+    obs: dict[str, npt.NDArray]           # typed package_observation fields, (batch, ...)
+    masks: npt.NDArray[bool]              # (batch, n_actions)
+    actions: npt.NDArray[np.int32]
+    rewards: npt.NDArray[np.float32]
+    dones: npt.NDArray[bool]
+    next_obs: dict[str, npt.NDArray]
+    next_masks: npt.NDArray[bool]
+    weights: npt.NDArray[np.float32]      # importance sampling weights (ones for uniform sampling)
+
+
+@dataclass
+class ReplayBuffer:
+    """
+    Preallocated ring buffer (or .npy memmaps in directory) of transitions from n_envs envs stepped in lockstep;
+    row i's next observation is row i + n_envs, so the newest block is sampled only after the following add
+    Prioritized sampling (alpha > 0) draws from a sum tree, new transitions getting the highest priority seen
+    """
+    layout: ObservationLayout
+    capacity: int
+    n_actions: int
+    n_envs: int = 1
+    alpha: float = 0.
+    beta: float = 0.4  # importance sampling exponent of prioritized sampling
+    directory: Optional[str] = None
+    seed: Optional[int] = None
+    arrays: dict[str, npt.NDArray] = field(init=False, repr=False)
+    tree: Optional[SumTree] = field(init=False, default=None, repr=False)
+    cursor: int = field(init=False, default=0)    # row of the next add
+    size: int = field(init=False, default=0)      # rows written, up to capacity
+    max_priority: float = field(init=False, default=1.)
+    rng: np.random.Generator = field(init=False, repr=False)
+
+    def __post_init__(self):
+        if self.capacity < 2 * self.n_envs or self.capacity % self.n_envs:
+            raise ValueError('ReplayBuffer capacity must be a multiple of n_envs and hold two steps')
+        specs = {
+            'obs': ((self.capacity, self.layout.nbytes), np.uint8),
+            'masks': ((self.capacity, -(-self.n_actions // 8)), np.uint8),
+            'actions': ((self.capacity,), np.int32),
+            'rewards': ((self.capacity,), np.float32),
+            'dones': ((self.capacity,), np.bool_),
+        }
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+        self.arrays = {name: self._allocate(name, shape, dtype) for name, (shape, dtype) in specs.items()}
+        if self.alpha > 0:
+            self.tree = SumTree(self.capacity)
+        self.rng = np.random.default_rng(self.seed)
+
+    @classmethod
+    def for_data(cls, data, capacity: int, n_actions: int, **kwargs) -> ReplayBuffer:
+        """ Sized from a BatchedGameData's package_observation, one env per game """
+        layout = ObservationLayout(data.package_observation(), batched=True)
+        return cls(layout, capacity, n_actions, n_envs=data.n_games, **kwargs)
+
+    def _allocate(self, name: str, shape: tuple[int, ...], dtype) -> npt.NDArray:
+        if self.directory is None:
+            return np.zeros(shape, dtype=dtype)
+        return np.lib.format.open_memmap(os.path.join(self.directory, f'{name}.npy'), mode='w+',
+                                         dtype=dtype, shape=shape)
+
+    def __len__(self) -> int:
+        """ Number of sampleable transitions (those whose next observation is stored) """
+        return max(0, self.size - self.n_envs)
+
+    def add(self, obs: npt.NDArray[np.uint8] | dict[str, npt.NDArray], masks: npt.NDArray[bool],
+            actions: npt.NDArray[np.integer], rewards: npt.NDArray[np.floating], dones: npt.NDArray[bool]) -> None:
+        """
+        One step of every env: the observations and masks the actions were chosen from, then the actions and
+        their rewards and done flags. obs is either flat (n_envs, layout.nbytes) rows or package_observation
+        """
+        rows = slice(self.cursor, self.cursor + self.n_envs)
+        a = self.arrays
+        if isinstance(obs, dict):
+            views = self.layout.views(a['obs'][rows])
+            for name, value in obs.items():
+                np.copyto(views[name], value, casting='unsafe')
+        else:
+            a['obs'][rows] = obs
+        a['masks'][rows] = np.packbits(masks, axis=1)
+        a['actions'][rows], a['rewards'][rows], a['dones'][rows] = actions, rewards, dones
+        if self.tree is not None:
+            # the previous block now has its next observations: make it sampleable, hide the new one
+            previous = np.arange(self.cursor - self.n_envs, self.cursor) % self.capacity
+            if self.size:
+                self.tree.update(previous, np.full(self.n_envs, self.max_priority ** self.alpha))
+            self.tree.update(np.arange(rows.start, rows.stop), np.zeros(self.n_envs))
+        self.cursor = (self.cursor + self.n_envs) % self.capacity
+        self.size = min(self.capacity, self.size + self.n_envs)
+
+    def _indices(self, batch_size: int) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.float32]]:
+        if self.tree is None:
+            oldest = (self.cursor - self.size) % self.capacity
+            indices = (oldest + self.rng.integers(0, len(self), size=batch_size)) % self.capacity
+            return indices, np.ones(batch_size, dtype=np.float32)
+        total = self.tree.total
+        targets = (np.arange(batch_size) + self.rng.random(batch_size)) * (total / batch_size)
+        indices = self.tree.find(np.minimum(targets, np.nextafter(total, 0)))
+        probs = self.tree[indices] / total
+        weights = (len(self) * probs) ** -self.beta
+        return indices, (weights / weights.max()).astype(np.float32)
+
+    def sample(self, batch_size: int) -> ReplayBatch:
+        if not len(self):
+            raise ValueError('ReplayBuffer has no complete transitions yet')
+        indices, weights = self._indices(batch_size)
+        a = self.arrays
+        following = (indices + self.n_envs) % self.capacity
+        unpack = lambda rows: np.unpackbits(a['masks'][rows], axis=1, count=self.n_actions).astype(bool)
+        return ReplayBatch(
+            indices=indices,
+            obs=self.layout.views(a['obs'][indices]),
+            masks=unpack(indices),
+            actions=a['actions'][indices],
+            rewards=a['rewards'][indices],
+            dones=a['dones'][indices],
+            next_obs=self.layout.views(a['obs'][following]),
+            next_masks=unpack(following),
+            weights=weights
+        )
+
+    def update_priorities(self, indices: npt.NDArray[np.integer], priorities: npt.NDArray[np.floating]) -> None:
+        """ New priorities (e.g. absolute TD errors) of sampled transitions """
+        if self.tree is None:
+            raise ValueError('ReplayBuffer was created without prioritization (alpha=0)')
+        priorities = np.maximum(np.abs(priorities), 1e-6)
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        # the newest block stays hidden until its next observations arrive
+        newest = (indices - (self.cursor - self.n_envs)) % self.capacity < self.n_envs
+        self.tree.update(indices[~newest], priorities[~newest] ** self.alpha)
+
+    def flush(self) -> None:
+        """ Writes memmapped arrays back to disk """
+        for array in self.arrays.values():
+            if isinstance(array, np.memmap):
+                array.flush()
+
+
+if __name__ == '__main__':
+    import time
+    from game_loading.compiled_layout import load_default_layout
+    from batched_engine import BatchedEngine
+
+    engine = BatchedEngine(board=load_default_layout().board_data(), n_games=256, seed=0)
+    for alpha in (0., 0.6):
+        buffer = ReplayBuffer.for_data(engine.data, 256 * 400, engine.n_actions, alpha=alpha, seed=0)
+        obs = ObservationLayout(engine.data.package_observation(), batched=True).allocate(engine.n_games)
+        start = time.perf_counter()
+        for _ in range(400):
+            engine.data.write_observation(obs.views)
+            mask = engine.action_mask()
+            actions = np.argmax(mask + engine.rng.random(mask.shape), axis=1)
+            rewards, dones, _ = engine.step(*engine.decode_actions(actions))
+            buffer.add(obs.data, mask, actions, rewards, dones)
+        fill = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(200):
+            batch = buffer.sample(256)
+            if alpha:
+                buffer.update_priorities(batch.indices, buffer.rng.random(256))
+        print(f'alpha={alpha}: {len(buffer):,} transitions, {buffer.arrays["obs"].nbytes / 2**20:.0f} MiB of '
+              f'observations, {400 / fill:,.0f} steps/s with adds, {200 / (time.perf_counter() - start):,.0f} '
+              f'batches of 256/s')
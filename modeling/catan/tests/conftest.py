@@ -0,0 +1,22 @@
+import os
+import sys
+import pytest
+
+CATAN = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [path for path in (os.path.dirname(CATAN), CATAN) if path not in sys.path]
+
+
+@pytest.fixture(scope='session', autouse=True)
+def layout_cache(tmp_path_factory):
+    """ Compiled layouts go to a temporary cache instead of ~/.cache """
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv('CATAN_LAYOUT_CACHE', str(tmp_path_factory.mktemp('layouts')))
+        yield
+
+
+def play(engine, n_steps: int) -> None:
+    """ Random legal actions for every game of engine """
+    import numpy as np
+    for _ in range(n_steps):
+        mask = engine.action_mask()
+        engine.step(*engine.decode_actions(np.argmax(mask + engine.rng.random(mask.shape), axis=1)))
@@ -0,0 +1,35 @@
+import pytest
+from benchmark import BenchmarkResult, compare, main
+
+
+def ok(name, best):
+    return BenchmarkResult(name, 'calls/s', best=best, median=best, rates=[best])
+
+
+BASELINE = {'results': {
+    'fast': {'status': 'ok', 'best': 100.},
+    'slow': {'status': 'ok', 'best': 100.},
+    'gone': {'status': 'ok', 'best': 100.},
+    'broken': {'status': 'ok', 'best': 100.},
+    'was_skipped': {'status': 'skipped', 'best': None},
+}}
+
+
+def test_compare_flags_slowdowns_beyond_threshold():
+    results = {'fast': ok('fast', 90.), 'slow': ok('slow', 80.), 'gone': ok('gone', 100.),
+               'broken': ok('broken', 100.)}
+    assert compare(results, BASELINE, threshold=0.15) == [('slow', 100., 80., pytest.approx(-0.2))]
+    assert compare(results, BASELINE, threshold=0.25) == []
+
+
+def test_compare_reports_missing_and_skipped():
+    results = {'fast': ok('fast', 100.), 'slow': ok('slow', 100.),
+               'broken': BenchmarkResult('broken', 'calls/s', status='skipped', reason='no module'),
+               'was_skipped': ok('was_skipped', 1.)}
+    assert compare(results, BASELINE) == [('gone', 100., None, None), ('broken', 100., None, None)]
+    assert compare(results, BASELINE, patterns=['fast', 'slow']) == []
+
+
+def test_missing_baseline_fails(tmp_path, capsys):
+    assert main(['--baseline', str(tmp_path / 'none.json'), 'fast']) == 1
+    assert 'no baseline' in capsys.readouterr().out
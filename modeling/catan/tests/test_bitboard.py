@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from game_loading.compiled_layout import load_default_layout
+from gamedata import bitboard
+from gamedata.bitboard import TileMasks, n_words, pack, unpack
+
+
+@pytest.fixture(scope='module')
+def layout():
+    return load_default_layout().board_data().layout
+
+
+@pytest.fixture(scope='module')
+def masks(layout):
+    return TileMasks.build(layout)
+
+
+def dense(neighbor_masks, tile: int, n_tiles: int) -> set[int]:
+    """ The tiles in one sparse mask, unpacked through a full-width bitboard """
+    board = np.zeros(n_words(n_tiles), dtype=np.uint64)
+    np.bitwise_or.at(board, neighbor_masks.words[tile], neighbor_masks.bits[tile])
+    return set(np.flatnonzero(unpack(board, n_tiles)).tolist())
+
+
+def test_pack_round_trip():
+    rng = np.random.default_rng(0)
+    mask = rng.random((3, 5, 130)) < 0.3
+    bits = pack(mask)
+    assert bits.shape == (3, 5, 3) and bits.dtype == np.uint64
+    np.testing.assert_array_equal(unpack(bits, 130), mask)
+    t = rng.integers(0, 130, (3, 5))
+    np.testing.assert_array_equal(bitboard.test(bits, t), np.take_along_axis(mask, t[..., None], axis=-1)[..., 0])
+
+
+def test_masks_match_layout_tables(layout, masks):
+    n_tiles = layout.n_tiles
+    for name in ('hexes', 'isecs', 'paths'):
+        np.testing.assert_array_equal(np.flatnonzero(unpack(getattr(masks, name), n_tiles)), getattr(layout, name))
+    tables = [('isec_block', 'isec_isecs', True), ('isec_paths', 'isec_paths', False),
+              ('path_isecs', 'path_isecs', False), ('hex_isecs', 'hex_isecs', False)]
+    for name, table, include_self in tables:
+        rows, row_mask = getattr(layout, table), getattr(layout, f'{table}_mask')
+        for tile in range(n_tiles):
+            expected = set(rows[tile][row_mask[tile]].tolist())
+            if include_self or not expected:
+                expected.add(tile)
+            assert dense(getattr(masks, name), tile, n_tiles) == expected, (name, tile)
+
+
+def test_hits_match_byte_checks(layout, masks):
+    rng = np.random.default_rng(1)
+    n_games, n_tiles = 512, layout.n_tiles
+    objects = (rng.random((n_games, n_tiles)) < 0.1).astype(np.uint8)
+    occupied = pack(objects != 0)
+    games = np.arange(n_games)
+
+    targets = rng.choice(layout.isecs, size=n_games)
+    byte_ok = (objects[games, targets] == 0) & ~np.any(objects[games[:, None], layout.isec_isecs[targets]], axis=-1)
+    np.testing.assert_array_equal(~masks.isec_block.hits(occupied, targets), byte_ok)
+
+    several = rng.choice(layout.paths, size=(n_games, 3))
+    ends = layout.path_isecs[several]
+    np.testing.assert_array_equal(masks.path_isecs.hits(occupied, several),
+                                  np.any(objects[games[:, None, None], ends], axis=-1))
+
+    hexes = layout.hexes[:10]
+    expected = np.stack([np.any(objects[:, layout.hex_isecs[h][layout.hex_isecs_mask[h]]], axis=-1) for h in hexes],
+                        axis=-1)
+    np.testing.assert_array_equal(masks.hex_isecs.hits_each(occupied, hexes), expected)
@@ -0,0 +1,54 @@
+from collections import Counter
+import numpy as np
+import pytest
+from catan_objects import Environment, Terrain
+from game_loading.board_generator import BoardGenerator, RED_CHITS
+from game_loading.compiled_layout import load_default_layout
+from game_loading.default_board import CHITS, TERRAIN_COUNTS, TRADE_SHIP_PLACEMENTS, TRADE_SHIP_TILES
+
+
+@pytest.fixture(scope='module')
+def board():
+    return load_default_layout().board_data()
+
+
+def land_neighbors(board) -> dict[int, set[int]]:
+    """ Land hexes sharing a corner, from the hex -> intersection table """
+    layout = board.layout
+    land = [h for h in layout.hexes if board.environment[h] == Environment.Land.value]
+    corners = {h: set(layout.hex_isecs[h][layout.hex_isecs_mask[h]].tolist()) for h in land}
+    return {h: {o for o in land if o != h and corners[h] & corners[o]} for h in land}
+
+
+def test_boards_satisfy_constraints(board):
+    boards = BoardGenerator(board, seed=3).generate(300)
+    neighbors = land_neighbors(board)
+    position = {int(h): i for i, h in enumerate(boards.hexes)}
+    for objects, chits, robber in zip(boards.objects, boards.chits, boards.robber):
+        terrain = {h: objects[position[h]] for h in neighbors}
+        chit = {h: chits[position[h]] for h in neighbors}
+        assert Counter(Terrain(t) for t in terrain.values()) == TERRAIN_COUNTS
+        assert Counter(c for c in chit.values() if c) == CHITS and 7 not in chit.values()
+        assert all((chit[h] == 0) == (terrain[h] == Terrain.Desert.value) for h in neighbors)
+        assert terrain[int(robber)] == Terrain.Desert.value
+        for h, others in neighbors.items():
+            assert sum(terrain[o] == terrain[h] for o in others) <= 1
+            assert not (chit[h] in RED_CHITS and any(chit[o] in RED_CHITS for o in others))
+        dealt = sorted(tuple(objects[[position[t] for t in slots]].tolist()) for slots in TRADE_SHIP_PLACEMENTS)
+        assert dealt == sorted(tuple(s.value for s in group) for group in TRADE_SHIP_TILES)
+        assert not np.delete(objects, [position[h] for h in neighbors] +
+                             [position[t] for slots in TRADE_SHIP_PLACEMENTS for t in slots]).any()
+
+
+def test_seeded_generation_is_reproducible(board):
+    a, b = BoardGenerator(board, seed=7).generate(64), BoardGenerator(board, seed=7).generate(64)
+    for name in ('objects', 'chits', 'robber'):
+        np.testing.assert_array_equal(getattr(a, name), getattr(b, name))
+    assert not np.array_equal(a.objects, BoardGenerator(board, seed=8).generate(64).objects)
+
+
+def test_unsatisfiable_and_invalid_settings(board):
+    with pytest.raises(RuntimeError):
+        BoardGenerator(board, seed=0, max_same_terrain=-1, max_rounds=3).generate(4)
+    with pytest.raises(ValueError):
+        BoardGenerator(board, terrain_counts={Terrain.Hill: 3})
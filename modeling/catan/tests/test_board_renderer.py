@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from board_renderer import BACKGROUND, BoardRenderer
+from catan_objects import Building, Space
+from game_loading.axial_layout import AxialLayoutSpec
+from game_loading.compiled_layout import load_default_layout
+from gamedata.board import NO_OWNER
+from hex_board.rendering import FrameRecorder
+
+
+def test_recorder_chunks_and_clear(tmp_path):
+    recorder = FrameRecorder((2, 3, 3), chunk_size=4)
+    frames = np.arange(10 * 18, dtype=np.uint8).reshape(10, 2, 3, 3)
+    for frame in frames:
+        recorder.add(frame)
+    assert len(recorder.chunks) == 3
+    np.testing.assert_array_equal(recorder.frames(), frames)
+    recorder.save_frames(str(tmp_path / 'frames.npz'))
+    np.testing.assert_array_equal(np.load(tmp_path / 'frames.npz')['frames'], frames)
+    recorder.clear()
+    assert recorder.frames().shape == (0, 2, 3, 3)
+
+
+def test_save_video_without_frames():
+    with pytest.raises(ValueError):
+        FrameRecorder((2, 3, 3)).save_video('unused.gif')
+
+
+def test_layout_renderer_matches_default_grid():
+    compiled = load_default_layout()
+    tile_types = [tile.tile_type for tile in BoardRenderer.for_layout(compiled).tiles]
+    assert tile_types == [tile.tile_type for tile in BoardRenderer.for_board(compiled.board_data()).tiles]
+
+
+def test_layout_renderer_draws_any_shape():
+    compiled = AxialLayoutSpec.hexagon(4).compile()
+    renderer = BoardRenderer.for_layout(compiled, unit=2)
+    assert renderer.frame.shape == (renderer.resolution[1], renderer.resolution[0], 3)
+    objects, owner = compiled.objects.copy(), np.full(len(compiled.space), NO_OWNER, dtype=np.uint8)
+    base = renderer.render(objects, owner, compiled.chit, 0).copy()
+    assert (base != BACKGROUND).any(axis=-1).mean() > 0.5
+    path = int(np.flatnonzero(compiled.space == Space.Path.value)[0])
+    objects[path], owner[path] = Building.Road.value, 1
+    assert (renderer.render(objects, owner, compiled.chit, 0) != base).any()
@@ -0,0 +1,51 @@
+from dataclasses import fields
+import itertools
+import numpy as np
+import pytest
+from gamedata.board import BoardData
+from gamedata.layout import BoardLayout
+from game_loading import compiled_layout
+from game_loading.compiled_layout import CompiledLayout, TILE_ARRAYS, default_layout_key, load_default_layout
+from game_loading.default_board import make_default_board, TRADE_SHIP_PLACEMENTS
+
+
+@pytest.fixture(scope='module')
+def compiled():
+    return CompiledLayout.compile('test', make_default_board(), list(itertools.chain(*TRADE_SHIP_PLACEMENTS)))
+
+
+def assert_same(a: CompiledLayout, b: CompiledLayout) -> None:
+    for name in TILE_ARRAYS:
+        np.testing.assert_array_equal(getattr(a, name), getattr(b, name), err_msg=name)
+    for f in fields(BoardLayout):
+        np.testing.assert_array_equal(getattr(a.layout, f.name), getattr(b.layout, f.name), err_msg=f.name)
+
+
+def test_save_load_round_trip(compiled, tmp_path):
+    compiled.save(str(tmp_path))
+    compiled.save(str(tmp_path))  # already there: kept
+    for mmap_mode in ('r', None):
+        loaded = CompiledLayout.load(str(tmp_path), 'test', mmap_mode=mmap_mode)
+        assert loaded.key == 'test'
+        assert_same(loaded, compiled)
+    assert isinstance(CompiledLayout.load(str(tmp_path), 'test').space, np.memmap)
+
+
+def test_board_data_matches_default_board(tmp_path):
+    board, expected = load_default_layout(str(tmp_path)).board_data(), BoardData(make_default_board())
+    for name in ('space', 'environment', 'objects', 'owner', 'chit', 'connections'):
+        np.testing.assert_array_equal(getattr(board, name), getattr(expected, name), err_msg=name)
+    for f in fields(BoardLayout):
+        np.testing.assert_array_equal(getattr(board.layout, f.name), getattr(expected.layout, f.name))
+    assert board.zobrist_hash == expected.zobrist_hash and board.robber == expected.robber
+
+
+def test_key_follows_producing_sources(tmp_path, monkeypatch):
+    source = tmp_path / 'layout_source_probe.py'
+    source.write_text('X = 1\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(compiled_layout, 'LAYOUT_SOURCES', compiled_layout.LAYOUT_SOURCES + ('layout_source_probe',))
+    key = default_layout_key()
+    assert default_layout_key() == key
+    source.write_text('X = 2\n')
+    assert default_layout_key() != key
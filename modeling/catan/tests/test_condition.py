@@ -0,0 +1,128 @@
+from dataclasses import dataclass
+import numpy as np
+from collections import Counter
+from condition import AnyTrue, Condition, ConditionKeeper, PlanOp, compile_conditions
+from catan_objects import Building, Space
+from game_loading.compiled_layout import load_default_layout
+from gamedata.board import BoardData
+
+
+@dataclass
+class BoardKeeper(ConditionKeeper):
+    board: BoardData = None
+
+    def __post_init__(self):
+        super().__post_init__()
+        self.board.keeper = self
+
+
+@dataclass
+class ArrayKeeper(ConditionKeeper):
+    a: np.ndarray = None
+    b: np.ndarray = None
+
+
+CHECKS = Counter()
+
+
+@dataclass
+class AAbove(Condition):
+    reads = ('a',)
+
+    def check(self, keeper):
+        CHECKS[self.identifier] += 1
+        return keeper.a > self.value
+
+
+@dataclass
+class BAbove(Condition):
+    reads = ('b',)
+
+    def check(self, keeper):
+        CHECKS[self.identifier] += 1
+        return keeper.b > self.value
+
+
+@dataclass
+class OwnedBy(Condition):
+    reads = ('board.owner',)
+
+    def check(self, keeper):
+        return keeper.board.owner == self.value
+
+
+@dataclass
+class RobberOn(Condition):
+    reads = ('board.robber',)
+
+    def check(self, keeper):
+        return np.arange(keeper.board.n_tiles) == keeper.board.robber
+
+
+def test_board_mutators_invalidate_memo():
+    keeper = BoardKeeper(board=load_default_layout().board_data())
+    board, owned, robber = keeper.board, OwnedBy(value=1), RobberOn()
+    tile = int(np.flatnonzero(board.space == Space.Intersection.value)[0])
+    snapshot = board.snapshot()
+    assert not keeper.get_status(owned).any() and keeper.memo_status(owned)[1]
+    assert keeper.get_status(robber)[0] and keeper.memo_status(robber)[1]
+
+    board.place(tile, Building.Settlement, 1)
+    status, hit = keeper.memo_status(owned)
+    assert not hit and np.flatnonzero(status).tolist() == [tile]
+    assert keeper.memo_status(robber)[1]
+
+    board.move_robber(5)
+    status, hit = keeper.memo_status(robber)
+    assert not hit and np.flatnonzero(status).tolist() == [5]
+    assert keeper.memo_status(owned)[1]
+
+    board.restore(snapshot)
+    assert not keeper.get_status(owned).any() and keeper.get_status(robber)[0]
+
+
+def test_identifier_cached_per_node():
+    tree = OwnedBy(value=1) & ~RobberOn()
+    assert tree.identifier == 'OwnedBy_1&~RobberOn'
+    assert tree.__dict__['identifier'] is tree.identifier
+    assert tree.conditions[1].__dict__['identifier'] == '~RobberOn'
+
+
+def test_plan_dedups_identical_subtrees():
+    a, b = AAbove(value=1), BAbove(value=2)
+    plan = compile_conditions(a & b, BAbove(value=2) & AAbove(value=1), ~(a & b), AAbove(value=3) | a)
+    ops = [node.op for node in plan.nodes]
+    assert ops.count(PlanOp.Leaf) == 3 and ops.count(PlanOp.And) == 1 and ops.count(PlanOp.Invert) == 1
+    assert plan.outputs[0] == plan.outputs[1] == plan.nodes[plan.outputs[2]].inputs[0]
+    assert len(plan.nodes) == 6
+
+
+def test_plan_rechecks_only_touched_leaves():
+    rng = np.random.default_rng(0)
+    keeper = ArrayKeeper(a=rng.integers(0, 5, 8), b=rng.integers(0, 5, 8))
+    plan = compile_conditions(AAbove(value=1) & ~BAbove(value=2), AnyTrue(condition=BAbove(value=3)))
+    CHECKS.clear()
+    plan.evaluate(keeper)
+    plan.evaluate(keeper)
+    assert CHECKS == {'AAbove_1': 1, 'BAbove_2': 1, 'BAbove_3': 1}
+    keeper.a = rng.integers(0, 5, 8)
+    keeper.touch('a')
+    plan.evaluate(keeper)
+    assert CHECKS == {'AAbove_1': 2, 'BAbove_2': 1, 'BAbove_3': 1}
+
+
+def test_plan_matches_condition_tree():
+    rng = np.random.default_rng(1)
+    keeper = ArrayKeeper(a=rng.integers(0, 5, 16), b=rng.integers(0, 5, 16))
+    trees = [
+        (AAbove(value=1) & BAbove(value=2)) | ~AAbove(value=3),
+        ~(BAbove(value=0) | AAbove(value=2)) & BAbove(value=1) & AAbove(value=0),
+        AnyTrue(condition=AAbove(value=3) & BAbove(value=3)),
+    ]
+    plan = compile_conditions(*trees)
+    for step in range(6):
+        for tree, result in zip(trees, plan.evaluate(keeper)):
+            np.testing.assert_array_equal(result, tree.check(keeper))
+        name = 'ab'[step % 2]
+        setattr(keeper, name, rng.integers(0, 5, 16))
+        keeper.touch(name)
@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+from catan_objects import *
+from batched_engine import BatchedEngine, PASS_ACTION, DEV_CARD_ACTION, PLAY_ACTION, RESOURCE_ACTION
+from game_loading.board_generator import BoardGenerator
+from game_loading.compiled_layout import load_default_layout
+from game_loading.default_rules import LARGEST_ARMY_POINTS
+
+
+@pytest.fixture
+def engine():
+    """ One game on a generated board, played randomly up to the first regular turn """
+    board = load_default_layout().board_data()
+    engine = BatchedEngine(board=board, n_games=1, seed=0, generator=BoardGenerator(board, seed=0))
+    while engine.data.event[0] != Event.PlayerTurn.value:
+        mask = engine.action_mask()
+        engine.step(*engine.decode_actions(np.argmax(mask + engine.rng.random(mask.shape), axis=1)))
+    engine.data.hands[...] = 0
+    return engine
+
+
+def act(engine, action: int, outcomes=None) -> bool:
+    """ Steps the flat action (offset from the tile actions) with forced chance outcomes """
+    if outcomes is not None:
+        engine.forced = np.array([outcomes], dtype=np.uint8)
+    _, _, valid = engine.step(*engine.decode_actions(np.array([engine.board.n_tiles + action])))
+    engine.forced = None
+    return bool(valid[0])
+
+
+def give_card(engine, card: DevelopmentCard) -> None:
+    d = engine.data
+    d.dev_cards[0, d.cur_player[0], card.value] += 1
+
+
+def test_seven_discards_half_in_turn_order(engine):
+    d = engine.data
+    roller = (d.cur_player[0] + 1) % engine.n_players
+    d.hands[0, roller] = [3, 3, 3, 0, 0]                   # 9 cards: discards 4
+    d.hands[0, (roller + 1) % 4] = [7, 0, 0, 0, 0]         # 7 cards: keeps them
+    d.hands[0, (roller + 2) % 4] = [2, 2, 2, 2, 2]         # 10 cards: discards 5
+    assert act(engine, PASS_ACTION, [7, 0])
+
+    for player, n_discards in ((roller, 4), ((roller + 2) % 4, 5)):
+        for _ in range(n_discards):
+            assert d.event[0] == Event.PickDiscard.value and d.cur_player[0] == player
+            held = np.flatnonzero(d.hands[0, player])
+            assert act(engine, RESOURCE_ACTION + int(held[0]))
+    assert d.event[0] == Event.PlaceRobber.value and d.cur_player[0] == roller
+    np.testing.assert_array_equal(d.hands[0].sum(axis=1)[[roller, (roller + 1) % 4, (roller + 2) % 4]], [5, 7, 5])
+
+
+def test_dev_card_rules(engine):
+    d = engine.data
+    d.hands[0, d.cur_player[0]] = [0, 0, 1, 1, 1]
+    assert act(engine, DEV_CARD_ACTION, [DevelopmentCard.Knight.value, 0])
+    knight = engine.board.n_tiles + PLAY_ACTION + DevelopmentCard.Knight.value
+    assert not engine.action_mask()[0, knight]          # bought this turn
+    assert not act(engine, PLAY_ACTION + DevelopmentCard.Knight.value)
+
+    d.new_cards[0] = 0
+    give_card(engine, DevelopmentCard.Monopoly)
+    assert act(engine, PLAY_ACTION + DevelopmentCard.Knight.value)
+    assert d.event[0] == Event.PlaceRobber.value
+    d.event[0] = Event.PlayerTurn.value
+    assert not engine.action_mask()[0, engine.board.n_tiles + PLAY_ACTION:engine.board.n_tiles + RESOURCE_ACTION].any()
+
+
+def test_year_of_plenty_and_monopoly(engine):
+    d = engine.data
+    p = d.cur_player[0]
+    give_card(engine, DevelopmentCard.YearOfPlenty)
+    assert act(engine, PLAY_ACTION + DevelopmentCard.YearOfPlenty.value)
+    assert act(engine, RESOURCE_ACTION + Resource.Ore.value)
+    assert act(engine, RESOURCE_ACTION + Resource.Ore.value)
+    assert d.hands[0, p, Resource.Ore.value] == 2 and d.event[0] == Event.PlayerTurn.value
+
+    d.dev_played[0] = 0
+    d.hands[0, :, Resource.Wool.value] = [1, 2, 3, 4]
+    give_card(engine, DevelopmentCard.Monopoly)
+    assert act(engine, PLAY_ACTION + DevelopmentCard.Monopoly.value)
+    assert act(engine, RESOURCE_ACTION + Resource.Wool.value)
+    expected = np.zeros(engine.n_players)
+    expected[p] = 10
+    np.testing.assert_array_equal(d.hands[0, :, Resource.Wool.value], expected)
+
+
+def test_road_building(engine):
+    d = engine.data
+    p = d.cur_player[0]
+    roads = d.qty_built[0, p, engine._road_row]
+    give_card(engine, DevelopmentCard.RoadBuilding)
+    assert act(engine, PLAY_ACTION + DevelopmentCard.RoadBuilding.value)
+    for _ in range(2):
+        assert d.event[0] == Event.PlaceBuilding.value
+        target = np.flatnonzero(engine.tile_mask()[0])[0]
+        assert engine.step(*engine.decode_actions(np.array([target])))[2][0]
+    assert d.event[0] == Event.PlayerTurn.value and d.qty_built[0, p, engine._road_row] == roads + 2
+    assert d.hands[0, p].sum() == 0
+
+
+def test_largest_army(engine):
+    d = engine.data
+    p = int(d.cur_player[0])
+    other = (p + 1) % engine.n_players
+    for knights in range(1, 4):
+        d.dev_played[0], d.event[0] = 0, Event.PlayerTurn.value
+        points = int(d.victory_points[0, p])
+        give_card(engine, DevelopmentCard.Knight)
+        assert act(engine, PLAY_ACTION + DevelopmentCard.Knight.value)
+        assert d.knights_played[0, p] == knights
+    assert d.army_holder[0] == p and d.victory_points[0, p] == points + LARGEST_ARMY_POINTS
+
+    # a tie does not take the army; one more knight does
+    d.knights_played[0, other] = 2
+    engine._hire_knights(np.array([0]), np.array([other]))
+    assert d.army_holder[0] == p
+    engine._hire_knights(np.array([0]), np.array([other]))
+    assert d.army_holder[0] == other and d.victory_points[0, p] == points
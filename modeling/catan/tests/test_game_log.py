@@ -0,0 +1,61 @@
+import os
+import numpy as np
+import pytest
+from catan_objects import Space
+from batched_engine import BatchedEngine
+from game_loading.board_generator import BoardGenerator
+from game_loading.compiled_layout import load_default_layout
+from gamedata.board import NO_OWNER
+from game_log import GameLog, GameLogWriter, GameRecorder, GameReplay
+
+
+@pytest.fixture
+def layout():
+    compiled = load_default_layout()
+    board = compiled.board_data()
+    return compiled, board, np.flatnonzero(board.space == Space.Hex.value)
+
+
+def record(path, layout, n_steps, seed=0):
+    compiled, board, hexes = layout
+    engine = BatchedEngine(board=board, n_games=8, seed=seed, max_turns=60, generator=BoardGenerator(board, seed=seed))
+    recorder = GameRecorder(engine, GameLogWriter(path, compiled.key, hexes, board.n_tiles, chunk_games=4))
+    for _ in range(n_steps):
+        mask = engine.action_mask()
+        recorder.step(*engine.decode_actions(np.argmax(mask * engine.rng.random(mask.shape), axis=1)))
+    recorder.close()
+    return engine, recorder.n_games_logged
+
+
+def test_write_read_replay(tmp_path, layout):
+    path = str(tmp_path / 'games.log')
+    engine, n_games = record(path, layout, 800)
+    assert n_games > 0
+    with GameLog(path) as log:
+        assert len(log) == n_games
+        for game in range(min(3, len(log))):
+            replay = GameReplay(log, game, layout[1], keyframe_interval=16)
+            data = replay.seek(replay.n_steps)
+            final = replay.snapshot(replay.n_steps).state.copy()
+            winner = int(log.games[game]['winner'])
+            if winner != NO_OWNER:
+                assert data.victory_points[0, winner] >= engine.win_points
+            np.testing.assert_array_equal(replay.snapshot(replay.n_steps // 2).state,
+                                          GameReplay(log, game, layout[1]).snapshot(replay.n_steps // 2).state)
+            np.testing.assert_array_equal(replay.snapshot(replay.n_steps).state, final)
+
+
+def test_reopening_truncates_a_torn_chunk(tmp_path, layout):
+    path = str(tmp_path / 'games.log')
+    _, first = record(path, layout, 800)
+    size = os.path.getsize(path)
+    with open(path, 'ab') as f:
+        f.write(b'CHNK' + bytes(40))  # header of a chunk whose write was interrupted
+    compiled, board, hexes = layout
+    GameLogWriter(path, compiled.key, hexes, board.n_tiles).close()
+    assert os.path.getsize(path) == size
+    _, second = record(path, layout, 800, seed=1)
+    with GameLog(path) as log:
+        assert len(log) == first + second
+        game = len(log) - 1
+        GameReplay(log, game, board).seek(int(log.games[game]['n_records']))
@@ -0,0 +1,66 @@
+from dataclasses import dataclass, field
+import numpy as np
+from catan_objects import Event, Request
+from game_state import DispatchTable, GameState, StateMap
+
+
+@dataclass
+class Context:
+    calls: list = field(default_factory=list)
+
+
+@dataclass
+class TurnState(GameState):
+    @property
+    def request_functions(self):
+        return {
+            Request.Pass: lambda context, *args: context.calls.append(('turn.pass', args)),
+            Request.Trade: lambda context, *args: context.calls.append(('turn.trade', args)),
+        }
+
+    def handle_undefined_request(self, context=None, *args):
+        self.context.calls.append(('turn.undefined', args))
+
+
+@dataclass
+class RobberState(GameState):
+    @property
+    def request_functions(self):
+        return {Request.SelectTile: lambda context, *args: context.calls.append(('robber.tile', args))}
+
+
+def test_table_dispatches_like_state_lookup():
+    context = Context()
+    states = {Event.PlayerTurn: TurnState(), Event.PlaceRobber: RobberState()}
+    state_map = StateMap(states)
+    for state in states.values():
+        state.context = context
+    table = state_map.table
+    for event in states:
+        for request in Request:
+            state_map.state_map[event.value].handle_request(request, 7)
+            old = context.calls[:]
+            context.calls.clear()
+            table.handle_request(event, request, 7)
+            assert context.calls == old, (event, request)
+            assert table.defined[event.value, request.value] == (request in states[event].request_functions)
+            context.calls.clear()
+    assert context.calls == [] and table.handle_request(Event.Start, Request.Pass) is None
+    assert table.defined.sum() == 3
+
+
+def test_from_handlers_fallback_and_batched_dispatch():
+    seen, missed = [], []
+    table = DispatchTable.from_handlers({
+        (Event.PlayerTurn, Request.Pass): lambda games, args: seen.append(('pass', games.tolist())),
+        (Event.PlayerTurn, Request.Trade): lambda games, args: args > 1,
+    }, undefined_handler=lambda *args: missed.append(args))
+    table.handle_request(Event.Start, Request.Pass, 1)
+    assert missed == [(1,)] and table.lookup(Event.PlayerTurn, Request.Pass) is not table.undefined_handler
+
+    events = np.array([Event.PlayerTurn.value] * 4 + [Event.Start.value, -1])
+    requests = np.array([Request.Pass.value, Request.Trade.value, Request.Pass.value, Request.Trade.value,
+                         Request.Pass.value, Request.Pass.value])
+    valid = table.handle_requests(events, requests, np.array([0, 1, 2, 3, 4, 5]))
+    np.testing.assert_array_equal(valid, [True, False, True, True, False, False])
+    assert seen == [('pass', [0, 2])] and missed == [(1,)]
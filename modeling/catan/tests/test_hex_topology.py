@@ -0,0 +1,60 @@
+from collections import defaultdict
+import numpy as np
+import pytest
+from hex_board import HexBoard, TileType, hex_topology
+from hex_board import calculations as calcs
+
+
+def pixel_topology(resolution, n_hexes_yaxis, n_hexes_xaxis):
+    """ The previous HexBoard construction: tiles found by pixel position, as (type, loc, connection set) """
+    hex_size = min(calcs.calc_hex_height(resolution[1], n_hexes_yaxis),
+                   calcs.calc_hex_width(resolution[0], n_hexes_xaxis))
+    top_buffer = calcs.calc_buffer_height(resolution[1], hex_size, n_hexes_yaxis)
+    left_buffer = calcs.calc_buffer_width(resolution[0], hex_size, n_hexes_xaxis)
+    hex_connections, isec_connections, path_connections = defaultdict(set), defaultdict(set), defaultdict(set)
+    hex_y = top_buffer + hex_size // 2
+    for row in range(n_hexes_yaxis):
+        ylocs = [hex_y - hex_size // 2 + step * hex_size // 8 for step in range(9)]
+        hex_x = left_buffer + hex_size // 2 + (row % 2) * hex_size // 2
+        for column in range(n_hexes_xaxis):
+            hex_loc = (hex_y, hex_x)
+            xlocs = [hex_x - hex_size // 2 + step * hex_size // 4 for step in range(5)]
+            isecs = [(ylocs[iy], xlocs[ix]) for (iy, ix) in [(0, 2), (2, 4), (6, 4), (8, 2), (6, 0), (2, 0)]]
+            paths = [(ylocs[iy], xlocs[ix]) for (iy, ix) in [(1, 1), (1, 3), (4, 4), (7, 3), (7, 1), (4, 0)]]
+            for i in range(6):
+                hex_connections[hex_loc].add(isecs[i])
+                isec_connections[isecs[i]] |= {paths[i], paths[(i + 1) % 6], hex_loc}
+                path_connections[paths[i]] = {isecs[i], isecs[i - 1]}
+            hex_x += hex_size
+        hex_y += hex_size * 3 // 4
+
+    tile_index = [loc for table in (hex_connections, isec_connections, path_connections) for loc in sorted(table)]
+    index_of = {loc: i for i, loc in enumerate(tile_index)}
+    connections = {**hex_connections, **isec_connections, **path_connections}
+    return [
+        (TileType.Hex if loc in hex_connections else TileType.Intersection if loc in isec_connections else
+         calcs.get_path_type(*path_connections[loc]), loc, {index_of[c] for c in connections[loc]})
+        for loc in tile_index
+    ]
+
+
+@pytest.mark.parametrize('resolution, n_rows, n_columns', [
+    ((1920, 1080), 7, 7), ((640, 480), 3, 4), ((1024, 1024), 1, 1), ((2048, 1600), 10, 12), ((800, 800), 6, 2),
+])
+def test_lattice_builder_matches_pixel_builder(resolution, n_rows, n_columns):
+    board = HexBoard(resolution, n_hexes_yaxis=n_rows, n_hexes_xaxis=n_columns, margin=5)
+    expected = pixel_topology(resolution, n_rows, n_columns)
+    assert [(t.tile_type, t.loc, set(t.connections)) for t in board.tiles] == expected
+    assert [t.index for t in board.tiles] == list(range(len(expected)))
+    for tile in board.tiles:
+        assert list(board.adjacency.neighbors_of(tile.index)) == sorted(tile.connections)
+
+
+def test_topology_is_resolution_free():
+    tiles, adjacency = hex_topology(4, 5)
+    scaled, _ = hex_topology(4, 5, unit=6, origin=(10, 20))
+    assert [(t.tile_type, t.connections) for t in tiles] == [(t.tile_type, t.connections) for t in scaled]
+    assert all(s.loc == (10 + 6 * t.loc[0], 20 + 6 * t.loc[1]) for t, s in zip(tiles, scaled))
+    np.testing.assert_array_equal(adjacency.rows(), np.repeat(np.arange(len(tiles)), adjacency.degrees))
+    padded = adjacency.padded()
+    assert all(set(padded[t.index]) == set(t.connections) for t in tiles)
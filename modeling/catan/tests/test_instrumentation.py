@@ -0,0 +1,61 @@
+from dataclasses import dataclass
+import numpy as np
+from condition import Condition, ConditionKeeper
+from instrumentation import Profiler
+
+
+@dataclass
+class ArrayKeeper(ConditionKeeper):
+    values: np.ndarray = None
+
+
+@dataclass
+class Above(Condition):
+    reads = ('values',)
+
+    def check(self, keeper):
+        return keeper.values > self.value
+
+
+@dataclass
+class Nonzero(Condition):
+    reads = ('other',)
+
+    def check(self, keeper):
+        return keeper.values != 0
+
+
+def test_condition_counters():
+    keeper, profiler = ArrayKeeper(values=np.arange(4)), Profiler()
+    tree = Above(value=1) & Nonzero()
+    with profiler.attached(keeper):
+        for _ in range(3):
+            np.testing.assert_array_equal(keeper.get_status(tree), [False, False, True, True])
+        keeper.touch('values')
+        keeper.get_status(tree)
+    keeper.get_status(tree)  # detached: not counted
+    counters = profiler.conditions
+    assert (counters['Above_1&Nonzero'].calls, counters['Above_1&Nonzero'].hits,
+            counters['Above_1&Nonzero'].misses) == (4, 2, 2)
+    assert (counters['Above_1'].calls, counters['Above_1'].hits, counters['Above_1'].misses) == (2, 0, 2)
+    assert (counters['Nonzero'].calls, counters['Nonzero'].hits, counters['Nonzero'].misses) == (2, 1, 1)
+    assert counters['Above_1&Nonzero'].seconds >= counters['Above_1'].seconds + counters['Nonzero'].seconds > 0
+    assert ('Above_1&Nonzero', 'Above_1') in profiler.stacks
+    assert 'Above_1&Nonzero;Nonzero ' in profiler.flamegraph()
+    assert keeper.profiler is None
+
+
+def test_handler_counters():
+    profiler = Profiler()
+    profiler.handle('Turn', 'Pass', lambda: None)
+    profiler.handle('Turn', 'Trade', lambda: None, defined=False)
+    valid = profiler.handle_batch('Turn', 'Build', lambda games, args: games % 2 == 0, np.arange(5), None)
+    np.testing.assert_array_equal(valid, [True, False, True, False, True])
+    profiler.handle_batch('Turn', 'Build', lambda games, args: None, np.arange(3), None)
+    handlers = profiler.handlers
+    assert (handlers['Turn', 'Pass'].hits, handlers['Turn', 'Trade'].misses) == (1, 1)
+    build = handlers['Turn', 'Build']
+    assert (build.calls, build.items, build.hits, build.misses) == (2, 8, 6, 2)
+    assert set(profiler.to_dict()['handlers']) == {'Turn.Pass', 'Turn.Trade', 'Turn.Build'}
+    profiler.clear()
+    assert not profiler.handlers and not profiler.stacks
@@ -0,0 +1,84 @@
+from collections import deque
+import numpy as np
+import pytest
+from catan_objects import Space
+from gamedata.board import BoardData
+from gamedata.layout import LAYOUT_RADIUS
+from game_loading.axial_layout import AxialLayoutSpec, default_spec
+from game_loading.default_board import make_default_board
+
+
+@pytest.fixture(scope='module')
+def board():
+    return BoardData(make_default_board())
+
+
+def test_axial_default_spec_reproduces_default_board(board):
+    compiled = default_spec().compile()
+    for name in ('space', 'environment', 'objects', 'chit', 'connections'):
+        np.testing.assert_array_equal(getattr(compiled, name), getattr(board, name), err_msg=name)
+    np.testing.assert_array_equal(compiled.dock_isecs, board.connections[compiled.dock_hexes.astype(np.intp), :2])
+
+
+def bfs(space, neighbors, source, radius):
+    dists, queue = {source: 0}, deque([source])
+    while queue:
+        tile = queue.popleft()
+        if dists[tile] == radius or (tile != source and space[tile] == Space.Hex.value):
+            continue
+        for other in neighbors[tile]:
+            if other not in dists:
+                dists[other] = dists[tile] + 1
+                queue.append(other)
+    return dists
+
+
+@pytest.mark.parametrize('spec', ['default', 'hexagon'])
+def test_hop_table_matches_breadth_first_search(board, spec):
+    if spec == 'hexagon':
+        compiled = AxialLayoutSpec.hexagon(3).compile()
+        space, connections, layout = compiled.space, compiled.connections, compiled.layout
+    else:
+        space, connections, layout = board.space, board.connections, board.layout
+    neighbors = [set() for _ in space]
+    for tile, row in enumerate(connections):
+        for other in map(int, row):
+            if other != tile:
+                neighbors[tile].add(other)
+                neighbors[other].add(tile)
+    for tile in range(len(space)):
+        dists = bfs(space, neighbors, tile, LAYOUT_RADIUS)
+        row = slice(layout.hop_offsets[tile], layout.hop_offsets[tile + 1])
+        assert dict(zip(layout.hop_tiles[row].tolist(), layout.hop_dists[row].tolist())) == dists
+        np.testing.assert_array_equal(layout.within(tile, 1), sorted(t for t, d in dists.items() if d <= 1))
+    with pytest.raises(ValueError):
+        layout.within(0, LAYOUT_RADIUS + 1)
+
+
+def test_neighbor_tables_match_breadth_first_search(board):
+    layout, space = board.layout, board.space
+    neighbors = [set() for _ in space]
+    for tile, row in enumerate(board.connections):
+        for other in map(int, row):
+            if other != tile:
+                neighbors[tile].add(other)
+                neighbors[other].add(tile)
+    assert all(a is b for a, b in zip(board.build_dists, (layout.hop_offsets, layout.hop_tiles, layout.hop_dists)))
+    tables = [
+        ('hex_isecs', Space.Hex, Space.Intersection, 1),
+        ('isec_hexes', Space.Intersection, Space.Hex, 1),
+        ('isec_paths', Space.Intersection, Space.Path, 1),
+        ('isec_isecs', Space.Intersection, Space.Intersection, 2),
+        ('path_isecs', Space.Path, Space.Intersection, 1),
+        ('path_paths', Space.Path, Space.Path, 2),
+    ]
+    for tile in range(len(space)):
+        dists = bfs(space, neighbors, tile, LAYOUT_RADIUS)
+        for name, source, target, dist in tables:
+            table, mask = getattr(layout, name), getattr(layout, f'{name}_mask')
+            expected = {t for t, d in dists.items() if d == dist and space[t] == target.value}
+            listed = set(table[tile][mask[tile]].tolist())
+            if space[tile] == source.value:
+                assert listed == expected, (name, tile)
+            else:
+                assert listed == set() and (table[tile] == tile).all(), (name, tile)
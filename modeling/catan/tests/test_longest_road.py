@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from conftest import play
+from catan_objects import Building, Environment
+from batched_engine import BatchedEngine
+from game_loading.board_generator import BoardGenerator
+from game_loading.compiled_layout import load_default_layout
+from gamedata.board import NO_OWNER
+from longest_road import LongestRoad, road_component, longest_trail
+
+
+@pytest.fixture
+def board():
+    return load_default_layout().board_data()
+
+
+def ring(layout, environment):
+    """ The intersections around an inland hex, in order, and the paths joining each to the next """
+    for h in layout.hexes:
+        isecs = layout.hex_isecs[h][layout.hex_isecs_mask[h]].tolist()
+        if environment[h] != Environment.Land.value or len(isecs) != 6 or \
+                not all(layout.isec_paths_mask[i].all() for i in isecs):
+            continue
+        order = [isecs[0]]
+        while len(order) < 6:
+            order.append(next(i for i in isecs if i not in order and path_between(layout, order[-1], i) is not None))
+        return order, [path_between(layout, a, b) for a, b in zip(order, order[1:] + order[:1])]
+
+
+def path_between(layout, a, b):
+    shared = set(layout.isec_paths[a][layout.isec_paths_mask[a]].tolist()) & \
+        set(layout.isec_paths[b][layout.isec_paths_mask[b]].tolist())
+    return shared.pop() if shared else None
+
+
+def build(board, roads, tile, player, building=Building.Road):
+    board.place(tile, building, player)
+    roads.on_placement(player, tile)
+
+
+def test_cut_road(board):
+    roads = LongestRoad(board, n_players=2)
+    isecs, paths = ring(board.layout, board.environment)
+    for path in paths[:5]:
+        build(board, roads, path, 0)
+    assert roads.longest[0] == 5 and roads.holder == 0
+    build(board, roads, isecs[2], 1, Building.Settlement)  # between the second and third road
+    assert roads.longest[0] == 3 and roads.holder == NO_OWNER
+
+
+def test_cycle(board):
+    roads = LongestRoad(board, n_players=2)
+    isecs, paths = ring(board.layout, board.environment)
+    for path in paths:
+        build(board, roads, path, 0)
+    assert roads.longest[0] == 6
+    spur = next(p for p in board.layout.isec_paths[isecs[0]].tolist() if p not in paths)
+    build(board, roads, spur, 0)
+    assert roads.longest[0] == 7
+    build(board, roads, isecs[3], 1, Building.Settlement)  # the cut ring unrolls into one six-road trail
+    assert roads.longest[0] == 6
+    build(board, roads, isecs[1], 1, Building.Settlement)
+    assert roads.longest[0] == 4
+
+
+def test_batched_lengths_match_recomputation():
+    board = load_default_layout().board_data()
+    engine = BatchedEngine(board=board, n_games=32, seed=3, generator=BoardGenerator(board, seed=3))
+    play(engine, 600)
+    d, layout = engine.data, board.layout
+    for g in range(d.n_games):
+        owner, objects = d.owner[g], d.objects[g]
+        for p in range(d.n_players):
+            longest, seen = 0, set()
+            for road in np.flatnonzero((objects == Building.Road.value) & (owner == p)).tolist():
+                if road not in seen:
+                    component = road_component(layout, owner, objects, p, road)
+                    seen.update(component)
+                    longest = max(longest, longest_trail(layout, owner, p, component))
+            assert d.longest_road[g, p] == longest, (g, p)
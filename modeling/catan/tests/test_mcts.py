@@ -0,0 +1,33 @@
+import numpy as np
+from conftest import play
+from batched_engine import BatchedEngine
+from game_loading.board_generator import BoardGenerator
+from game_loading.compiled_layout import load_default_layout
+from mcts import MCTS, Node
+
+
+def test_select_skips_illegal_actions():
+    node = Node(key=0, player=0, actions=np.array([3, 5, 9]), prior=np.array([.98, .01, .01], dtype=np.float32))
+    assert node.select(1.5, 1., np.array([True, True, True])) == 0
+    assert node.select(1.5, 1., np.array([False, True, True])) in (1, 2)
+
+
+def test_search_only_steps_legal_actions():
+    board = load_default_layout().board_data()
+    game = BatchedEngine(board=board, n_games=1, seed=0, generator=BoardGenerator(board, seed=0))
+    play(game, 40)
+    search = MCTS.for_engine(game, n_lanes=8, seed=1, capacity=5_000)
+    lanes, step = search.engine, search.engine.step
+
+    def checked_step(requests, args):
+        rewards, done, valid = step(requests, args)
+        assert valid[requests >= 0].all()
+        return rewards, done, valid
+    lanes.step = checked_step
+
+    for _ in range(5):
+        root = search.search(game.snapshot(0), 64)
+        assert root.n_visits >= 64
+        mask = game.action_mask()[0]
+        assert mask[root.actions].all()
+        game.step(*game.decode_actions(np.array([root.actions[np.argmax(root.visits)]])))
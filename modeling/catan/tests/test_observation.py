@@ -0,0 +1,46 @@
+import numpy as np
+from conftest import play
+from batched_engine import BatchedEngine
+from game_loading.compiled_layout import load_default_layout
+from gamedata.observation import ObservationBuffer, ObservationLayout
+
+
+def test_layout_offsets_are_aligned_and_packed():
+    layout = ObservationLayout({'a': np.zeros(3, np.uint8), 'b': np.zeros((2, 2), np.uint16),
+                                'c': np.zeros(1, np.uint64), 'd': np.zeros(5, np.uint8)})
+    assert [(f.offset, f.nbytes) for f in layout.fields.values()] == [(0, 3), (4, 8), (16, 8), (24, 5)]
+    assert layout.nbytes == 32
+
+
+def test_views_alias_one_buffer():
+    board = load_default_layout().board_data()
+    buffer = ObservationLayout(board.package_observation(0)).allocate()
+    for name, view in buffer.views.items():
+        assert np.shares_memory(view, buffer.data), name
+        assert view.base is not None and not view.flags.owndata
+    buffer['board_robber'][0] = 300
+    field = buffer.layout.fields['board_robber']
+    assert buffer.data[field.offset:field.offset + 2].view(np.uint16)[0] == 300
+
+    board.move_robber(42)
+    board.write_observation(buffer.views, 0)
+    for name, value in board.package_observation(0).items():
+        np.testing.assert_array_equal(buffer[name], value, err_msg=name)
+
+
+def test_batched_write_matches_package_observation():
+    board = load_default_layout().board_data()
+    engine = BatchedEngine(board=board, n_games=6, seed=0)
+    play(engine, 120)
+    d = engine.data
+    layout = ObservationLayout(d.package_observation(), batched=True)
+    buffer = ObservationBuffer(layout, engine.n_games)
+    d.write_observation(buffer.views)
+    for name, value in d.package_observation().items():
+        np.testing.assert_array_equal(buffer[name], value, err_msg=name)
+        assert np.shares_memory(buffer[name], buffer.data)
+
+    rows = np.zeros((engine.n_games, layout.nbytes), dtype=np.uint8)
+    buffer.attach(rows)
+    d.write_observation(buffer.views)
+    assert rows.any() and buffer.data is rows
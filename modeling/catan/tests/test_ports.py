@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from conftest import play
+from batched_engine import BatchedEngine
+from catan_objects import Building, Resource, Space
+from game_loading.board_generator import BoardGenerator
+from game_loading.compiled_layout import load_default_layout
+from game_loading.default_rules import BANK_TRADE_RATIO
+from gamedata.board import NO_OWNER
+
+
+@pytest.fixture
+def engine():
+    board = load_default_layout().board_data()
+    return BatchedEngine(board=board, n_games=8, seed=2, generator=BoardGenerator(board, seed=2), auto_reset=False)
+
+
+def scanned_ratios(engine) -> tuple[np.ndarray, np.ndarray]:
+    """ (games, players, resources) and (games, tiles, resources) ratios by walking every tile and dock hex """
+    d, index = engine.data, engine.ports
+    n_games, n_tiles = d.objects.shape
+    isec = np.full((n_games, n_tiles, len(Resource)), BANK_TRADE_RATIO, dtype=np.int64)
+    players = np.full((n_games, engine.n_players, len(Resource)), BANK_TRADE_RATIO, dtype=np.int64)
+    for g in range(n_games):
+        for tile in range(n_tiles):
+            for h in engine.dock_hexes:
+                if tile in engine.board.connections[h][:2]:
+                    isec[g, tile] = np.minimum(isec[g, tile], index.ship_ratios[d.objects[g, h]])
+            if engine.board.space[tile] == Space.Intersection.value and d.owner[g, tile] != NO_OWNER:
+                players[g, d.owner[g, tile]] = np.minimum(players[g, d.owner[g, tile]], isec[g, tile])
+    return players, isec
+
+
+def check_ratios(engine) -> None:
+    players, isec = scanned_ratios(engine)
+    np.testing.assert_array_equal(engine.ports.ratios, players)
+    np.testing.assert_array_equal(engine.ports.isec_ratios(), isec)
+
+
+def test_ratios_match_tile_scan(engine):
+    check_ratios(engine)
+    assert (engine.ports.isec_ratios() < BANK_TRADE_RATIO).any()
+    for _ in range(4):
+        play(engine, 200)
+        check_ratios(engine)
+
+
+def test_settling_on_a_dock(engine):
+    d, g = engine.data, np.arange(engine.n_games)
+    docks = np.argmax(engine.ports.dock_ratios.min(axis=-1) < BANK_TRADE_RATIO, axis=1)  # a dock with a ship
+    isecs = engine.ports.dock_isecs[docks, 0]
+    player = (g % engine.n_players).astype(np.uint8)
+    d.place(g, isecs, np.uint8(Building.Settlement.value), player)
+    engine.ports.on_building(g, player, isecs)
+    check_ratios(engine)
+    assert (engine.ports.ratios[g, player] < BANK_TRADE_RATIO).any(axis=-1).all()
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from conftest import play
+from batched_engine import BatchedEngine
+from game_loading.board_generator import BoardGenerator
+from game_loading.compiled_layout import load_default_layout
+from production import NO_RESOURCE, ROLLS
+from gamedata.board import NO_OWNER
+from catan_objects import Building
+
+
+@pytest.fixture
+def engine():
+    board = load_default_layout().board_data()
+    return BatchedEngine(board=board, n_games=8, seed=1, generator=BoardGenerator(board, seed=1), auto_reset=False)
+
+
+def scanned_production(engine, roll: int) -> np.ndarray:
+    """ Production of roll in every game by walking each hex and its intersections """
+    d, index, layout = engine.data, engine.production, engine.layout
+    hands = np.zeros(d.hands.shape, dtype=np.int64)
+    for g in range(engine.n_games):
+        for h in layout.hexes:
+            resource = index.terrain_resource[d.objects[g, h]]
+            if resource == NO_RESOURCE or d.chit[g, h] != roll or d.robber[g] == h:
+                continue
+            for isec in layout.hex_isecs[h][layout.hex_isecs_mask[h]]:
+                if d.owner[g, isec] != NO_OWNER:
+                    hands[g, d.owner[g, isec], resource] += index.yields[d.objects[g, isec]]
+    return hands
+
+
+def check_production(engine) -> int:
+    """ Compares produce against the scan for every roll, returns the total produced """
+    games, total = np.arange(engine.n_games), 0
+    for roll in ROLLS:
+        hands = np.zeros(engine.data.hands.shape, dtype=np.int64)
+        engine.production.produce(games, np.full(engine.n_games, roll), hands)
+        np.testing.assert_array_equal(hands, scanned_production(engine, roll), err_msg=f'roll {roll}')
+        total += int(hands.sum())
+    return total
+
+
+def test_produce_matches_scan(engine):
+    check_production(engine)
+    for _ in range(6):
+        play(engine, 150)
+        assert check_production(engine) > 0
+
+
+def test_on_building_and_on_robber(engine):
+    d, layout, index = engine.data, engine.layout, engine.production
+    g = np.arange(engine.n_games)
+    producing = (index.terrain_resource[d.objects[:, layout.hexes]] != NO_RESOURCE) & \
+        (d.chit[:, layout.hexes] > 0) & (layout.hexes != d.robber[:, None])
+    hexes = layout.hexes[np.argmax(producing, axis=1)]
+    owner = (g % engine.n_players).astype(np.uint8)
+    for corner in range(2):
+        isecs = layout.hex_isecs[hexes, corner].astype(np.intp)
+        d.place(g, isecs, np.uint8(Building.Settlement.value), owner)
+        index.on_building(g, isecs)
+    produced = check_production(engine)
+    assert produced == 2 * engine.n_games
+    old = d.robber.copy()
+    d.move_robber(g, hexes)
+    index.on_robber(g, old)
+    assert check_production(engine) == 0
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from gamedata.observation import ObservationLayout
+from replay_buffer import ReplayBuffer, SumTree
+
+
+@pytest.mark.parametrize('capacity', [1, 7, 64, 1000])
+def test_sum_tree_totals_and_find(capacity):
+    rng = np.random.default_rng(capacity)
+    tree, priorities = SumTree(capacity), np.zeros(capacity)
+    for _ in range(5):
+        indices = rng.integers(0, capacity, size=rng.integers(1, capacity + 1))
+        values = rng.random(len(indices))
+        tree.update(indices, values)
+        priorities[indices] = values  # the last write of a repeated index wins, as in the tree
+        nodes = np.arange(1, tree.leaves)
+        np.testing.assert_allclose(tree.tree[nodes], tree.tree[2 * nodes] + tree.tree[2 * nodes + 1])
+        np.testing.assert_allclose(tree.total, priorities.sum())
+        np.testing.assert_array_equal(tree[np.arange(capacity)], priorities)
+        cum = np.cumsum(priorities)
+        targets = rng.random(100) * cum[-1]
+        found = tree.find(targets)
+        assert np.all(priorities[found] > 0)
+        np.testing.assert_array_equal(found, np.minimum(np.searchsorted(cum, targets, side='right'), capacity - 1))
+
+
+def fill(buffer, n_steps, n_envs, first=0):
+    for step in range(first, first + n_steps):
+        rows = step * n_envs + np.arange(n_envs)
+        buffer.add({'row': rows[:, None]}, np.ones((n_envs, buffer.n_actions), dtype=bool), rows, rows, rows % 2 == 0)
+
+
+@pytest.mark.parametrize('alpha', [0., 0.6])
+def test_sampling_skips_the_newest_block(alpha):
+    n_envs = 4
+    layout = ObservationLayout({'row': np.zeros(1, dtype=np.int32)})
+    buffer = ReplayBuffer(layout, capacity=8 * n_envs, n_actions=3, n_envs=n_envs, alpha=alpha, seed=0)
+    with pytest.raises(ValueError):
+        buffer.sample(1)
+    steps = 0
+    for n_steps in (1, 2, 5, 8, 13):
+        fill(buffer, n_steps, n_envs, steps)
+        steps += n_steps
+        newest = set(((buffer.cursor - n_envs + np.arange(n_envs)) % buffer.capacity).tolist())
+        if not len(buffer):
+            continue
+        batch = buffer.sample(512)
+        assert not newest & set(batch.indices.tolist())
+        np.testing.assert_array_equal(batch.next_obs['row'][:, 0], batch.obs['row'][:, 0] + n_envs)
+        np.testing.assert_array_equal(batch.actions, batch.obs['row'][:, 0])
+        if alpha:
+            buffer.update_priorities(np.array(sorted(newest)), np.full(n_envs, 100.))
+            assert buffer.tree[np.array(sorted(newest))].sum() == 0
+
+
+def test_prioritized_frequencies():
+    n_envs = 2
+    layout = ObservationLayout({'row': np.zeros(1, dtype=np.int32)})
+    buffer = ReplayBuffer(layout, capacity=6 * n_envs, n_actions=1, n_envs=n_envs, alpha=1., seed=1)
+    fill(buffer, 6, n_envs)
+    indices = np.arange(len(buffer))  # every sampleable row: the ring is full, the newest block is the last
+    priorities = np.arange(1., len(indices) + 1)
+    buffer.update_priorities(indices, priorities)
+    batch = buffer.sample(100_000)
+    observed = np.bincount(batch.indices, minlength=buffer.capacity)[indices] / len(batch.indices)
+    np.testing.assert_allclose(observed, priorities / priorities.sum(), atol=0.01)
+    expected_weights = (len(buffer) * priorities / priorities.sum()) ** -buffer.beta
+    np.testing.assert_allclose(batch.weights[np.argsort(batch.indices)][[0, -1]],
+                               (expected_weights / expected_weights.max())[[0, -1]], rtol=1e-5)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from conftest import play
+from batched_engine import BatchedEngine
+from game_loading.compiled_layout import load_default_layout
+
+
+@pytest.fixture
+def engine():
+    engine = BatchedEngine(board=load_default_layout().board_data(), n_games=8, seed=0)
+    play(engine, 60)
+    return engine
+
+
+def test_restore_round_trips(engine):
+    snap = engine.snapshot()
+    before = {name: view.copy() for name, view in engine.data.state.views.items()}
+    ratios = engine.ports.ratios.copy()
+    play(engine, 40)
+    assert not np.array_equal(engine.data.state.data, snap.state)
+
+    engine.restore(snap)
+    for name, view in engine.data.state.views.items():
+        np.testing.assert_array_equal(view, before[name], err_msg=name)
+    np.testing.assert_array_equal(engine.ports.ratios, ratios)
+
+
+def test_restore_into_other_game(engine):
+    snap = engine.snapshot(3)
+    engine.restore(snap, 5)
+    np.testing.assert_array_equal(engine.data.state.data[5], engine.data.state.data[3])
+
+
+def test_board_round_trips(engine):
+    board = engine.board
+    snap = board.snapshot()
+    objects, owner, board_hash = board.objects.copy(), board.owner.copy(), board.zobrist_hash
+    settlement = int(board.layout.isecs[0])
+    board.place(settlement, 1, 2)
+    board.move_robber(int(board.layout.hexes[5]))
+    board.restore(snap)
+    np.testing.assert_array_equal(board.objects, objects)
+    np.testing.assert_array_equal(board.owner, owner)
+    assert board.zobrist_hash == board_hash
+
+
+def test_restore_checks_static_data(engine):
+    other = BatchedEngine(board=load_default_layout().board_data(), n_games=8, seed=0)
+    with pytest.raises(ValueError):
+        other.restore(engine.snapshot())
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from tools import weighted_sample, weighted_draws, rand_wtd_index
+
+
+@pytest.mark.parametrize('weights', [[1, 0, 3, 6], [250, 250, 250, 5]])
+def test_weighted_sample_frequencies_match_weights(weights):
+    n = 200_000
+    counts = np.tile(np.array(weights, dtype=np.uint8), (n, 1))
+    picks = weighted_sample(counts, np.random.default_rng(0))
+    expected = np.array(weights) / np.sum(weights)
+    observed = np.bincount(picks, minlength=len(weights)) / n
+    assert np.all(np.abs(observed - expected) <= 5 * np.sqrt(expected * (1 - expected) / n) + 1e-12)
+    assert observed[expected == 0].sum() == 0
+
+
+def test_weighted_sample_empty_rows():
+    counts = np.array([[0, 0, 0], [0, 2, 0], [0, 0, 0]], dtype=np.uint8)
+    picks = weighted_sample(counts, np.random.default_rng(0), decrement=True)
+    np.testing.assert_array_equal(picks, [-1, 1, -1])
+    np.testing.assert_array_equal(counts, [[0, 0, 0], [0, 1, 0], [0, 0, 0]])
+    assert rand_wtd_index(np.zeros(4, dtype=np.uint8)) == -1
+
+
+def test_weighted_draws_never_exceed_counts():
+    rng = np.random.default_rng(1)
+    counts = rng.integers(0, 5, size=(1000, 5)).astype(np.uint8)
+    n_draws = rng.integers(0, 12, size=1000)
+    before = counts.copy()
+    drawn = weighted_draws(counts, n_draws, rng, decrement=True)
+    assert np.all(drawn <= before)
+    np.testing.assert_array_equal(drawn.sum(axis=1), np.minimum(n_draws, before.sum(axis=1)))
+    np.testing.assert_array_equal(counts, before - drawn)
+
+
+def test_rand_wtd_index_needs_one_dimension():
+    with pytest.raises(ValueError):
+        rand_wtd_index(np.ones((2, 2), dtype=np.uint8))
+
+
+def test_decrement_needs_an_array():
+    rng = np.random.default_rng(2)
+    for sample in (lambda c: rand_wtd_index(c, alter_inplace=True, rng=rng),
+                   lambda c: weighted_sample(c, rng, decrement=True),
+                   lambda c: weighted_draws(c, 1, rng, decrement=True)):
+        with pytest.raises(ValueError):
+            sample([0, 3, 1])
+    assert rand_wtd_index([0, 3, 0], rng=rng) == 1
+    deck = np.array([0, 3, 0], dtype=np.uint8)
+    assert rand_wtd_index(deck, alter_inplace=True, rng=rng) == 1 and deck.tolist() == [0, 2, 0]
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from batched_engine import BatchedEngine
+from game_loading.compiled_layout import load_default_layout
+from gamedata.batched import observation_specs
+from vec_env import SubprocVecEnv
+
+
+def test_observation_specs_match_package_observation():
+    board = load_default_layout().board_data()
+    engine = BatchedEngine(board=board, n_games=2, n_players=3, seed=0)
+    observation = engine.data.package_observation()
+    specs = observation_specs(board.n_tiles, 3)
+    assert list(specs) == list(observation)
+    for name, (shape, dtype) in specs.items():
+        assert observation[name].shape == (2,) + shape and observation[name].dtype == dtype, name
+
+
+def test_workers_publish_action_masks():
+    with SubprocVecEnv(n_workers=2, games_per_worker=3, seed=0) as env:
+        env.reset()
+        engine = BatchedEngine(board=env.board, n_games=1, seed=0)
+        assert env.action_mask.shape == (6, engine.n_actions)
+        rng = np.random.default_rng(0)
+        for _ in range(20):
+            mask = env.action_mask.copy()
+            assert mask.any(axis=1).all()
+            _, _, _, valid = env.step_actions(np.argmax(mask * rng.random(mask.shape), axis=1))
+            assert valid.all()
+
+
+def test_n_players_reaches_the_workers():
+    with SubprocVecEnv(n_workers=1, games_per_worker=2, n_players=3, seed=0) as env:
+        env.reset()
+        assert env.observations['victory_points'].shape == (2, 3)
+        rng = np.random.default_rng(0)
+        for _ in range(10):
+            mask = env.action_mask.copy()
+            assert env.step_actions(np.argmax(mask * rng.random(mask.shape), axis=1))[3].all()
+
+
+def failing_engine(n_games, seed, board, n_players):
+    raise OSError('no engine here')
+
+
+def test_setup_failure_is_reported_at_construction():
+    with pytest.raises(RuntimeError, match='no engine here'):
+        SubprocVecEnv(n_workers=2, games_per_worker=1, env_fn=failing_engine)
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from conftest import play
+from batched_engine import BatchedEngine
+from game_loading.board_generator import BoardGenerator
+from game_loading.compiled_layout import load_default_layout
+from catan_objects import Building, Space
+from gamedata.batched import UNHASHED_FIELDS
+from gamedata.board import NO_OWNER
+
+
+@pytest.fixture
+def engine():
+    board = load_default_layout().board_data()
+    engine = BatchedEngine(board=board, n_games=16, seed=0, generator=BoardGenerator(board, seed=0))
+    play(engine, 200)
+    return engine
+
+
+def test_position_hash_covers_play_state(engine):
+    d = engine.data
+    base = d.position_hash()
+    for name, view in d.state.views.items():
+        if name in UNHASHED_FIELDS:
+            continue
+        saved = view.copy()
+        view[:1].flat[0] ^= 1
+        assert d.position_hash()[0] != base[0], name
+        np.copyto(view, saved)
+    np.testing.assert_array_equal(d.position_hash(), base)
+
+
+def test_position_hash_ignores_turn(engine):
+    d = engine.data
+    base = d.position_hash()
+    d.turn += 7
+    d.last_roll[:] = 12
+    np.testing.assert_array_equal(d.position_hash(), base)
+
+
+def test_restored_games_share_hash(engine):
+    engine.restore(engine.snapshot(3), 4)
+    hashes = engine.data.position_hash()
+    assert hashes[3] == hashes[4]
+
+
+def test_board_hash_matches_full_hash(engine):
+    np.testing.assert_array_equal(engine.data.board_hash, engine.data.full_hash())
+    play(engine, 300)
+    np.testing.assert_array_equal(engine.data.board_hash, engine.data.full_hash())
+
+
+def test_board_data_writes_go_through_place():
+    board = load_default_layout().board_data()
+    with pytest.raises(ValueError):
+        board.objects[0] = 1
+    with pytest.raises(ValueError):
+        board.owner[0] = 0
+    start = board.zobrist_hash
+    tile = int(np.flatnonzero(board.space == Space.Intersection.value)[0])
+    board.place(tile, Building.Settlement, 1)
+    board.move_robber(3)
+    assert board.objects[tile] == Building.Settlement.value and board.owner[tile] == 1
+    assert board.zobrist_hash == board.full_hash() != start
+    board.place(tile, Building.NoBuilding, NO_OWNER)
+    board.move_robber(0)
+    assert board.zobrist_hash == start
@@ -1,6 +1,6 @@
 import numpy as np
 import numpy.typing as npt
-from typing import Any
+from typing import Any, Optional
 import re
 from enum import Enum
 
@@ -13,22 +13,69 @@ class AutoNumber(Enum):
         return obj
 
 
-def rand_wtd_index(array: npt.NDArray[int], alter_inplace: bool = False):
+def enum_value(obj: Enum | int) -> int:
+    """ Returns the integer value of an enum member, passing plain integers through unchanged """
+    return obj.value if isinstance(obj, Enum) else obj
+
+
+def weighted_sample(counts: npt.NDArray[np.integer], rng: Optional[np.random.Generator] = None,
+                    decrement: bool = False) -> npt.NDArray[np.intp]:
+    """
+    Draws one index per row of a (..., items) array of remaining quantities, exactly in proportion to them
+    (over int64 cumulative counts, so uint8 counts cannot overflow); rows with nothing left return -1
+    With decrement, each drawn quantity is reduced by one in place
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    counts = _decrementable(counts) if decrement else np.asarray(counts)
+    cum = np.cumsum(counts, axis=-1, dtype=np.int64)
+    total = cum[..., -1]
+    draw = (rng.random(total.shape) * total).astype(np.int64)
+    pick = np.where(total > 0, np.sum(cum <= draw[..., None], axis=-1), -1)
+    if decrement:
+        counts -= (np.arange(counts.shape[-1]) == pick[..., None]).astype(counts.dtype)
+    return pick
+
+
+def weighted_draws(counts: npt.NDArray[np.integer], n_draws: npt.NDArray[np.integer] | int,
+                   rng: Optional[np.random.Generator] = None, decrement: bool = False) -> npt.NDArray[np.int64]:
+    """
+    Draws n_draws items per row without replacement (e.g. a discard) and returns how many of each item were
+    drawn, shaped like counts; rows run out early when they hold fewer than n_draws items
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    if decrement:
+        _decrementable(counts)
+    remaining = np.array(counts, dtype=np.int64)
+    n_draws = np.broadcast_to(n_draws, remaining.shape[:-1])
+    drawn = np.zeros_like(remaining)
+    for i in range(int(n_draws.max(initial=0))):
+        pick = np.where(n_draws > i, weighted_sample(remaining, rng), -1)
+        taken = np.arange(remaining.shape[-1]) == pick[..., None]
+        remaining -= taken
+        drawn += taken
+    if decrement:
+        counts -= drawn.astype(counts.dtype)
+    return drawn
+
+
+def _decrementable(counts: npt.NDArray[np.integer]) -> npt.NDArray[np.integer]:
+    """ counts itself, if it is an array that can be decremented in place (a list would only update a copy) """
+    if not isinstance(counts, np.ndarray):
+        raise ValueError(f'Decrementing in place needs a NumPy array, got {type(counts).__name__}')
+    return counts
+
+
+def rand_wtd_index(array: npt.NDArray[int], alter_inplace: bool = False,
+                   rng: Optional[np.random.Generator] = None):
     """
     Takes 1-d array of integers (in most use cases, this array will represent remaining quantities of items
     Using those quantities as weights, returns a randomly selected index ("choosing" an item in the array)
     """
+    array = _decrementable(array) if alter_inplace else np.asarray(array)
     dims = len(array.shape)
     if dims != 1:
-        print(f'Func rand_weighted_index requires 1d array.  Array given is shape {dims}.')
-    rng = np.random.randint(low=1, high=100, size=array.shape, dtype=np.uint8)
-
-    pick = np.argmax(array*rng)
-
-    if alter_inplace:
-        array[pick] -= 1
-
-    return pick
+        raise ValueError(f'Func rand_wtd_index requires 1d array.  Array given is shape {dims}.')
+    return int(weighted_sample(array, rng, decrement=alter_inplace))
 
 
 def make_even_lengths(board_conns):
@@ -0,0 +1,267 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+from catan_objects import *
+from game_loading.compiled_layout import load_default_layout
+from gamedata.board import BoardData
+from gamedata.batched import observation_specs
+from gamedata.observation import ObservationLayout, ObservationBuffer
+from batched_engine import BatchedEngine, action_count
+from typing import Callable, Optional
+import multiprocessing as mp
+import traceback
+import numpy as np
+import numpy.typing as npt
+
+
+EnvFn = Callable[[int, Optional[int], BoardData, int], BatchedEngine]  # (n_games, seed, board, n_players) -> engine
+
+
+def default_engine(n_games: int, seed: Optional[int] = None, board: Optional[BoardData] = None,
+                   n_players: int = 4) -> BatchedEngine:
+    """ Engine on board, or on the default board loaded from the shared compiled layout cache """
+    board = load_default_layout().board_data() if board is None else board
+    return BatchedEngine(board=board, n_games=n_games, n_players=n_players, seed=seed)
+
+
+@dataclass
+class SharedArrays:
+    """
+    Named arrays living in multiprocessing.shared_memory blocks
+    The creating process owns (and eventually unlinks) the blocks, other processes attach by name
+    """
+    specs: dict[str, tuple[tuple[int, ...], np.dtype]]
+    names: Optional[dict[str, str]] = None
+    arrays: dict[str, npt.NDArray] = field(init=False, default_factory=dict)
+    blocks: dict[str, shared_memory.SharedMemory] = field(init=False, default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        owner = self.names is None
+        for key, (shape, dtype) in self.specs.items():
+            nbytes = max(1, int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize)
+            block = shared_memory.SharedMemory(create=True, size=nbytes) if owner else \
+                shared_memory.SharedMemory(name=self.names[key])
+            self.blocks[key] = block
+            self.arrays[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+            if owner:
+                self.arrays[key].fill(0)
+        self.names = {key: block.name for key, block in self.blocks.items()}
+
+    def __getitem__(self, key: str) -> npt.NDArray:
+        return self.arrays[key]
+
+    def close(self, unlink: bool = False) -> None:
+        self.arrays.clear()
+        for block in self.blocks.values():
+            block.close()
+            if unlink:
+                block.unlink()
+        self.blocks.clear()
+
+
+def _worker(conn: Connection, env_fn: EnvFn, seed: Optional[int], board: BoardData, n_players: int, rows: slice,
+            layout: ObservationLayout, specs: dict, names: dict[str, str]) -> None:
+    """ Owns one engine stepping the games rows of the shared buffers; answers setup and every command """
+    shared = None
+    try:
+        shared = SharedArrays(specs, names)
+        engine = env_fn(rows.stop - rows.start, seed, board, n_players)
+        obs = ObservationBuffer(layout, engine.n_games)
+        obs.attach(shared['obs'][rows])
+
+        if engine.board.n_tiles != layout.fields['board_objects'].shape[0] or \
+                engine.n_players != layout.fields['victory_points'].shape[0]:
+            raise ValueError('env_fn built an engine whose board or player count differs from the SubprocVecEnv')
+        conn.send(('ok', None))
+
+        def publish():
+            engine.data.write_observation(obs.views)
+            np.copyto(shared['mask'][rows], engine.action_mask())
+
+        while True:
+            command = conn.recv()
+            if command in ('step', 'step_actions'):
+                requests, args = (shared['requests'][rows], shared['args'][rows]) if command == 'step' else \
+                    engine.decode_actions(shared['actions'][rows])
+                rewards, done, valid = engine.step(requests, args)
+                shared['rewards'][rows] = rewards
+                shared['dones'][rows] = done
+                shared['valid'][rows] = valid
+                publish()
+            elif command == 'reset':
+                engine.reset()
+                publish()
+            elif command == 'close':
+                conn.send(('ok', None))
+                break
+            else:
+                raise ValueError(f'Unknown command {command!r}')
+            conn.send(('ok', None))
+    except (KeyboardInterrupt, EOFError):
+        pass
+    except Exception:
+        conn.send(('error', traceback.format_exc()))
+    finally:
+        if shared is not None:
+            shared.close()
+        conn.close()
+
+
+@dataclass
+class SubprocVecEnv:
+    """
+    Steps n_workers BatchedEngines of games_per_worker games each in worker processes, in lockstep, through
+    shared-memory buffers sized from board and n_players; returned arrays are overwritten by the next call
+    Games that finish are reset inside their worker, so their returned observation is already the new game's
+    """
+    n_workers: int
+    games_per_worker: int = 64
+    env_fn: EnvFn = default_engine
+    board: Optional[BoardData] = None  # the default layout's board if None
+    n_players: int = 4
+    seed: Optional[int] = None
+    start_method: Optional[str] = None
+    layout: ObservationLayout = field(init=False, repr=False)
+    obs: ObservationBuffer = field(init=False, repr=False)
+    shared: SharedArrays = field(init=False, repr=False)
+    processes: list[mp.Process] = field(init=False, default_factory=list, repr=False)
+    pipes: list[Connection] = field(init=False, default_factory=list, repr=False)
+    closed: bool = field(init=False, default=False)
+
+    def __post_init__(self):
+        if self.n_workers < 1 or self.games_per_worker < 1:
+            raise ValueError('SubprocVecEnv needs at least one worker and one game per worker')
+        if self.board is None:
+            self.board = load_default_layout().board_data()
+        sample = {name: np.zeros(shape, dtype) for name, (shape, dtype) in
+                  observation_specs(self.board.n_tiles, self.n_players).items()}
+        self.layout = ObservationLayout(sample)
+        n = self.n_envs
+        specs = {
+            'obs': ((n, self.layout.nbytes), np.uint8),
+            'mask': ((n, action_count(self.board.n_tiles)), np.bool_),
+            'actions': ((n,), np.int64),
+            'requests': ((n,), np.int64),
+            'args': ((n,), np.int64),
+            'rewards': ((n,), np.float32),
+            'dones': ((n,), np.bool_),
+            'valid': ((n,), np.bool_),
+        }
+        self.shared = SharedArrays(specs)
+        self.obs = ObservationBuffer(self.layout, n)
+        self.obs.attach(self.shared['obs'])
+
+        ctx = mp.get_context(self.start_method)
+        for i in range(self.n_workers):
+            rows = slice(i * self.games_per_worker, (i + 1) * self.games_per_worker)
+            seed = None if self.seed is None else self.seed + i
+            parent, child = ctx.Pipe()
+            process = ctx.Process(
+                target=_worker, args=(child, self.env_fn, seed, self.board, self.n_players, rows, self.layout, specs,
+                                      self.shared.names),
+                daemon=True
+            )
+            process.start()
+            child.close()
+            self.processes.append(process)
+            self.pipes.append(parent)
+        try:
+            self._gather()
+        except RuntimeError:
+            self.close()
+            raise
+
+    @property
+    def n_envs(self) -> int:
+        return self.n_workers * self.games_per_worker
+
+    @property
+    def observations(self) -> dict[str, npt.NDArray]:
+        return self.obs.views
+
+    @property
+    def action_mask(self) -> npt.NDArray[bool]:
+        return self.shared['mask']
+
+    def _broadcast(self, command: str) -> None:
+        if self.closed:
+            raise ValueError('SubprocVecEnv is closed')
+        for pipe in self.pipes:
+            try:
+                pipe.send(command)
+            except BrokenPipeError:
+                pass  # reported by _gather
+        self._gather()
+
+    def _gather(self) -> None:
+        """ Waits for every worker's status, raising the first failure """
+        errors = []
+        for i, pipe in enumerate(self.pipes):
+            try:
+                status, message = pipe.recv()
+            except (EOFError, ConnectionResetError):
+                status, message = 'error', f'worker {i} exited (code {self.processes[i].exitcode})'
+            if status == 'error':
+                errors.append(message)
+        if errors:
+            raise RuntimeError('Worker failed:\n' + errors[0])
+
+    def reset(self) -> dict[str, npt.NDArray]:
+        self._broadcast('reset')
+        return self.observations
+
+    def step(self, requests: npt.NDArray[np.integer], args: npt.NDArray[np.integer]
+             ) -> tuple[dict[str, npt.NDArray], npt.NDArray[np.float32], npt.NDArray[bool], npt.NDArray[bool]]:
+        """ Steps every game once; returns observations, rewards, done flags and request validity """
+        np.copyto(self.shared['requests'], requests, casting='unsafe')
+        np.copyto(self.shared['args'], args, casting='unsafe')
+        self._broadcast('step')
+        return self.observations, self.shared['rewards'], self.shared['dones'], self.shared['valid']
+
+    def step_actions(self, actions: npt.NDArray[np.integer]
+                     ) -> tuple[dict[str, npt.NDArray], npt.NDArray[np.float32], npt.NDArray[bool], npt.NDArray[bool]]:
+        """ step with flat actions (indices into action_mask), decoded inside each worker """
+        np.copyto(self.shared['actions'], actions, casting='unsafe')
+        self._broadcast('step_actions')
+        return self.observations, self.shared['rewards'], self.shared['dones'], self.shared['valid']
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        for pipe in self.pipes:
+            try:
+                pipe.send('close')
+                pipe.recv()
+            except (BrokenPipeError, EOFError, ConnectionResetError):
+                pass
+            pipe.close()
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.obs.attach(np.zeros_like(self.obs.data))
+        self.shared.close(unlink=True)
+        self.closed = True
+
+    def __enter__(self) -> SubprocVecEnv:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+if __name__ == '__main__':
+    import os
+    import time
+
+    n_workers = max(1, (os.cpu_count() or 1) - 1)
+    with SubprocVecEnv(n_workers=n_workers, games_per_worker=256, seed=0) as env:
+        rng = np.random.default_rng(0)
+        obs = env.reset()
+        n_steps, start = 200, time.perf_counter()
+        for _ in range(n_steps):
+            mask = env.action_mask
+            obs, rewards, dones, valid = env.step_actions(np.argmax(mask * rng.random(mask.shape), axis=1))
+        elapsed = time.perf_counter() - start
+        print(f'{n_steps * env.n_envs / elapsed:,.0f} env-steps/s ({n_workers} workers x {env.games_per_worker} games)')
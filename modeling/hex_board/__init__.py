@@ -1 +1,10 @@
-from .board_maker import HexBoard, TileType, TileInfo
+from .board_maker import HexBoard, TileType, TileInfo, hex_topology
+from .adjacency import CSRAdjacency
+
+
+def __getattr__(name: str):
+    # Image layer (Pillow) is loaded on first use so headless topology users never import it
+    if name == 'TileImage':
+        from .images import TileImage
+        return TileImage
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
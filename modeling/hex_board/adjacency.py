@@ -0,0 +1,48 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Iterable, Sequence
+import numpy as np
+import numpy.typing as npt
+
+
+@dataclass(frozen=True)
+class CSRAdjacency:
+    """
+    Compressed sparse row tile adjacency
+    Neighbors of tile i are neighbors[offsets[i]:offsets[i + 1]]
+    """
+    offsets: npt.NDArray[np.int64]
+    neighbors: npt.NDArray[np.int32]
+
+    @classmethod
+    def from_connections(cls, connections: Sequence[Iterable[int]]) -> CSRAdjacency:
+        degrees = np.fromiter(map(len, connections), dtype=np.int64, count=len(connections))
+        offsets = np.zeros(len(connections) + 1, dtype=np.int64)
+        np.cumsum(degrees, out=offsets[1:])
+        neighbors = np.fromiter(
+            (n for conns in connections for n in conns), dtype=np.int32, count=int(offsets[-1])
+        )
+        return cls(offsets=offsets, neighbors=neighbors)
+
+    @property
+    def n_tiles(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def degrees(self) -> npt.NDArray[np.int64]:
+        return np.diff(self.offsets)
+
+    def neighbors_of(self, tile: int) -> npt.NDArray[np.int32]:
+        return self.neighbors[self.offsets[tile]:self.offsets[tile + 1]]
+
+    def rows(self) -> npt.NDArray[np.int64]:
+        """ Source tile of every entry in neighbors (COO row indices) """
+        return np.repeat(np.arange(self.n_tiles), self.degrees)
+
+    def padded(self) -> npt.NDArray[np.int32]:
+        """ Dense (n_tiles, max degree) table, rows padded by repeating their last neighbor like fill_connections """
+        degrees = self.degrees
+        cols = np.arange(max(1, int(degrees.max(initial=0))))
+        last = np.maximum(degrees - 1, 0)
+        take = self.offsets[:-1, None] + np.minimum(cols, last[:, None])
+        return self.neighbors[np.minimum(take, len(self.neighbors) - 1)]
@@ -1,9 +1,62 @@
 from dataclasses import dataclass, field, InitVar
 from collections import defaultdict
 from .tiles import TileInfo, TileType
+from .adjacency import CSRAdjacency
 from . import calculations as calcs
 
 
+# Tile offsets from a hex center, in lattice units of 1/8 hex size (clockwise from the top)
+ISEC_OFFSETS = [(-4, 0), (-2, 4), (2, 4), (4, 0), (2, -4), (-2, -4)]
+PATH_OFFSETS = [(-3, -2), (-3, 2), (0, 4), (3, 2), (3, -2), (0, -4)]
+
+
+def hex_topology(
+        n_hexes_yaxis: int,
+        n_hexes_xaxis: int,
+        unit: int = 1,
+        origin: tuple[int, int] = (0, 0)
+) -> tuple[list[TileInfo], CSRAdjacency]:
+    """
+    Builds tile positions/relationships for a grid of pointy-top hexes (odd rows shifted right) on an integer
+    lattice, so topology does not depend on pixel sizes; locs are lattice positions scaled by unit plus origin
+    Tiles are indexed hexes first, then intersections, then paths, each group in reading order
+    """
+    hex_connections, isec_connections, path_connections = defaultdict(set), defaultdict(set), {}
+
+    for row in range(n_hexes_yaxis):
+        hex_y = 4 + 6 * row
+        for column in range(n_hexes_xaxis):
+            hex_x = 4 + 4 * (row % 2) + 8 * column
+            hex_loc = (hex_y, hex_x)
+            isecs = [(hex_y + dy, hex_x + dx) for dy, dx in ISEC_OFFSETS]
+            paths = [(hex_y + dy, hex_x + dx) for dy, dx in PATH_OFFSETS]
+
+            for i in range(6):
+                hex_connections[hex_loc].add(isecs[i])
+                isec_connections[isecs[i]] |= {paths[i], paths[(i+1) % 6], hex_loc}
+                path_connections[paths[i]] = {isecs[i], isecs[i-1]}
+
+    tile_index = [loc for conn_table in (hex_connections, isec_connections, path_connections)
+                  for loc in sorted(conn_table)]
+    index_of = {loc: i for i, loc in enumerate(tile_index)}
+    tile_connections = {**hex_connections, **isec_connections, **path_connections}
+    connections = [sorted(index_of[conn] for conn in tile_connections[loc]) for loc in tile_index]
+
+    n_hexes, n_isecs = len(hex_connections), len(isec_connections)
+    tiles = [
+        TileInfo(
+            index=i,
+            tile_type=TileType.Hex if i < n_hexes else
+            TileType.Intersection if i < n_hexes + n_isecs else
+            calcs.get_path_type(*path_connections[loc]),
+            loc=(origin[0] + loc[0] * unit, origin[1] + loc[1] * unit),
+            connections=tuple(connections[i])
+        )
+        for i, loc in enumerate(tile_index)
+    ]
+    return tiles, CSRAdjacency.from_connections(connections)
+
+
 @dataclass
 class HexBoard:
     resolution: tuple[int, int]
@@ -11,6 +64,7 @@ class HexBoard:
     n_hexes_xaxis: InitVar[int]
     margin: InitVar[int]  # percentage (0-100)
     tiles: list[TileInfo] = field(default_factory=list, repr=True)
+    adjacency: CSRAdjacency = field(init=False, repr=False)
 
     def __post_init__(self, n_hexes_yaxis: int, n_hexes_xaxis: int, margin: int):
         self.validate_margin(margin)
@@ -24,45 +78,9 @@ class HexBoard:
         top_buffer = calcs.calc_buffer_height(self.resolution[1], hex_size, n_hexes_yaxis)
         left_buffer = calcs.calc_buffer_width(self.resolution[0], hex_size, n_hexes_xaxis)
 
-        # Populate board tile positions/relationships
-        hex_connections, isec_connections, path_connections = defaultdict(set), defaultdict(set), defaultdict(set)
-
-        hex_y = top_buffer + hex_size//2
-        for row in range(n_hexes_yaxis):
-            ylocs = [hex_y - hex_size//2 + step * hex_size // 8 for step in range(9)]
-            hex_x = left_buffer + hex_size//2 + (hex_y % 2) * hex_size//2
-            for column in range(n_hexes_xaxis):
-                hex_loc = (hex_y, hex_x)
-                xlocs = [hex_x + - hex_size//2 + step * hex_size // 4 for step in range(5)]
-                isecs = [(ylocs[iy], xlocs[ix]) for (iy, ix) in [(0, 2), (2, 4), (6, 4), (8, 2), (6, 0), (2, 0)]]
-                paths = [(ylocs[iy], xlocs[ix]) for (iy, ix) in [(1, 1), (1, 3), (4, 4), (7, 3), (7, 1), (4, 0)]]
-
-                for i in range(6):
-                    hex_connections[hex_loc].add(isecs[i])
-                    isec_connections[isecs[i]] |= {paths[i], paths[(i+1) % 6], hex_loc}
-                    path_connections[paths[i]] = {isecs[i], isecs[i-1]}
-
-                hex_x += hex_size
-            hex_y += hex_size * 3 // 4
-
-        conn_tables = [hex_connections, isec_connections, path_connections]
-        tile_index = [loc for conn_table in map(sorted, conn_tables) for loc in conn_table]
-        tile_connections = {**hex_connections, **isec_connections, **path_connections}
-
-        for i, tile_loc in enumerate(tile_index):
-            tile_type = \
-                TileType.Hex if tile_loc in hex_connections else \
-                TileType.Intersection if tile_loc in isec_connections else \
-                calcs.get_path_type(*path_connections[tile_loc])
-
-            self.tiles.append(
-                TileInfo(
-                    index=i,
-                    tile_type=tile_type,
-                    loc=tile_loc,
-                    connections=tuple(tile_index.index(conn) for conn in tile_connections[tile_loc])
-                )
-            )
+        self.tiles, self.adjacency = hex_topology(
+            n_hexes_yaxis, n_hexes_xaxis, unit=hex_size // 8, origin=(top_buffer, left_buffer)
+        )
 
     @staticmethod
     def validate_resolution(resolution: tuple[int, int]) -> None:
@@ -0,0 +1,25 @@
+from dataclasses import dataclass, field, InitVar
+from PIL import Image
+from .rendering import COLOR_WHITE, COLOR_GRAY
+import numpy as np
+import numpy.typing as npt
+
+
+@dataclass
+class TileImage:
+    img_path: InitVar[str]
+    image: npt.NDArray[np.uint8] = field(init=False)
+    _recolor_key: tuple[int, int, int] = field(default=COLOR_GRAY)
+    _transparency_key: tuple[int, int, int] = field(default=COLOR_WHITE)
+    recolor_mask: npt.NDArray[bool] = field(init=False, repr=False)
+
+    def __post_init__(self, img_path: str):
+        self.image = np.array(Image.open(img_path))
+        self.recolor_mask = np.all(self.image[..., :3] == self._recolor_key, axis=-1)
+
+    def recolor(self, color: tuple[int, int, int]) -> npt.NDArray[np.uint8]:
+        """ Recolored copy of the image; the source image is left untouched """
+        image = self.image.copy()
+        image[self.recolor_mask, :3] = color
+        return image
+
@@ -0,0 +1,70 @@
+"""
+Import-time check for headless use: python -m hex_board.import_time [module ...] (from modeling/)
+Runs each import in a fresh interpreter under -X importtime, prints the slowest modules and fails if any
+module of the rendering stack (HEAVY_MODULES) got loaded
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+import os
+import subprocess
+import sys
+
+
+HEAVY_MODULES = ('PIL',)
+MODELING_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEARCH_PATHS = (MODELING_DIR, os.path.join(MODELING_DIR, 'catan'))
+
+
+@dataclass(frozen=True)
+class ImportRecord:
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int  # nesting level in the import tree, 0 for imports made by the -c statement itself
+
+
+def import_profile(module: str, python: str = sys.executable) -> list[ImportRecord]:
+    """ -X importtime records of importing module in a fresh interpreter, in import completion order """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join((*SEARCH_PATHS, os.environ.get('PYTHONPATH', ''))))
+    result = subprocess.run(
+        [python, '-X', 'importtime', '-c', f'import {module}'], env=env, capture_output=True, text=True
+    )
+    if result.returncode:
+        raise RuntimeError(f'import {module} failed:\n{result.stderr[-2000:]}')
+    records = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        records.append(ImportRecord(
+            name.strip(), int(self_us), int(cumulative_us), (len(name) - len(name.lstrip()) - 1) // 2
+        ))
+    return records
+
+
+def heavy_imports(records: list[ImportRecord]) -> list[str]:
+    return sorted({r.name for r in records if r.name.split('.')[0] in HEAVY_MODULES})
+
+
+def report(module: str, records: list[ImportRecord], top: int = 10) -> str:
+    total = sum(r.cumulative_us for r in records if r.depth == 0)
+    lines = [f'import {module}: {total / 1000:.1f} ms, {len(records)} modules']
+    for r in sorted(records, key=lambda r: r.self_us, reverse=True)[:top]:
+        lines.append(f'  {r.self_us / 1000:8.2f} ms  {r.name}')
+    heavy = heavy_imports(records)
+    if heavy:
+        lines.append(f'  rendering modules loaded: {", ".join(heavy)}')
+    return '\n'.join(lines)
+
+
+def main(modules: list[str]) -> int:
+    failed = False
+    for module in modules:
+        records = import_profile(module)
+        print(report(module, records))
+        failed |= bool(heavy_imports(records))
+    return int(failed)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:] or ['hex_board']))
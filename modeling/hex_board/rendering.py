@@ -0,0 +1,144 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Optional
+import numpy as np
+import numpy.typing as npt
+
+
+COLOR_WHITE = (255, 255, 255)
+COLOR_GRAY = (192, 192, 192)
+
+
+@dataclass
+class SpriteAtlas:
+    """
+    Sprites of one size class stacked into (sprites, height, width) arrays (smaller sprites are centered
+    and padded transparent), with their alpha and recolor masks computed once
+    Recolor pixels are those equal to recolor_key, fully transparent ones those equal to transparency_key
+    """
+    names: list[str]
+    rgb: npt.NDArray[np.uint8]           # (sprites, height, width, 3)
+    alpha: npt.NDArray[np.float32]       # (sprites, height, width), 0 to 1
+    recolor: npt.NDArray[bool]           # (sprites, height, width)
+    index: dict[str, int] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+    @classmethod
+    def from_arrays(cls, sprites: dict[str, npt.NDArray[np.uint8]],
+                    recolor_key: tuple[int, int, int] = COLOR_GRAY,
+                    transparency_key: tuple[int, int, int] = COLOR_WHITE) -> SpriteAtlas:
+        """ From (height, width, 3 or 4) uint8 images; a 4th channel is used as alpha """
+        height = max(s.shape[0] for s in sprites.values())
+        width = max(s.shape[1] for s in sprites.values())
+        n = len(sprites)
+        rgb = np.zeros((n, height, width, 3), dtype=np.uint8)
+        alpha = np.zeros((n, height, width), dtype=np.float32)
+        recolor = np.zeros((n, height, width), dtype=bool)
+        for i, sprite in enumerate(sprites.values()):
+            h, w = sprite.shape[:2]
+            box = np.s_[i, (height - h) // 2:(height - h) // 2 + h, (width - w) // 2:(width - w) // 2 + w]
+            rgb[box] = sprite[..., :3]
+            a = sprite[..., 3] / 255 if sprite.shape[-1] == 4 else np.ones((h, w))
+            alpha[box] = np.where(np.all(sprite[..., :3] == transparency_key, axis=-1), 0, a)
+            recolor[box] = np.all(sprite[..., :3] == recolor_key, axis=-1)
+        return cls(list(sprites), rgb, alpha, recolor)
+
+    @classmethod
+    def from_images(cls, paths: dict[str, str], **keys) -> SpriteAtlas:
+        """ Loads image files once (needs Pillow, imported only here) """
+        from .images import TileImage
+        return cls.from_arrays({name: TileImage(path).image for name, path in paths.items()}, **keys)
+
+    @property
+    def sprite_shape(self) -> tuple[int, int]:
+        return self.rgb.shape[1], self.rgb.shape[2]
+
+
+@dataclass
+class SpriteLayer:
+    """
+    Sprites of one atlas drawn centered on fixed frame positions (e.g. the locs of one tile type)
+    The flat frame pixel of every (position, sprite pixel) pair is precomputed, so drawing a layer is one
+    gather, one vectorized alpha blend and one scatter. Positions of a layer are assumed not to overlap
+    """
+    atlas: SpriteAtlas
+    centers: npt.NDArray[np.integer]     # (positions, 2) as (y, x)
+    frame_shape: tuple[int, int]         # (height, width)
+    pixels: npt.NDArray[np.intp] = field(init=False, repr=False)      # (positions, sprite pixels)
+    inside: npt.NDArray[bool] = field(init=False, repr=False)         # (positions, sprite pixels)
+
+    def __post_init__(self):
+        h, w = self.atlas.sprite_shape
+        ys = np.asarray(self.centers)[:, 0, None, None] - h // 2 + np.arange(h)[:, None]
+        xs = np.asarray(self.centers)[:, 1, None, None] - w // 2 + np.arange(w)
+        ys, xs = np.broadcast_arrays(ys, xs)
+        self.inside = ((ys >= 0) & (ys < self.frame_shape[0]) & (xs >= 0) & (xs < self.frame_shape[1])).reshape(
+            len(self.centers), -1)
+        self.pixels = (np.clip(ys, 0, self.frame_shape[0] - 1) * self.frame_shape[1] +
+                       np.clip(xs, 0, self.frame_shape[1] - 1)).reshape(len(self.centers), -1)
+
+    def draw(self, frame: npt.NDArray[np.uint8], sprites: npt.NDArray[np.integer],
+             colors: Optional[npt.NDArray[np.uint8]] = None) -> None:
+        """
+        Blends sprite sprites[i] (atlas index, negative for none) at position i into frame (height, width, 3),
+        replacing recolor pixels with colors[i] when colors are given
+        """
+        rows = np.flatnonzero(sprites >= 0)
+        if not len(rows):
+            return
+        ids = sprites[rows]
+        n = len(rows)
+        alpha = self.atlas.alpha[ids].reshape(n, -1) * self.inside[rows]
+        visible = alpha > 0
+        src = self.atlas.rgb[ids].reshape(n, -1, 3)
+        if colors is not None:
+            src = np.where(self.atlas.recolor[ids].reshape(n, -1, 1), colors[rows, None, :], src)
+        pixels = self.pixels[rows][visible]
+        flat = frame.reshape(-1, 3)
+        dst = flat[pixels].astype(np.float32)
+        a = alpha[visible][:, None]
+        flat[pixels] = (dst + (src[visible] - dst) * a + 0.5).astype(np.uint8)
+
+
+@dataclass
+class FrameRecorder:
+    """ Collects frames into preallocated chunks and exports them as a frame stack or a video """
+    frame_shape: tuple[int, int, int]
+    chunk_size: int = 256
+    chunks: list[npt.NDArray[np.uint8]] = field(init=False, default_factory=list, repr=False)
+    n_frames: int = field(init=False, default=0)
+
+    def add(self, frame: npt.NDArray[np.uint8]) -> None:
+        if self.n_frames == len(self.chunks) * self.chunk_size:
+            self.chunks.append(np.empty((self.chunk_size, *self.frame_shape), dtype=np.uint8))
+        self.chunks[-1][self.n_frames % self.chunk_size] = frame
+        self.n_frames += 1
+
+    def clear(self) -> None:
+        self.n_frames = 0
+
+    def frames(self) -> npt.NDArray[np.uint8]:
+        """ (frames, height, width, 3) copy of everything recorded """
+        if not self.n_frames:
+            return np.empty((0, *self.frame_shape), dtype=np.uint8)
+        return np.concatenate(self.chunks)[:self.n_frames]
+
+    def save_frames(self, path: str) -> None:
+        """ Frame stack as a compressed .npz (key 'frames') """
+        np.savez_compressed(path, frames=self.frames())
+
+    def save_video(self, path: str, fps: int = 30) -> None:
+        """ Encodes with imageio when installed (any format it supports), otherwise writes an animated GIF """
+        if not self.n_frames:
+            raise ValueError('No frames were recorded')
+        frames = self.frames()
+        try:
+            import imageio.v2 as imageio
+        except ImportError:
+            from PIL import Image
+            images = [Image.fromarray(frame) for frame in frames]
+            images[0].save(path, save_all=True, append_images=images[1:], duration=round(1000 / fps), loop=0)
+            return
+        imageio.mimwrite(path, list(frames), fps=fps)